@@ -0,0 +1,114 @@
+"""
+Speed and accuracy of the text extraction backends.
+
+    python -m benchmarks.extraction_backends --pages 1 5 20 --transactions-per-page 40
+
+Each backend runs on the same synthetic statements, drawn both row by row
+and column by column, plus any real PDFs passed with --pdf. Accuracy is the
+share of ground-truth transactions parse_document recovers from the text;
+for --pdf files the pdfplumber output is taken as ground truth.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.results import summarise_runs, write_results, compare
+from benchmarks.synthetic import generate_statement, write_pdf
+
+BACKENDS = ["pdfium", "pdfplumber", "auto"]
+
+
+def _parsed_rows(text: str) -> list[tuple]:
+    from services.extraction.parser import parse_document
+
+    document = parse_document(text, "000_000_001", "statement.pdf")
+    return [(f"{t.date:%d/%m/%Y}", t.amount, t.balance) for t in document.transactions]
+
+
+def _accuracy(expected: list[tuple], got: list[tuple]) -> float:
+    if not expected:
+        return 1.0
+    remaining = list(got)
+    matched = 0
+    for row in expected:
+        if row in remaining:
+            remaining.remove(row)
+            matched += 1
+    return round(matched / len(expected), 4)
+
+
+def run_case(pdf_path: str, pages: int, expected: list[tuple], repeat: int, label: str) -> dict:
+    from services.extraction.utils import extract_text_from_pdf
+
+    stages, accuracy, methods = {}, {}, {}
+    for backend in BACKENDS:
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            try:
+                text, _, method = extract_text_from_pdf(pdf_path, backend=backend)
+            except Exception:
+                # a pinned backend that rejects the document has nothing to fall back to
+                text, method = None, None
+            seconds.append(time.perf_counter() - start)
+
+        stages[backend] = summarise_runs(seconds, pages=pages)
+        accuracy[backend] = _accuracy(expected, _parsed_rows(text)) if text else 0.0
+        methods[backend] = method
+
+    return {
+        "document": label,
+        "pages": pages,
+        "transactions": len(expected),
+        "bytes": os.path.getsize(pdf_path),
+        "stages": stages,
+        "accuracy": accuracy,
+        "method": methods,
+    }
+
+
+def _report(case: dict) -> dict:
+    print(f"[*] {case['document']}, {case['pages']} pages, {case['transactions']} transactions")
+    for backend, summary in case["stages"].items():
+        print(f"    {backend:<12}{summary['median_s']:>10.4f}s  {summary['pages_per_s'] or 0:>10.1f} pages/s"
+              f"  accuracy {case['accuracy'][backend]:>7.2%}  via {case['method'][backend]}")
+    return case
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--transactions-per-page", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pdf", nargs="*", default=[], help="real statements to include")
+    parser.add_argument("--out", default="data/benchmarks/extraction_backends.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    from services.extraction.utils import _extract_with_pdfplumber, get_page_count
+
+    cases = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for pages in args.pages:
+            transactions = pages * args.transactions_per_page
+            for column_major in (False, True):
+                statement = generate_statement(transactions, pages=pages, seed=pages * 100_003 + transactions)
+                statement.column_major = column_major
+                layout = "column_major" if column_major else "row_major"
+                pdf_path = write_pdf(statement, os.path.join(workdir, f"statement_{pages}p_{layout}.pdf"))
+                expected = [(f"{t.date:%d/%m/%Y}", t.amount, t.balance) for t in statement.transactions]
+                cases.append(_report(run_case(pdf_path, pages, expected, args.repeat, f"synthetic {layout}")))
+
+    for pdf_path in args.pdf:
+        expected = _parsed_rows(_extract_with_pdfplumber(pdf_path))
+        cases.append(_report(run_case(pdf_path, get_page_count(pdf_path), expected, args.repeat,
+                                      os.path.basename(pdf_path))))
+
+    results = write_results("extraction_backends", cases, args.out)
+    if args.baseline:
+        compare(args.baseline, results, ("document", "pages"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Transaction parsing with and without a learned layout template.
+
+    python -m benchmarks.layout_parsing --transactions 100 1000 5000
+
+Each case renders a synthetic statement to PDF and reads its text layer
+once. The layout fingerprint is timed on its own, then the generic parser
+and the template the first statement of the layout teaches, over the same
+text, so the saving a known layout buys shows up next to what identifying
+the layout costs.
+
+The same statement drawn a column at a time is then read both ways a
+worker can: text extraction, which has to fall back to pdfplumber, plus
+parsing, against a table read through the learned column boundaries.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.results import summarise_runs, write_results, compare
+from benchmarks.synthetic import generate_statement, write_pdf
+
+
+def _first_page_cells(path: str) -> list:
+    import pypdfium2 as pdfium
+    from services.extraction.tables import page_cells
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        textpage = pdf[0].get_textpage()
+        try:
+            return page_cells(textpage)
+        finally:
+            textpage.close()
+    finally:
+        pdf.close()
+
+
+def run_case(count: int, repeat: int, workdir: str) -> dict:
+    from services.extraction import parser
+    from services.extraction.layouts import LayoutTemplates, identify
+    from services.extraction.tables import learn_boundaries, read_statement
+    from services.extraction.utils import extract_text_from_pdf
+
+    pdf_path = write_pdf(generate_statement(count, pages=max(1, count // 40), seed=count),
+                         os.path.join(workdir, f"statement_{count}.pdf"))
+    raw_text, _, _ = extract_text_from_pdf(pdf_path)
+    templates = LayoutTemplates(os.path.join(workdir, "layouts"))
+    fingerprint = identify(pdf_path)
+    template = templates.learn(fingerprint, raw_text, parser._generic_rows(raw_text), "statement.pdf")
+
+    column_major = generate_statement(count, pages=max(1, count // 40), seed=count)
+    column_major.column_major = True
+    column_path = write_pdf(column_major, os.path.join(workdir, f"columns_{count}.pdf"))
+    column_text, _, method = extract_text_from_pdf(column_path)
+    document = parser.parse_document(column_text, "000_000_001", "statement.pdf")
+    column_template = LayoutTemplates(os.path.join(workdir, "layouts")).get(fingerprint, record=False)
+    column_template.boundaries = learn_boundaries(_first_page_cells(column_path), column_template)
+
+    stages = {"fingerprint": [], "generic": [], "template": [], "column_text_route": [], "column_table_read": []}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        identify(pdf_path)
+        stages["fingerprint"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        generic = parser._generic_rows(raw_text)
+        stages["generic"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        templated, _ = template.rows(raw_text)
+        stages["template"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        text, _, _ = extract_text_from_pdf(column_path)
+        parser.parse_document(text, "000_000_001", "statement.pdf")
+        stages["column_text_route"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        read = read_statement(column_path, column_template, "000_000_001", "statement.pdf")
+        stages["column_table_read"].append(time.perf_counter() - start)
+
+    return {
+        "transactions": count,
+        "rows_match": generic == templated,
+        "column_text_method": method,
+        "table_read_matches": read == document,
+        "stages": {stage: summarise_runs(seconds, transactions=count) for stage, seconds in stages.items()},
+    }
+
+
+def _report(case: dict) -> dict:
+    print(f"[*] {case['transactions']} transactions, template rows match generic: {case['rows_match']}, "
+          f"table read matches the {case['column_text_method']} text route: {case['table_read_matches']}")
+    for stage, summary in case["stages"].items():
+        per_txn = summary["median_s"] / case["transactions"] * 1e6
+        print(f"    {stage:<20}{summary['median_s'] * 1e3:>10.3f} ms  {per_txn:>8.2f} us/transaction")
+    return case
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--transactions", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default="data/benchmarks/layout_parsing.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = [_report(run_case(count, args.repeat, workdir)) for count in args.transactions]
+    results = write_results("layout_parsing", cases, args.out)
+    if args.baseline:
+        compare(args.baseline, results, ("transactions",))
+
+
+if __name__ == "__main__":
+    main()
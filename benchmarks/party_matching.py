@@ -0,0 +1,111 @@
+"""
+Accuracy and cost of the fuzzy name/address check.
+
+    python -m benchmarks.party_matching --checks 100000
+
+Accuracy is measured on the labelled pairs in benchmarks/data/party_matching.csv
+(profile vs document name and address, each marked match or not), for the
+fuzzy matcher and for the exact string comparison it replaced. Cost is the
+time for one document check against a precomputed customer profile: "cold"
+normalises every document string from scratch, "warm" lets the per-process
+cache answer repeats of the same document text.
+"""
+import argparse
+import csv
+import os
+import time
+
+from benchmarks.results import summarise_runs, write_results, compare
+
+CASES = os.path.join(os.path.dirname(__file__), "data", "party_matching.csv")
+THRESHOLD = 0.8
+
+
+def load_cases(path: str = CASES) -> list[dict]:
+    with open(path, newline="") as f:
+        return [{**row, "name_match": row["name_match"] == "1", "address_match": row["address_match"] == "1"}
+                for row in csv.DictReader(f)]
+
+
+def _scores(predicted: list[bool], expected: list[bool]) -> dict:
+    tp = sum(p and e for p, e in zip(predicted, expected))
+    fp = sum(p and not e for p, e in zip(predicted, expected))
+    fn = sum(e and not p for p, e in zip(predicted, expected))
+    return {
+        "accuracy": round(sum(p == e for p, e in zip(predicted, expected)) / len(expected), 4),
+        "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+        "recall": round(tp / (tp + fn), 4) if tp + fn else None,
+        # a false "no match" is a false hard flag an analyst has to clear
+        "false_flags": fn,
+    }
+
+
+def evaluate(cases: list[dict], threshold: float = THRESHOLD) -> dict:
+    from shared.matching import party_profile, name_tokens, address_tokens, name_similarity, address_similarity
+
+    fuzzy = {"name": [], "address": []}
+    exact = {"name": [], "address": []}
+    for case in cases:
+        profile = party_profile(case["profile_name"], case["profile_address"])
+        fuzzy["name"].append(name_similarity(profile.name, name_tokens(case["document_name"])) >= threshold)
+        fuzzy["address"].append(
+            address_similarity(profile.address, address_tokens(case["document_address"])) >= threshold
+        )
+        exact["name"].append(case["profile_name"] == case["document_name"])
+        exact["address"].append(case["profile_address"] == case["document_address"])
+
+    return {
+        matcher: {field: _scores(predicted[field], [c[f"{field}_match"] for c in cases]) for field in predicted}
+        for matcher, predicted in (("fuzzy", fuzzy), ("exact", exact))
+    }
+
+
+def _time_checks(cases: list[dict], checks: int, repeat: int, cold: bool) -> list[float]:
+    from shared.matching import party_profile, name_tokens, address_tokens, name_similarity, address_similarity
+
+    profiles = [party_profile(c["profile_name"], c["profile_address"]) for c in cases]
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(checks):
+            if cold:
+                name_tokens.cache_clear()
+                address_tokens.cache_clear()
+            case, profile = cases[i % len(cases)], profiles[i % len(cases)]
+            name_similarity(profile.name, name_tokens(case["document_name"]))
+            address_similarity(profile.address, address_tokens(case["document_address"]))
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--checks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--cases", default=CASES)
+    parser.add_argument("--out", default="data/benchmarks/party_matching.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cases)
+    accuracy = evaluate(cases, args.threshold)
+    for matcher, fields in accuracy.items():
+        for field, scores in fields.items():
+            print(f"[*] {matcher:<6}{field:<9}accuracy {scores['accuracy']:>7.2%}  "
+                  f"false flags {scores['false_flags']:>3} of {len(cases)}")
+
+    stages = {}
+    for mode in ("cold", "warm"):
+        stages[mode] = summarise_runs(_time_checks(cases, args.checks, args.repeat, mode == "cold"), checks=args.checks)
+        print(f"[*] {mode:<6}{stages[mode]['median_s'] / args.checks * 1e6:>8.2f} us per document check")
+
+    case = {"cases": len(cases), "checks": args.checks, "threshold": args.threshold,
+            "accuracy": accuracy, "stages": stages}
+    results = write_results("party_matching", [case], args.out)
+    if args.baseline:
+        compare(args.baseline, results, ("cases", "checks"))
+
+
+if __name__ == "__main__":
+    main()
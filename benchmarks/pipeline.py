@@ -0,0 +1,238 @@
+"""
+End-to-end pipeline benchmark on synthetic statements.
+
+    # stages called directly, no RabbitMQ or Postgres needed
+    python -m benchmarks.pipeline --pages 1 5 20 --transactions-per-page 40
+
+    # real workers through the broker and database from docker-compose
+    python -m benchmarks.pipeline --mode broker --pages 1 5 --docs 20
+
+Results are written as JSON (--out) and can be compared with a previous
+run from another commit (--baseline).
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from benchmarks.results import summarise_runs, write_results, compare
+from benchmarks.synthetic import generate_statement, write_pdf
+
+STAGES = ["extraction", "parse", "analysis", "report"]
+TERMINAL_STATUSES = {"COMPLETED", "EXTRACTION_FAILED", "ANALYSIS_FAILED", "REPORTING_FAILED", "QUEUE_FAILED", "REJECTED"}
+
+# customer 000_000_001 from the seed data, so broker runs pass the lookup and match checks
+CUSTOMER = {
+    "customer_id": "000_000_001",
+    "name": "John Smith",
+    "address": "44 Oak Avenue, Cork, Ireland",
+}
+
+
+def run_inprocess(pages: int, transactions: int, repeat: int, workdir: str) -> dict:
+    from services.extraction.utils import extract_text_from_pdf
+    from services.extraction.parser import parse_document
+    from services.analysis.core import perform_analysis
+    from services.report.core import write_report
+
+    statement = generate_statement(transactions, pages=pages, seed=pages * 100_003 + transactions,
+                                   name=CUSTOMER["name"], address=CUSTOMER["address"])
+    pdf_path = write_pdf(statement, os.path.join(workdir, f"statement_{pages}p_{transactions}t.pdf"))
+    timings = {stage: [] for stage in STAGES}
+    loop = asyncio.new_event_loop()
+
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            raw_text, _, _ = extract_text_from_pdf(pdf_path)
+            timings["extraction"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            document = parse_document(raw_text, CUSTOMER["customer_id"], os.path.basename(pdf_path))
+            timings["parse"].append(time.perf_counter() - start)
+
+            # same JSON round trip the payload takes through the queue
+            payload = json.loads(json.dumps({"customer": CUSTOMER, "document": document.dict()}, default=str))
+            start = time.perf_counter()
+            results = loop.run_until_complete(perform_analysis(payload))
+            timings["analysis"].append(time.perf_counter() - start)
+
+            payload = json.loads(json.dumps(results, default=str))
+            start = time.perf_counter()
+            write_report(payload, str(uuid.uuid4()), reports_dir=os.path.join(workdir, "reports"))
+            timings["report"].append(time.perf_counter() - start)
+    finally:
+        loop.close()
+
+    parsed = len(document.transactions)
+    if parsed != transactions:
+        print(f"[!] Parsed {parsed} of {transactions} transactions for {pages} pages")
+
+    return {
+        "pages": pages,
+        "transactions": transactions,
+        "bytes": os.path.getsize(pdf_path),
+        "parsed_transactions": parsed,
+        "stages": {
+            stage: summarise_runs(timings[stage], docs=1, pages=pages, transactions=transactions)
+            for stage in STAGES
+        },
+    }
+
+
+async def _submit(job_id: str, pdf_path: str, rabbitmq_url: str, queue: str):
+    import aio_pika
+    from shared.db import AsyncSessionLocal
+    from shared.metrics import publish_headers
+    from shared.models import Job, JobEvent
+
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            session.add(Job(job_id=job_id, customer_id=CUSTOMER["customer_id"], filename=os.path.basename(pdf_path)))
+            session.add(JobEvent(job_id=job_id, status="UPLOADED", message=pdf_path))
+
+    connection = await aio_pika.connect_robust(rabbitmq_url)
+    async with connection:
+        channel = await connection.channel()
+        await channel.declare_queue(queue, durable=True)
+        await channel.default_exchange.publish(
+            aio_pika.Message(
+                body=json.dumps({
+                    "job_id": job_id,
+                    "file_path": pdf_path,
+                    "customer_id": CUSTOMER["customer_id"],
+                    "filename": os.path.basename(pdf_path),
+                }).encode(),
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                correlation_id=job_id,
+                headers=publish_headers(),
+            ),
+            routing_key=queue,
+        )
+
+
+def _stage_seconds(events: list) -> dict:
+    """Per-stage durations from the job_events timeline written by the workers"""
+    first = {}
+    for event in sorted(events, key=lambda e: e.timestamp):
+        first.setdefault(event.status, event.timestamp)
+
+    spans = {
+        "extraction": ("EXTRACTION_STARTED", "EXTRACTION_SUCCESS"),
+        "analysis": ("ANALYSIS_STARTED", "ANALYSIS_SUCCESS"),
+        "report": ("REPORTING_STARTED", "COMPLETED"),
+        "end_to_end": ("UPLOADED", "COMPLETED"),
+    }
+    return {
+        stage: (first[end] - first[start]).total_seconds()
+        for stage, (start, end) in spans.items()
+        if start in first and end in first
+    }
+
+
+async def run_broker(pages: int, transactions: int, docs: int, upload_dir: str,
+                     rabbitmq_url: str, queue: str, timeout: float) -> dict:
+    from sqlalchemy import select
+    from shared.db import AsyncSessionLocal
+    from shared.models import Job, JobEvent
+
+    os.makedirs(upload_dir, exist_ok=True)
+    statement = generate_statement(transactions, pages=pages, seed=pages * 100_003 + transactions,
+                                   name=CUSTOMER["name"], address=CUSTOMER["address"])
+    job_ids = []
+    started = time.perf_counter()
+    for _ in range(docs):
+        job_id = str(uuid.uuid4())
+        pdf_path = write_pdf(statement, os.path.join(upload_dir, f"bench_{job_id[:8]}_{pages}p.pdf"))
+        await _submit(job_id, pdf_path, rabbitmq_url, queue)
+        job_ids.append(job_id)
+
+    while True:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(Job.current_status).where(Job.job_id.in_(job_ids)))
+            statuses = [row[0] for row in result]
+        if all(s in TERMINAL_STATUSES for s in statuses):
+            break
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError(f"{sum(s not in TERMINAL_STATUSES for s in statuses)} jobs still running after {timeout}s")
+        await asyncio.sleep(0.5)
+    wall = time.perf_counter() - started
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(JobEvent).where(JobEvent.job_id.in_(job_ids)))
+        events = result.scalars().all()
+
+    per_job = {job_id: [] for job_id in job_ids}
+    for event in events:
+        per_job[event.job_id].append(event)
+
+    timings = {}
+    for job_events in per_job.values():
+        for stage, seconds in _stage_seconds(job_events).items():
+            timings.setdefault(stage, []).append(seconds)
+
+    return {
+        "pages": pages,
+        "transactions": transactions,
+        "docs": docs,
+        "completed": sum(s == "COMPLETED" for s in statuses),
+        "wall_s": round(wall, 3),
+        "docs_per_s": round(docs / wall, 3),
+        "stages": {
+            stage: summarise_runs(seconds, docs=1, pages=pages, transactions=transactions)
+            for stage, seconds in timings.items()
+        },
+    }
+
+
+def _report(case: dict) -> dict:
+    print(f"[*] {case['pages']} pages, {case['transactions']} transactions")
+    for stage, summary in case["stages"].items():
+        print(f"    {stage:<12}{summary['median_s']:>10.4f}s  {summary['pages_per_s'] or 0:>10.1f} pages/s")
+    return case
+
+
+async def _run_broker_cases(args) -> list[dict]:
+    cases = []
+    for pages in args.pages:
+        cases.append(_report(await run_broker(
+            pages, pages * args.transactions_per_page, args.docs, args.upload_dir,
+            os.getenv("RABBITMQ_URL"), args.queue, args.timeout,
+        )))
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=["inprocess", "broker"], default="inprocess")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--transactions-per-page", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3, help="in-process runs per case")
+    parser.add_argument("--docs", type=int, default=10, help="documents submitted per case in broker mode")
+    parser.add_argument("--upload-dir", default=os.getenv("UPLOAD_DIR") or "data/uploads",
+                        help="must be visible to the extraction workers at the same path")
+    parser.add_argument("--queue", default=os.getenv("RAW_EXTRACTION_QUEUE") or "raw_extraction_queue")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--out", default="data/benchmarks/pipeline.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    if args.mode == "inprocess":
+        cases = []
+        for pages in args.pages:
+            with tempfile.TemporaryDirectory() as workdir:
+                cases.append(_report(run_inprocess(pages, pages * args.transactions_per_page, args.repeat, workdir)))
+    else:
+        # one event loop for every case, the DB engine's pool is bound to it
+        cases = asyncio.run(_run_broker_cases(args))
+
+    results = write_results("pipeline", cases, args.out, mode=args.mode)
+    if args.baseline:
+        compare(args.baseline, results, ("pages", "transactions"))
+
+
+if __name__ == "__main__":
+    main()
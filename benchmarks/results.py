@@ -0,0 +1,68 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def summarise_runs(seconds: list[float], **units) -> dict:
+    """Median/min wall time plus throughput per unit (docs, pages, transactions...)"""
+    median = statistics.median(seconds)
+    summary = {
+        "runs": [round(s, 6) for s in seconds],
+        "median_s": round(median, 6),
+        "min_s": round(min(seconds), 6),
+    }
+    for unit, count in units.items():
+        summary[f"{unit}_per_s"] = round(count / median, 3) if median > 0 else None
+    return summary
+
+
+def write_results(benchmark: str, cases: list[dict], out: str, **extra) -> dict:
+    results = {
+        "benchmark": benchmark,
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        **extra,
+        "cases": cases,
+    }
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"[+] Results written to {out}")
+    return results
+
+
+def compare(baseline_path: str, results: dict, key_fields: tuple[str, ...]):
+    """Print the change in median time per stage against an earlier results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def _key(case):
+        return tuple(case.get(k) for k in key_fields)
+
+    old_cases = {_key(c): c for c in baseline["cases"]}
+    print(f"\nvs {baseline_path} (commit {baseline.get('commit')})")
+    for case in results["cases"]:
+        old = old_cases.get(_key(case))
+        if not old:
+            continue
+        for stage, summary in case["stages"].items():
+            before = old["stages"].get(stage, {}).get("median_s")
+            if not before:
+                continue
+            change = (summary["median_s"] - before) / before
+            label = ", ".join(f"{k}={v}" for k, v in zip(key_fields, _key(case)))
+            print(f"  {label:<36}{stage:<14}{before:>10.4f}s -> {summary['median_s']:>8.4f}s {change:>+8.1%}")
@@ -0,0 +1,236 @@
+"""
+Synthetic bank statements in the layout services/extraction/parser.py expects.
+
+Statements are deterministic for a given seed, so benchmark runs on
+different commits process identical documents.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+
+VENDORS = [
+    "TESCO STORES", "SUPERVALU", "DUNNES STORES", "SPAR", "LIDL", "ALDI", "PENNEYS",
+    "BOOTS PHARMACY", "EASONS", "STARBUCKS", "COSTA COFFEE", "UBER", "DUBLIN BUS",
+    "BUS EIREANN", "IRISH RAIL", "CIRCLE K", "APPLEGREEN", "SPOTIFY", "NETFLIX",
+    "VIRGIN MEDIA", "SKY IRELAND", "THREE MOBILE", "VODAFONE", "ELECTRIC IRELAND",
+    "BORD GAIS ENERGY", "JUST EAT", "DELIVEROO", "AMAZON.IE", "PAYPAL", "REVOLUT",
+    "AIB ATM", "BOI TRANSFER", "RENT PAYMENT",
+]
+CREDIT_VENDORS = ["SALARY DEPOSIT", "BOI TRANSFER", "REVOLUT", "PAYPAL"]
+
+PAGE_WIDTH = 595.2756
+PAGE_HEIGHT = 841.8898
+MARGIN_X = 42.0
+TOP = 796.0
+ROW_HEIGHT = 12.0
+
+# column anchors, the same positions the fixture statements use
+DATE_X = 66.0
+VENDOR_X = 152.4
+AMOUNT_RIGHT_X = 442.8
+BALANCE_RIGHT_X = 529.2
+
+
+@dataclass
+class SyntheticTransaction:
+    date: date
+    vendor: str
+    amount: Decimal
+    balance: Decimal
+
+
+@dataclass
+class SyntheticStatement:
+    name: str
+    address: str
+    account_number: str
+    opening_balance: Decimal
+    transactions: list[SyntheticTransaction] = field(default_factory=list)
+    pages: int = 1
+    bank_name: str = "SECURE BANK"
+    # draw the table one column at a time, like some bank PDFs do, which
+    # scrambles content-stream-order text extraction
+    column_major: bool = False
+
+
+def generate_statement(transactions: int, pages: int = 1, seed: int = 0,
+                       name: str = "John Smith", address: str = "44 Oak Avenue, Cork, Ireland",
+                       start: date = date(2025, 1, 1)) -> SyntheticStatement:
+    """Random but internally consistent statement, every balance follows from the previous row"""
+    rng = random.Random(seed)
+    balance = Decimal(rng.randint(2000, 8000)) + Decimal(rng.randint(0, 99)) / 100
+    statement = SyntheticStatement(
+        name=name,
+        address=address,
+        account_number=f"IE{rng.randint(10, 99)} SECB {rng.randint(1000, 9999)} {rng.randint(1000, 9999)} {rng.randint(1000, 9999)}",
+        opening_balance=balance,
+        pages=max(1, pages),
+    )
+
+    # roughly two transactions a day, dates never go backwards
+    day = start
+    for i in range(transactions):
+        if i and rng.random() < 0.5:
+            day += timedelta(days=1)
+
+        if rng.random() < 0.1:
+            vendor = rng.choice(CREDIT_VENDORS)
+            amount = Decimal(rng.randint(2000, 300000)) / 100
+        else:
+            vendor = rng.choice(VENDORS)
+            amount = -Decimal(rng.randint(100, 20000)) / 100
+
+        balance += amount
+        statement.transactions.append(SyntheticTransaction(day, vendor, amount, balance))
+
+    return statement
+
+
+def _fmt_amount(amount: Decimal) -> str:
+    return f"+{amount:.2f}" if amount > 0 else f"{amount:.2f}"
+
+
+def _header_lines(statement: SyntheticStatement) -> list[str]:
+    txns = statement.transactions
+    period_start = txns[0].date if txns else date(2025, 1, 1)
+    period_end = txns[-1].date if txns else period_start
+    return [
+        statement.bank_name,
+        f"Account Holder: {statement.name}",
+        f"Address: {statement.address}",
+        f"Account Number: {statement.account_number}",
+        f"Statement Period: {period_start:%B} {period_start.day}, {period_start.year} - "
+        f"{period_end:%B} {period_end.day}, {period_end.year}",
+    ]
+
+
+def _row_text(t: SyntheticTransaction) -> str:
+    return f"{t.date:%d/%m/%Y} {t.vendor} {_fmt_amount(t.amount)} {t.balance:.2f}"
+
+
+def _paginate(statement: SyntheticStatement) -> list[list[SyntheticTransaction]]:
+    txns = statement.transactions
+    per_page = -(-len(txns) // statement.pages) if txns else 0
+    return [txns[i * per_page:(i + 1) * per_page] for i in range(statement.pages)]
+
+
+def render_text(statement: SyntheticStatement) -> str:
+    """What a text-layer extraction of the rendered PDF should return"""
+    lines = _header_lines(statement)
+    for page_number, rows in enumerate(_paginate(statement), start=1):
+        lines.append("Date Vendor Amount (€) Balance (€)")
+        lines.extend(_row_text(t) for t in rows)
+        lines.append(f"Page {page_number} of {statement.pages}")
+    return "\n".join(lines)
+
+
+# Helvetica advance widths (1/1000 em) for the characters used in amounts
+_HELVETICA_WIDTHS = {**{d: 556 for d in "0123456789"}, ".": 278, ",": 278, "-": 333, "+": 584}
+
+
+def _text_width(text: str, size: float) -> float:
+    return sum(_HELVETICA_WIDTHS.get(c, 556) for c in text) * size / 1000
+
+
+def _escape(text: str) -> bytes:
+    raw = text.encode("cp1252")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _show(font: str, size: float, x: float, y: float, text: str) -> bytes:
+    return b"BT /%s %.1f Tf %.2f %.2f Td (%s) Tj ET\n" % (font.encode(), size, x, y, _escape(text))
+
+
+def _page_stream(statement: SyntheticStatement, rows: list[SyntheticTransaction],
+                 page_number: int, height: float) -> bytes:
+    out = []
+    y = height - (PAGE_HEIGHT - TOP)
+    if page_number == 1:
+        header = _header_lines(statement)
+        out.append(_show("F2", 16, MARGIN_X, y, header[0]))
+        y -= 34
+        for line in header[1:]:
+            label, value = line.split(": ", 1)
+            out.append(_show("F2", 10, MARGIN_X, y, f"{label}:"))
+            out.append(_show("F1", 10, MARGIN_X + _text_width(label, 10) + 14, y, value))
+            y -= ROW_HEIGHT
+        y -= 24
+
+    out.append(_show("F2", 10, DATE_X, y, "Date"))
+    out.append(_show("F2", 10, VENDOR_X, y, "Vendor"))
+    out.append(_show("F2", 10, 390.1, y, "Amount (€)"))
+    out.append(_show("F2", 10, 475.9, y, "Balance (€)"))
+    y -= 26
+
+    cells = []
+    for t in rows:
+        amount, balance = _fmt_amount(t.amount), f"{t.balance:.2f}"
+        cells.append([
+            _show("F1", 8, DATE_X, y, f"{t.date:%d/%m/%Y}"),
+            _show("F1", 8, VENDOR_X, y, t.vendor),
+            _show("F1", 8, AMOUNT_RIGHT_X - _text_width(amount, 8), y, amount),
+            _show("F1", 8, BALANCE_RIGHT_X - _text_width(balance, 8), y, balance),
+        ])
+        y -= ROW_HEIGHT
+
+    if statement.column_major:
+        cells = list(zip(*cells)) if cells else []
+    for group in cells:
+        out.extend(group)
+
+    out.append(_show("F1", 8, PAGE_WIDTH / 2 - 20, 30, f"Page {page_number} of {statement.pages}"))
+    return b"".join(out)
+
+
+def render_pdf(statement: SyntheticStatement) -> bytes:
+    """
+    Minimal PDF 1.4 writer (Helvetica, WinAnsi) so the benchmarks need no extra dependency.
+
+    Page height grows when a page holds more rows than fit on A4, which keeps
+    the requested page count exact for any transaction count.
+    """
+    pages = _paginate(statement)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+
+    page_ids = []
+    for page_number, rows in enumerate(pages, start=1):
+        needed = (len(rows) + (12 if page_number == 1 else 3)) * ROW_HEIGHT + 90
+        height = max(PAGE_HEIGHT, needed)
+        stream = _page_stream(statement, rows, page_number, height)
+
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.4f %.4f] "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, height, content_id)
+        )
+        page_ids.append(len(objects))
+
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def write_pdf(statement: SyntheticStatement, path: str) -> str:
+    with open(path, "wb") as f:
+        f.write(render_pdf(statement))
+    return path
@@ -0,0 +1,152 @@
+"""
+Throughput of vendor normalisation through the merchant automaton.
+
+    python -m benchmarks.vendor_normalisation --strings 1000000 --dictionary-size 20000 50000
+
+The shipped merchant dictionary is padded with generated merchant names up
+to each --dictionary-size, then --strings noisy vendor lines are drawn from
+it (card prefixes, store numbers, towns, mixed case and punctuation, plus a
+share of vendors the dictionary doesn't know). "cold" runs every string
+through the automaton, "warm" repeats a realistic working set so the
+per-process lookup cache answers most of them.
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+
+from benchmarks.results import summarise_runs, write_results, compare
+
+PREFIXES = ["", "", "POS ", "CARD 4421 ", "VDP-", "DD ", "CONTACTLESS "]
+TOWNS = ["DUBLIN", "CORK", "GALWAY", "LIMERICK", "WATERFORD", "KILKENNY", "LONDON", ""]
+
+
+def _fake_name(rng: random.Random) -> str:
+    syllables = ["KA", "LO", "MER", "DAN", "TRI", "VEX", "OR", "BRA", "NU", "SEL", "QUA", "ZIM"]
+    return " ".join(
+        "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 2))
+    )
+
+
+def build_dictionary(size: int, seed: int = 1) -> list:
+    from services.extraction.merchants import MerchantEntry, clean_vendor, load_merchant_dictionary
+
+    entries = load_merchant_dictionary()
+    rng = random.Random(seed)
+    categories = sorted({e.category for e in entries})
+    seen = {e.pattern for e in entries}
+    while len(entries) < size:
+        name = _fake_name(rng)
+        if name not in seen:
+            seen.add(name)
+            entries.append(MerchantEntry(clean_vendor(name), name, rng.choice(categories)))
+    return entries
+
+
+def _noisy(name: str, rng: random.Random) -> str:
+    vendor = f"{rng.choice(PREFIXES)}{name} {rng.randint(1, 9999) if rng.random() < 0.5 else ''} {rng.choice(TOWNS)}"
+    if rng.random() < 0.3:
+        vendor = vendor.title()
+    if rng.random() < 0.2:
+        vendor = vendor.replace(" ", rng.choice(["*", ".", " - "]), 1)
+    return vendor.strip()
+
+
+def vendor_strings(entries: list, count: int, unknown_share: float = 0.15, seed: int = 2) -> tuple[list, list]:
+    """Noisy vendor lines and the merchant each should normalise to (None for unknown ones)"""
+    rng = random.Random(seed)
+    named = [e for e in entries if e.merchant]
+    vendors, expected = [], []
+    for _ in range(count):
+        if rng.random() < unknown_share:
+            vendors.append(_noisy("".join(rng.choices(string.ascii_uppercase, k=rng.randint(5, 12))), rng))
+            expected.append(None)
+        else:
+            entry = rng.choice(named)
+            vendors.append(_noisy(entry.pattern, rng))
+            expected.append(entry.merchant)
+    return vendors, expected
+
+
+def _timed_lookups(automaton, vendors: list, repeat: int, clear_cache: bool) -> tuple[list, list]:
+    seconds, results = [], []
+    for _ in range(repeat):
+        if clear_cache:
+            automaton.lookup.cache_clear()
+        start = time.perf_counter()
+        results = [automaton.lookup(v) for v in vendors]
+        seconds.append(time.perf_counter() - start)
+    return seconds, results
+
+
+def run_case(dictionary_size: int, strings: int, working_set: int, repeat: int, workdir: str) -> dict:
+    from services.extraction.merchants import MerchantAutomaton, build_automaton
+
+    entries = build_dictionary(dictionary_size)
+    start = time.perf_counter()
+    directory = build_automaton(entries, workdir)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    automaton = MerchantAutomaton(directory)
+    map_s = time.perf_counter() - start
+    table_bytes = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+
+    vendors, expected = vendor_strings(entries, strings)
+    cold_seconds, results = _timed_lookups(automaton, vendors, repeat, clear_cache=True)
+    # real statements keep paying the same few hundred merchants
+    warm = [vendors[i % working_set] for i in range(strings)]
+    warm_seconds, _ = _timed_lookups(automaton, warm, repeat, clear_cache=False)
+
+    known = [(got[0], want) for got, want in zip(results, expected) if want]
+    unknown = [got[1] for got, want in zip(results, expected) if not want]
+    return {
+        "dictionary_size": dictionary_size,
+        "strings": strings,
+        "states": automaton.states,
+        "table_bytes": table_bytes,
+        "build_s": round(build_s, 4),
+        "map_s": round(map_s, 6),
+        "stages": {
+            "cold": summarise_runs(cold_seconds, strings=strings),
+            "warm": summarise_runs(warm_seconds, strings=strings),
+        },
+        "accuracy": round(sum(got == want for got, want in known) / len(known), 4) if known else None,
+        "unknown_categorised": round(sum(c is not None for c in unknown) / len(unknown), 4) if unknown else None,
+    }
+
+
+def _report(case: dict) -> dict:
+    print(f"[*] {case['dictionary_size']} patterns, {case['states']} states, "
+          f"{case['table_bytes'] / 1e6:.1f} MB, built in {case['build_s']:.2f}s, mapped in {case['map_s'] * 1e3:.2f}ms")
+    for mode, summary in case["stages"].items():
+        print(f"    {mode:<6}{summary['median_s']:>10.3f}s  {summary['strings_per_s']:>12,.0f} strings/s")
+    print(f"    accuracy {case['accuracy']:.2%}, unknown vendors categorised {case['unknown_categorised']:.2%}")
+    return case
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--strings", type=int, default=1_000_000)
+    parser.add_argument("--dictionary-size", type=int, nargs="+", default=[1_000, 20_000])
+    parser.add_argument("--working-set", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="data/benchmarks/vendor_normalisation.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = [
+            _report(run_case(size, args.strings, args.working_set, args.repeat, workdir))
+            for size in args.dictionary_size
+        ]
+
+    results = write_results("vendor_normalisation", cases, args.out)
+    if args.baseline:
+        compare(args.baseline, results, ("dictionary_size", "strings"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Latency and recall of watchlist screening.
+
+    python -m benchmarks.watchlist_screening --entries 100000 300000 --queries 5000
+
+Each case builds an index over a generated list of person and company names,
+then screens two query sets: listed names with the damage real documents do
+to them (typos, reordering, titles, dropped middle names), and names that
+aren't on the list. Reports build time and size, per-query latency
+percentiles, recall on the first set and hit rate on the second.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.results import write_results, compare
+
+FIRST = ["JOHN", "MARY", "AHMED", "OLGA", "WEI", "FATIMA", "IVAN", "MARIA", "JOSE", "ANNA", "DMITRI", "LI",
+         "MOHAMMED", "ELENA", "PAVEL", "SARA", "OMAR", "NINA", "VIKTOR", "HANA", "YURI", "LEILA", "ALI", "ZHANG"]
+SYLLABLES = ["KO", "RA", "VAN", "MIR", "SHA", "LEN", "TOV", "DAR", "NIK", "ZA", "BEK", "OV", "ESCU", "HAM",
+             "RIN", "SOL", "GAR", "TAN", "KHAN", "PET", "ROV", "MAL", "IQ", "BAS"]
+COMPANY = ["TRADING", "HOLDINGS", "SHIPPING", "INVEST", "GROUP", "EXPORT", "LOGISTICS", "BANK", "ENERGY"]
+# customers are drawn from words that never appear on the list, so any hit on them is a false one
+CUSTOMER_FIRST = ["PATRICK", "SIOBHAN", "CIARAN", "AOIFE", "DECLAN", "NIAMH", "EOIN", "ORLA", "SEAMUS", "GRAINNE"]
+CUSTOMER_SYLLABLES = ["MUR", "PHY", "BRE", "NNAN", "WAL", "SH", "DOY", "LE", "KEL", "LY", "QUI", "GLEY"]
+
+
+def _surname(rng: random.Random, syllables: list[str] = SYLLABLES) -> str:
+    return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+
+
+def generate_list(size: int, seed: int = 1) -> list[dict]:
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < size:
+        if rng.random() < 0.7:
+            middle = f" {rng.choice(FIRST)}" if rng.random() < 0.3 else ""
+            names.add(f"{rng.choice(FIRST)}{middle} {_surname(rng)}")
+        else:
+            names.add(f"{_surname(rng)} {rng.choice(COMPANY)} LTD")
+    return [
+        {"entry_id": f"WL{i:07d}", "name": name, "list": "sanctions" if i % 3 else "pep"}
+        for i, name in enumerate(sorted(names))
+    ]
+
+
+def _damage(name: str, rng: random.Random) -> str:
+    words = name.split()
+    roll = rng.random()
+    if roll < 0.3 and len(words) > 1:
+        words = words[1:] + words[:1]
+    elif roll < 0.5 and len(words) > 2:
+        del words[1]
+    elif roll < 0.8:
+        i = rng.randrange(len(words))
+        w = words[i]
+        j = rng.randrange(len(w))
+        words[i] = w[:j] + rng.choice("AEIOUKLMNRST") + w[j + 1:]
+    else:
+        words.insert(0, rng.choice(["MR", "MRS", "DR"]))
+    return " ".join(words).title()
+
+
+def _percentiles(seconds: list[float]) -> dict:
+    ordered = sorted(seconds)
+
+    def pick(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1e6, 1)
+
+    return {"p50_us": pick(0.5), "p90_us": pick(0.9), "p99_us": pick(0.99), "max_us": round(ordered[-1] * 1e6, 1)}
+
+
+def run_case(size: int, queries: int, threshold: float, workdir: str) -> dict:
+    from services.analysis.watchlist import WatchlistIndex, build_index
+
+    entries = generate_list(size)
+    start = time.perf_counter()
+    directory = build_index(entries, os.path.join(workdir, str(size)))
+    build_s = time.perf_counter() - start
+    index = WatchlistIndex(directory)
+    index_bytes = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+
+    rng = random.Random(size)
+    listed = [rng.choice(entries) for _ in range(queries)]
+    damaged = [(_damage(e["name"], rng), e["entry_id"]) for e in listed]
+    unlisted = [f"{rng.choice(CUSTOMER_FIRST)} {_surname(rng, CUSTOMER_SYLLABLES)}" for _ in range(queries)]
+
+    seconds, found = [], 0
+    for name, entry_id in damaged:
+        start = time.perf_counter()
+        hits = index.search(name, threshold)
+        seconds.append(time.perf_counter() - start)
+        found += any(h.entry["entry_id"] == entry_id for h in hits)
+    hit_latency = _percentiles(seconds)
+
+    seconds, false_hits = [], 0
+    for name in unlisted:
+        start = time.perf_counter()
+        false_hits += bool(index.search(name, threshold))
+        seconds.append(time.perf_counter() - start)
+
+    return {
+        "entries": size,
+        "queries": queries,
+        "threshold": threshold,
+        "build_s": round(build_s, 3),
+        "index_bytes": index_bytes,
+        "listed_latency": hit_latency,
+        "unlisted_latency": _percentiles(seconds),
+        "recall": round(found / queries, 4),
+        "unlisted_hit_rate": round(false_hits / queries, 4),
+        "stages": {},
+    }
+
+
+def _report(case: dict) -> dict:
+    print(f"[*] {case['entries']} entries, built in {case['build_s']:.2f}s, {case['index_bytes'] / 1e6:.1f} MB")
+    for label in ("listed", "unlisted"):
+        lat = case[f"{label}_latency"]
+        print(f"    {label:<9}p50 {lat['p50_us']:>8.1f}us  p99 {lat['p99_us']:>8.1f}us  max {lat['max_us']:>8.1f}us")
+    print(f"    recall {case['recall']:.2%}, unlisted names hit {case['unlisted_hit_rate']:.2%}")
+    return case
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[100_000, 300_000])
+    parser.add_argument("--queries", type=int, default=5_000)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--out", default="data/benchmarks/watchlist_screening.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = [_report(run_case(size, args.queries, args.threshold, workdir)) for size in args.entries]
+
+    results = write_results("watchlist_screening", cases, args.out)
+    if args.baseline:
+        compare(args.baseline, results, ("entries", "queries"))
+
+
+if __name__ == "__main__":
+    main()
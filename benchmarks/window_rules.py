@@ -0,0 +1,99 @@
+"""
+Cost of the sliding-window rules on large statements.
+
+    python -m benchmarks.window_rules --transactions 10000 100000 1000000
+
+Each case is a synthetic statement with bursts of just-under-threshold
+cash lodgements and large credits moved straight on planted in it. The
+column build is timed on its own, then each shipped window rule, so a
+regression in either shows up separately. Time per transaction should stay
+flat as statements grow.
+"""
+import argparse
+import random
+import time
+from decimal import Decimal
+
+from benchmarks.results import summarise_runs, write_results, compare
+from benchmarks.synthetic import generate_statement
+
+RULES = ("structuring", "rapid_movement")
+
+
+def build_transactions(count: int, seed: int = 0) -> list:
+    from models.models import Transaction
+
+    statement = generate_statement(count, seed=seed)
+    rng = random.Random(seed)
+    rows = statement.transactions
+    # a burst every ~20k rows: three lodgements over a few days, or a credit moved on the same day
+    for start in range(1000, len(rows) - 10, 20_000):
+        if rng.random() < 0.5:
+            for i in range(start, start + 6, 2):
+                rows[i].vendor, rows[i].amount = "CASH LODGEMENT", Decimal(rng.randint(9100, 9990))
+        else:
+            rows[start].vendor, rows[start].amount = "BOI TRANSFER", Decimal("12000.00")
+            rows[start + 1].vendor, rows[start + 1].amount = "REVOLUT", Decimal("-11500.00")
+
+    balance, transactions = statement.opening_balance, []
+    for i, t in enumerate(rows):
+        balance += t.amount
+        transactions.append(Transaction.model_construct(
+            transaction_id=f"TXN{i:07d}", date=t.date, vendor=t.vendor, amount=t.amount, balance=balance,
+            normalized_vendor=None, category="cash" if t.vendor == "CASH LODGEMENT" else None,
+        ))
+    return transactions
+
+
+def run_case(count: int, repeat: int) -> dict:
+    from services.analysis.config import ANALYSIS_RULES_PATH
+    from services.analysis.rules import KINDS, Columns, RuleContext, load_rules
+
+    transactions = build_transactions(count)
+    rules = {r.name: r for r in load_rules(ANALYSIS_RULES_PATH) if r.name in RULES}
+
+    stages, flags = {"columns": []}, {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        columns = Columns.from_transactions(transactions)
+        stages["columns"].append(time.perf_counter() - start)
+
+    ctx = RuleContext(None, None, columns, None, "document")
+    for name, rule in rules.items():
+        stages[name] = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            flags[name] = len(KINDS[rule.kind].check(rule, ctx))
+            stages[name].append(time.perf_counter() - start)
+
+    return {
+        "transactions": count,
+        "flags": flags,
+        "stages": {stage: summarise_runs(seconds, transactions=count) for stage, seconds in stages.items()},
+    }
+
+
+def _report(case: dict) -> dict:
+    print(f"[*] {case['transactions']} transactions, flags {case['flags']}")
+    for stage, summary in case["stages"].items():
+        per_txn = summary["median_s"] / case["transactions"] * 1e9
+        print(f"    {stage:<16}{summary['median_s'] * 1e3:>10.2f} ms  {per_txn:>8.1f} ns/transaction")
+    return case
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--transactions", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default="data/benchmarks/window_rules.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    cases = [_report(run_case(count, args.repeat)) for count in args.transactions]
+    results = write_results("window_rules", cases, args.out)
+    if args.baseline:
+        compare(args.baseline, results, ("transactions",))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
 
 from shared.db import Base
-from shared.models import Customer, Job, JobEvent
+from shared.models import Customer, Job, JobEvent, CustomerStats, HistoryUpdate, StatementIndex, TransactionFingerprint, TransactionLshBand, GraphNode, GraphEdge, GraphComponent, AnalysisResult
 from shared.config import DATABASE_URL
 
 config = context.config
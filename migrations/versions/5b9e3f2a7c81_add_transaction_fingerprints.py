@@ -0,0 +1,53 @@
+"""add_transaction_fingerprints
+
+Revision ID: 5b9e3f2a7c81
+Revises: 8e2d4b17c5a0
+Create Date: 2026-10-19 14:02:51.118320
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b9e3f2a7c81'
+down_revision: Union[str, Sequence[str], None] = '8e2d4b17c5a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('transaction_fingerprints',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('customer_id', sa.String(), nullable=False),
+    sa.Column('job_id', sa.String(), nullable=False),
+    sa.Column('transaction_id', sa.String(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('vendor', sa.String(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('fingerprint', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['job_id'], ['jobs.job_id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('job_id', 'transaction_id')
+    )
+    op.create_index('ix_transaction_fingerprints_customer_fingerprint', 'transaction_fingerprints', ['customer_id', 'fingerprint'], unique=False)
+    op.create_table('transaction_lsh_bands',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('fingerprint_id', sa.Integer(), nullable=False),
+    sa.Column('customer_id', sa.String(), nullable=False),
+    sa.Column('band_key', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['fingerprint_id'], ['transaction_fingerprints.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_transaction_lsh_bands_customer_band', 'transaction_lsh_bands', ['customer_id', 'band_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transaction_lsh_bands_customer_band', table_name='transaction_lsh_bands')
+    op.drop_table('transaction_lsh_bands')
+    op.drop_index('ix_transaction_fingerprints_customer_fingerprint', table_name='transaction_fingerprints')
+    op.drop_table('transaction_fingerprints')
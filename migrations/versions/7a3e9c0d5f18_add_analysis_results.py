@@ -0,0 +1,41 @@
+"""add_analysis_results
+
+Revision ID: 7a3e9c0d5f18
+Revises: c4d81f6a9e27
+Create Date: 2026-10-19 17:48:33.590412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3e9c0d5f18'
+down_revision: Union[str, Sequence[str], None] = 'c4d81f6a9e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('analysis_results',
+    sa.Column('job_id', sa.String(), nullable=False),
+    sa.Column('customer_id', sa.String(), nullable=False),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('hard_flags', sa.Integer(), nullable=False),
+    sa.Column('soft_flags', sa.Integer(), nullable=False),
+    sa.Column('results', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('analysed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['jobs.job_id'], ),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+    op.create_index(op.f('ix_analysis_results_customer_id'), 'analysis_results', ['customer_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_analysis_results_customer_id'), table_name='analysis_results')
+    op.drop_table('analysis_results')
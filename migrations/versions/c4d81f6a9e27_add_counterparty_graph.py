@@ -0,0 +1,66 @@
+"""add_counterparty_graph
+
+Revision ID: c4d81f6a9e27
+Revises: 5b9e3f2a7c81
+Create Date: 2026-10-19 16:21:07.402915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d81f6a9e27'
+down_revision: Union[str, Sequence[str], None] = '5b9e3f2a7c81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('graph_components',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('customers', sa.Integer(), nullable=False),
+    sa.Column('counterparties', sa.Integer(), nullable=False),
+    sa.Column('edges', sa.Integer(), nullable=False),
+    sa.Column('shared_counterparties', sa.Integer(), nullable=False),
+    sa.Column('max_counterparty_degree', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_graph_components_shared', 'graph_components', ['shared_counterparties'], unique=False)
+    op.create_table('graph_nodes',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('component_id', sa.Integer(), nullable=False),
+    sa.Column('degree', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'key')
+    )
+    op.create_index('ix_graph_nodes_component', 'graph_nodes', ['component_id'], unique=False)
+    op.create_table('graph_edges',
+    sa.Column('customer_node_id', sa.Integer(), nullable=False),
+    sa.Column('counterparty_node_id', sa.Integer(), nullable=False),
+    sa.Column('transactions', sa.Integer(), nullable=False),
+    sa.Column('inflow', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('outflow', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('first_seen', sa.Date(), nullable=False),
+    sa.Column('last_seen', sa.Date(), nullable=False),
+    sa.ForeignKeyConstraint(['customer_node_id'], ['graph_nodes.id'], ),
+    sa.ForeignKeyConstraint(['counterparty_node_id'], ['graph_nodes.id'], ),
+    sa.PrimaryKeyConstraint('customer_node_id', 'counterparty_node_id')
+    )
+    op.create_index('ix_graph_edges_counterparty', 'graph_edges', ['counterparty_node_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_graph_edges_counterparty', table_name='graph_edges')
+    op.drop_table('graph_edges')
+    op.drop_index('ix_graph_nodes_component', table_name='graph_nodes')
+    op.drop_table('graph_nodes')
+    op.drop_index('ix_graph_components_shared', table_name='graph_components')
+    op.drop_table('graph_components')
@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class Transaction(BaseModel):
     transaction_id: str
@@ -9,6 +9,9 @@ class Transaction(BaseModel):
     vendor: str
     amount: Decimal
     balance: Decimal
+    # filled in by the extraction worker's merchant lookup
+    normalized_vendor: Optional[str] = None
+    category: Optional[str] = None
 
 class Document(BaseModel):
     customer_id: str
@@ -0,0 +1,282 @@
+"""
+Re-run analysis over past jobs without re-uploading or going through RabbitMQ.
+
+    python -m services.analysis.backfill --since 2025-01-01 --customer 000_000_042 --workers 8
+
+The extracted documents are read back in pages from their
+EXTRACTION_SUCCESS job events, in event id order, and each page is split
+into chunks analysed by perform_analysis on a process pool with the
+current rules (or --rules). The next page is fetched while the pool works
+on this one. Each page's results are bulk upserted into analysis_results
+and the last event id is written to the checkpoint file, so an interrupted
+run started again with the same filters carries on where it stopped
+(--fresh starts over).
+
+Soft flags are scored against the customer's stored amount history, which
+already includes the document being re-analysed, so re-analysed z-scores
+can differ slightly from the ones the worker produced at the time. The
+checks against other statements (continuity, duplicates, counterparty
+graph) are not re-run, their flags are carried over from the stored result.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.analysis.config import ANALYSIS_RULES_PATH
+from services.analysis.results import result_row, upsert_results, load_results, carry_history
+from services.analysis.rules import RulePlan, load_rules
+from services.analysis.stats import RunningStats
+from services.analysis.core import perform_analysis
+from shared.db import AsyncSessionLocal
+from shared.models import Job, JobEvent, CustomerStats
+
+PAGE_SIZE = 500
+CHUNK_SIZE = 25
+
+
+@dataclass
+class BackfillFilter:
+    since: Optional[str] = None
+    until: Optional[str] = None
+    customers: list[str] = field(default_factory=list)
+
+    def apply(self, query):
+        """Restrict a query that selects from job_events joined to jobs"""
+        if self.since:
+            query = query.where(Job.created_at >= datetime.fromisoformat(self.since))
+        if self.until:
+            # inclusive of the whole end day
+            query = query.where(Job.created_at < datetime.fromisoformat(self.until) + timedelta(days=1))
+        if self.customers:
+            query = query.where(Job.customer_id.in_(self.customers))
+        return query
+
+
+@dataclass
+class Checkpoint:
+    path: str
+    filters: BackfillFilter
+    run_id: str
+    last_event_id: int = 0
+    processed: int = 0
+    failed: int = 0
+
+    @classmethod
+    def open(cls, path: str, filters: BackfillFilter, fresh: bool = False) -> "Checkpoint":
+        """The saved run for these filters, or a new one"""
+        if not fresh and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved["filters"] != asdict(filters):
+                raise ValueError(
+                    f"Checkpoint {path} was written for {saved['filters']}, pass --fresh to start a new run"
+                )
+            return cls(path, filters, saved["run_id"], saved["last_event_id"], saved["processed"], saved["failed"])
+        return cls(path, filters, f"backfill-{datetime.now():%Y%m%dT%H%M%S}")
+
+    def save(self):
+        state = asdict(self)
+        del state["path"]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        staging = f"{self.path}.tmp"
+        with open(staging, "w") as f:
+            json.dump(state, f)
+        os.replace(staging, self.path)
+
+
+@dataclass
+class StoredDocument:
+    event_id: int
+    job_id: str
+    customer_id: str
+    payload: Optional[str]
+
+
+@dataclass
+class Analysed:
+    job_id: str
+    results: Optional[dict] = None
+    error: Optional[str] = None
+    transactions: int = 0
+
+
+# per-process state of the pool workers
+_plan: Optional[RulePlan] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def init_worker(rules_path: str):
+    global _plan, _loop
+    _plan = RulePlan(load_rules(rules_path))
+    _loop = asyncio.new_event_loop()
+
+
+def analyse_chunk(chunk: list[tuple[str, Optional[str], Optional[dict]]]) -> list[Analysed]:
+    """Analyse (job_id, payload, history) triples, one bad document doesn't sink the rest of the chunk"""
+    out = []
+    for job_id, payload, history in chunk:
+        try:
+            data = json.loads(payload)
+            results = _loop.run_until_complete(
+                perform_analysis(data, RunningStats(**history) if history else None, plan=_plan)
+            )
+            out.append(Analysed(job_id, json.loads(json.dumps(results, default=str)),
+                                transactions=len(data["document"]["transactions"])))
+        except Exception as e:
+            out.append(Analysed(job_id, error=f"{type(e).__name__}: {e}"))
+    return out
+
+
+def page_query(filters: BackfillFilter, after: int, limit: int = PAGE_SIZE):
+    query = (
+        select(JobEvent.id, JobEvent.job_id, Job.customer_id, JobEvent.message)
+        .join(Job, Job.job_id == JobEvent.job_id)
+        .where(JobEvent.status == "EXTRACTION_SUCCESS", JobEvent.id > after)
+    )
+    return filters.apply(query).order_by(JobEvent.id).limit(limit)
+
+
+async def fetch_page(filters: BackfillFilter, after: int) -> list[StoredDocument]:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(page_query(filters, after))
+        return [StoredDocument(*row) for row in result.all()]
+
+
+async def count_remaining(filters: BackfillFilter, after: int) -> int:
+    query = (
+        select(func.count())
+        .select_from(JobEvent)
+        .join(Job, Job.job_id == JobEvent.job_id)
+        .where(JobEvent.status == "EXTRACTION_SUCCESS", JobEvent.id > after)
+    )
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(filters.apply(query))).scalar_one()
+
+
+async def load_histories(customer_ids: set[str]) -> dict[str, dict]:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(CustomerStats).where(CustomerStats.customer_id.in_(customer_ids)))
+        return {row.customer_id: {"count": row.count, "mean": row.mean, "m2": row.m2} for row in result.scalars()}
+
+
+class Throughput:
+    """Running jobs/s and transactions/s, printed at most every `every_s` seconds"""
+
+    def __init__(self, total: int, every_s: float = 5.0):
+        self.total = total
+        self.every_s = every_s
+        self.started = self.last_report = time.perf_counter()
+        self.jobs = self.transactions = self.failed = 0
+
+    def add(self, jobs: int, transactions: int, failed: int):
+        self.jobs += jobs
+        self.transactions += transactions
+        self.failed += failed
+        if time.perf_counter() - self.last_report >= self.every_s:
+            self.report()
+
+    def summary(self) -> dict:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        rate = self.jobs / elapsed
+        return {
+            "jobs": self.jobs,
+            "total": self.total,
+            "failed": self.failed,
+            "jobs_per_s": round(rate, 1),
+            "transactions_per_s": round(self.transactions / elapsed, 1),
+            "eta_s": round((self.total - self.jobs) / rate) if rate else None,
+        }
+
+    def report(self):
+        self.last_report = time.perf_counter()
+        s = self.summary()
+        print(f"[*] [backfill] {s['jobs']}/{s['total']} jobs, {s['jobs_per_s']} jobs/s, "
+              f"{s['transactions_per_s']} transactions/s, {s['failed']} failed, eta {s['eta_s']}s")
+
+
+async def analyse_page(pool: ProcessPoolExecutor, page: list[StoredDocument],
+                       histories: dict[str, dict]) -> list[Analysed]:
+    work = [(d.job_id, d.payload, histories.get(d.customer_id)) for d in page]
+    chunks = [work[i:i + CHUNK_SIZE] for i in range(0, len(work), CHUNK_SIZE)]
+    done = await asyncio.gather(*(asyncio.wrap_future(pool.submit(analyse_chunk, chunk)) for chunk in chunks))
+    return [item for chunk in done for item in chunk]
+
+
+async def write_page(session: AsyncSession, page: list[StoredDocument], analysed: list[Analysed], run_id: str) -> int:
+    """Upsert the page's results with the stored history-based flags carried over, returns the rows written"""
+    customers = {d.job_id: d.customer_id for d in page}
+    done = [a for a in analysed if a.error is None]
+    previous = await load_results(session, [a.job_id for a in done])
+    rows = [
+        result_row(a.job_id, customers[a.job_id],
+                   carry_history(a.results, previous[a.job_id]) if a.job_id in previous else a.results, run_id)
+        for a in done
+    ]
+    await upsert_results(session, rows)
+    return len(rows)
+
+
+async def run(filters: BackfillFilter, checkpoint: Checkpoint, workers: int, rules_path: str) -> dict:
+    meter = Throughput(await count_remaining(filters, checkpoint.last_event_id))
+    print(f"[*] [backfill] {checkpoint.run_id}: {meter.total} documents after event {checkpoint.last_event_id}, "
+          f"{workers} workers, rules from {rules_path}")
+
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(rules_path,)) as pool:
+        page = await fetch_page(filters, checkpoint.last_event_id)
+        while page:
+            following = asyncio.create_task(fetch_page(filters, page[-1].event_id))
+            histories = await load_histories({d.customer_id for d in page})
+            analysed = await analyse_page(pool, page, histories)
+
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    written = await write_page(session, page, analysed, checkpoint.run_id)
+            failed = [a for a in analysed if a.error]
+            for a in failed:
+                print(f"[!] [backfill] [{a.job_id}] {a.error}")
+
+            checkpoint.last_event_id = page[-1].event_id
+            checkpoint.processed += written
+            checkpoint.failed += len(failed)
+            checkpoint.save()
+            meter.add(len(page), sum(a.transactions for a in analysed), len(failed))
+
+            page = await following
+
+    meter.report()
+    return meter.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run analysis over stored extracted documents")
+    parser.add_argument("--since", type=date.fromisoformat, help="jobs created on or after this date")
+    parser.add_argument("--until", type=date.fromisoformat, help="jobs created on or before this date")
+    parser.add_argument("--customer", action="append", dest="customers", default=[])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rules", default=ANALYSIS_RULES_PATH, help="rules file to analyse with")
+    parser.add_argument("--checkpoint", default="data/backfill/checkpoint.json")
+    parser.add_argument("--fresh", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    filters = BackfillFilter(
+        since=args.since.isoformat() if args.since else None,
+        until=args.until.isoformat() if args.until else None,
+        customers=sorted(args.customers),
+    )
+    checkpoint = Checkpoint.open(args.checkpoint, filters, fresh=args.fresh)
+    summary = asyncio.run(run(filters, checkpoint, args.workers, args.rules))
+    print(f"[+] [backfill] {checkpoint.run_id} done: {checkpoint.processed} results written, "
+          f"{checkpoint.failed} failed in total, {summary['jobs_per_s']} jobs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,33 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# checked when the worker starts, batch mode imports these settings without a broker
 RABBITMQ_URL = os.getenv("RABBITMQ_URL")
-if not RABBITMQ_URL:
-	raise ValueError("ERROR: RABBITMQ_URL environment variable not set")
 INPUT_QUEUE = os.getenv("EXTRACTED_DATA_QUEUE")
 OUTPUT_QUEUE = os.getenv("ANALYSIS_RESULTS_QUEUE")
 
 SOFT_FLAG_EPSILON = float(os.getenv("SOFT_FLAG_EPSILON", 2))
 
+# sanctions/PEP screening index, built with `python -m services.analysis.watchlist build <list.csv>`
+WATCHLIST_INDEX_DIR = os.getenv("WATCHLIST_INDEX_DIR", "data/watchlist_index")
+
+# flag rule definitions, reloaded when the file changes
+ANALYSIS_RULES_PATH = os.getenv("ANALYSIS_RULES_PATH", os.path.join(os.path.dirname(__file__), "rules.yaml"))
+
+# near-duplicate detection: MinHash signature length, LSH bands it is split into,
+# and the vendor shingle Jaccard similarity a candidate needs to be flagged
+DUPLICATE_MINHASH_PERMUTATIONS = int(os.getenv("DUPLICATE_MINHASH_PERMUTATIONS", "16"))
+DUPLICATE_LSH_BANDS = int(os.getenv("DUPLICATE_LSH_BANDS", "8"))
+NEAR_DUPLICATE_SIMILARITY = float(os.getenv("NEAR_DUPLICATE_SIMILARITY", "0.5"))
+
+# counterparty graph: dictionary categories whose merchants are still linked across customers
+# (uncategorised counterparties always are), and the customers a cluster needs to be reported
+GRAPH_COUNTERPARTY_CATEGORIES = [
+    c.strip() for c in os.getenv("GRAPH_COUNTERPARTY_CATEGORIES", "money_service,crypto").split(",") if c.strip()
+]
+GRAPH_CLUSTER_MIN_CUSTOMERS = int(os.getenv("GRAPH_CLUSTER_MIN_CUSTOMERS", "3"))
+
+# sidecar port serving /metrics (0 disables it)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
 DEBUG = os.getenv("DEBUG") == "True"
\ No newline at end of file
@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.models import StatementIndex
+
+
+@dataclass
+class StatementEntry:
+    job_id: str
+    period_start: date
+    period_end: date
+    opening_balance: Decimal
+    closing_balance: Decimal
+
+
+def statement_bounds(transactions_sorted: list) -> Optional[dict]:
+    """Date range and boundary balances of a statement whose transactions are sorted by date"""
+    if not transactions_sorted:
+        return None
+    first, last = transactions_sorted[0], transactions_sorted[-1]
+    return {
+        "period_start": first.date.date() if isinstance(first.date, datetime) else first.date,
+        "period_end": last.date.date() if isinstance(last.date, datetime) else last.date,
+        # balance before the first transaction
+        "opening_balance": first.balance - first.amount,
+        "closing_balance": last.balance,
+    }
+
+
+def _entry(row: StatementIndex) -> StatementEntry:
+    return StatementEntry(row.job_id, row.period_start, row.period_end, row.opening_balance, row.closing_balance)
+
+
+async def find_neighbours(session: AsyncSession, customer_id: str,
+                          entry: StatementEntry) -> tuple[Optional[StatementEntry], Optional[StatementEntry]]:
+    """The customer's statements starting just before and just after this one, one index lookup each"""
+    base = select(StatementIndex).where(
+        StatementIndex.customer_id == customer_id,
+        StatementIndex.job_id != entry.job_id,
+    )
+    previous = await session.execute(
+        base.where(StatementIndex.period_start <= entry.period_start)
+        .order_by(StatementIndex.period_start.desc(), StatementIndex.id.desc())
+        .limit(1)
+    )
+    following = await session.execute(
+        base.where(StatementIndex.period_start > entry.period_start)
+        .order_by(StatementIndex.period_start, StatementIndex.id)
+        .limit(1)
+    )
+    previous, following = previous.scalar_one_or_none(), following.scalar_one_or_none()
+    return (_entry(previous) if previous else None), (_entry(following) if following else None)
+
+
+async def record_statement(session: AsyncSession, customer_id: str, entry: StatementEntry):
+    """Insert, or replace the row from an earlier attempt at the same job"""
+    values = dict(
+        customer_id=customer_id,
+        period_start=entry.period_start,
+        period_end=entry.period_end,
+        opening_balance=entry.opening_balance,
+        closing_balance=entry.closing_balance,
+    )
+    await session.execute(
+        insert(StatementIndex)
+        .values(job_id=entry.job_id, **values)
+        .on_conflict_do_update(index_elements=["job_id"], set_=values)
+    )
+
+
+def _gap(earlier: StatementEntry, later: StatementEntry, neighbour: str, other: StatementEntry) -> dict:
+    return {
+        "type": "statement_balance_gap",
+        "neighbour": neighbour,
+        "other_job_id": other.job_id,
+        "earlier_period_end": earlier.period_end.isoformat(),
+        "earlier_closing_balance": earlier.closing_balance,
+        "later_period_start": later.period_start.isoformat(),
+        "later_opening_balance": later.opening_balance,
+        "difference": later.opening_balance - earlier.closing_balance,
+    }
+
+
+def _overlap(entry: StatementEntry, neighbour: str, other: StatementEntry) -> dict:
+    return {
+        "type": "statement_period_overlap",
+        "neighbour": neighbour,
+        "other_job_id": other.job_id,
+        "period": [entry.period_start.isoformat(), entry.period_end.isoformat()],
+        "other_period": [other.period_start.isoformat(), other.period_end.isoformat()],
+    }
+
+
+def check_continuity(entry: StatementEntry, previous: Optional[StatementEntry],
+                     following: Optional[StatementEntry]) -> list[dict]:
+    """
+    Hard flags for breaks between this statement and its neighbours.
+
+    Consecutive statements must chain: the earlier one's closing balance is
+    the later one's opening balance, and their date ranges don't overlap
+    (sharing a boundary day is allowed).
+    """
+    flags = []
+    if previous:
+        if previous.period_end > entry.period_start:
+            flags.append(_overlap(entry, "previous", previous))
+        elif previous.closing_balance != entry.opening_balance:
+            flags.append(_gap(previous, entry, "previous", previous))
+    if following:
+        if entry.period_end > following.period_start:
+            flags.append(_overlap(entry, "next", following))
+        elif entry.closing_balance != following.opening_balance:
+            flags.append(_gap(entry, following, "next", following))
+    return flags
@@ -0,0 +1,67 @@
+"""
+Scoring one statement on its own, no broker or database involved.
+
+The analysis worker wraps this with the customer's stored history and
+the cross-statement checks; batch mode and backfills call it directly.
+"""
+from dataclasses import asdict
+from decimal import Decimal
+from typing import Optional
+
+from models.models import AnalysisResponse, Document, Customer
+from services.analysis.continuity import statement_bounds
+from services.analysis.rules import RulePlan, RuleContext, Columns, registry as rule_registry
+from services.analysis.stats import RunningStats
+from shared.matching import PartyProfile
+
+
+async def perform_analysis(data: dict, history: Optional[RunningStats] = None,
+                           plan: Optional[RulePlan] = None) -> dict:
+    customer = Customer(**data['customer'])
+    doc = Document(**data['document'])
+    transactions = doc.transactions
+
+    total_inflow = sum(t.amount for t in transactions if t.amount > 0)
+    total_outflow = sum(t.amount for t in transactions if t.amount < 0)
+    net_change = total_inflow + total_outflow
+    avg_daily_balance = sum(t.balance for t in transactions) / Decimal(len(transactions)) if transactions else Decimal(0)
+
+    transactions_sorted = sorted(transactions, key=lambda t: t.date)
+
+    # soft flags are scored against the customer's earlier statements plus this one
+    document_stats = RunningStats.from_values(float(t.amount) for t in transactions)
+    baseline = history.merge(document_stats) if history else document_stats
+    baseline_source = "customer_history" if history and history.count else "document"
+
+    # hard and soft flags come from the rules in rules.yaml
+    plan = plan or rule_registry.plan()
+    hard_flags, soft_flags, _ = plan.run(RuleContext(
+        customer=customer,
+        document=doc,
+        columns=Columns.from_transactions(transactions_sorted),
+        baseline=baseline,
+        baseline_source=baseline_source,
+        profile=PartyProfile.from_dict(data['customer'].get('match_profile')),
+    ))
+
+    response_data = AnalysisResponse(
+        customer=customer,
+        filename=doc.filename,
+        summary={
+            "total_inflow": total_inflow,
+            "total_outflow": total_outflow,
+            "net_change": net_change,
+            "avg_daily_balance": avg_daily_balance,
+        },
+        alerts={
+            "soft_flags": soft_flags, 
+            "hard_flags": hard_flags,
+        }
+    )
+
+    results = response_data.dict()
+    # the worker folds the document's stats into the customer's history
+    results["amount_stats"] = {"document": asdict(document_stats), "baseline": asdict(baseline)}
+    # date range and boundary balances for the cross-statement continuity check
+    results["statement"] = statement_bounds(transactions_sorted)
+    return results
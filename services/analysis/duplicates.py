@@ -0,0 +1,234 @@
+"""
+Duplicate and near-duplicate transactions across a customer's statements.
+
+Every analysed transaction is stored with a 64-bit hash of its normalised
+(date, vendor, amount), so an exact repeat from an earlier statement is one
+lookup on the (customer_id, fingerprint) index. For near-duplicates - the
+same date and amount under a slightly different vendor string - the
+vendor's character shingles are MinHashed and the signature is split into
+LSH bands; each band is hashed together with the date and amount, and any
+stored transaction sharing a band key is a candidate, confirmed by the
+Jaccard similarity of the two vendors' shingles. Both lookups are index
+probes, so their cost follows the size of the statement, not the history.
+"""
+import hashlib
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.analysis.config import (
+    DUPLICATE_MINHASH_PERMUTATIONS, DUPLICATE_LSH_BANDS, NEAR_DUPLICATE_SIMILARITY,
+)
+from shared.models import TransactionFingerprint, TransactionLshBand
+
+SHINGLE_SIZE = 3
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# keep IN lists well under asyncpg's bind parameter limit
+_LOOKUP_CHUNK = 5000
+
+
+@dataclass
+class TransactionKeys:
+    transaction_id: str
+    date: date
+    vendor: str
+    amount: Decimal
+    fingerprint: int
+    bands: list[int]
+
+
+@dataclass
+class Candidate:
+    """A stored transaction from another statement"""
+    job_id: str
+    transaction_id: str
+    vendor: str
+
+
+def normalise_vendor(vendor: str) -> str:
+    return " ".join(re.sub(r"[^0-9A-Z]+", " ", vendor.upper()).split())
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def fingerprint(day: date, vendor: str, amount: Decimal) -> int:
+    """Signed 64-bit hash of a normalised (date, vendor, amount), the width of a BIGINT column"""
+    return _hash64(f"{day.isoformat()}|{vendor}|{amount}")
+
+
+def shingles(vendor: str, size: int = SHINGLE_SIZE) -> set[str]:
+    if len(vendor) <= size:
+        return {vendor}
+    return {vendor[i:i + size] for i in range(len(vendor) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _permutations(num_perm: int) -> tuple[np.ndarray, np.ndarray]:
+    # fixed seed, stored band keys are only comparable if every worker uses the same permutations
+    rng = np.random.default_rng(1)
+    a = rng.integers(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+_PERMUTATIONS = {}
+
+
+def minhash(vendor_shingles: Iterable[str], num_perm: int = DUPLICATE_MINHASH_PERMUTATIONS) -> np.ndarray:
+    """MinHash signature, (a*x + b) mod p over 32-bit shingle hashes, so a*x + b never overflows uint64"""
+    if num_perm not in _PERMUTATIONS:
+        _PERMUTATIONS[num_perm] = _permutations(num_perm)
+    a, b = _PERMUTATIONS[num_perm]
+
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "big") for s in vendor_shingles],
+        dtype=np.uint64,
+    )
+    permuted = (np.outer(hashes, a) + b) % np.uint64(_MERSENNE_PRIME) & np.uint64(_MAX_HASH)
+    return permuted.min(axis=0)
+
+
+def band_keys(signature: np.ndarray, day: date, amount: Decimal, bands: int = DUPLICATE_LSH_BANDS) -> list[int]:
+    """One key per band; the date and amount are part of every key so only same-day, same-amount rows collide"""
+    return [
+        _hash64(f"{i}|{day.isoformat()}|{amount}|{rows.tobytes().hex()}")
+        for i, rows in enumerate(np.array_split(signature, bands))
+    ]
+
+
+def transaction_keys(transactions: list, num_perm: int = DUPLICATE_MINHASH_PERMUTATIONS,
+                     bands: int = DUPLICATE_LSH_BANDS) -> list[TransactionKeys]:
+    keys = []
+    for t in transactions:
+        day = t.date.date() if isinstance(t.date, datetime) else t.date
+        vendor = normalise_vendor(t.vendor)
+        amount = Decimal(t.amount).quantize(Decimal("0.01"))
+        keys.append(TransactionKeys(
+            transaction_id=t.transaction_id,
+            date=day,
+            vendor=vendor,
+            amount=amount,
+            fingerprint=fingerprint(day, vendor, amount),
+            bands=band_keys(minhash(shingles(vendor), num_perm), day, amount, bands),
+        ))
+    return keys
+
+
+def _flag(flag_type: str, keys: TransactionKeys, matches: list[tuple[Candidate, float]]) -> dict:
+    return {
+        "type": flag_type,
+        "transaction_id": keys.transaction_id,
+        "date": keys.date.isoformat(),
+        "vendor": keys.vendor,
+        "amount": keys.amount,
+        "matches": [
+            {"job_id": c.job_id, "transaction_id": c.transaction_id, "vendor": c.vendor, "similarity": round(s, 2)}
+            for c, s in matches
+        ],
+    }
+
+
+def match_duplicates(keys: list[TransactionKeys], exact: dict[int, list[Candidate]],
+                     near: dict[int, list[Candidate]],
+                     threshold: float = NEAR_DUPLICATE_SIMILARITY) -> tuple[list[dict], list[dict]]:
+    """
+    Hard flags for transactions repeated exactly from another statement and
+    soft flags for LSH candidates whose vendor is similar enough; a
+    transaction with an exact match isn't flagged again as a near one.
+    """
+    hard, soft = [], []
+    for k in keys:
+        if k.fingerprint in exact:
+            hard.append(_flag("duplicate_transaction", k, [(c, 1.0) for c in exact[k.fingerprint]]))
+            continue
+
+        own = shingles(k.vendor)
+        seen = {}
+        for band in k.bands:
+            for c in near.get(band, []):
+                if (c.job_id, c.transaction_id) not in seen:
+                    seen[(c.job_id, c.transaction_id)] = (c, jaccard(own, shingles(c.vendor)))
+        matches = [(c, s) for c, s in seen.values() if s >= threshold]
+        if matches:
+            soft.append(_flag("near_duplicate_transaction", k, sorted(matches, key=lambda m: -m[1])))
+    return hard, soft
+
+
+def _chunks(values: list, size: int = _LOOKUP_CHUNK):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+async def find_duplicates(session: AsyncSession, customer_id: str, job_id: str,
+                          keys: list[TransactionKeys]) -> tuple[list[dict], list[dict]]:
+    """Probe both indexes for this statement's keys, rows stored by the same job are ignored"""
+    exact = defaultdict(list)
+    for chunk in _chunks(list({k.fingerprint for k in keys})):
+        result = await session.execute(
+            select(TransactionFingerprint).where(
+                TransactionFingerprint.customer_id == customer_id,
+                TransactionFingerprint.fingerprint.in_(chunk),
+                TransactionFingerprint.job_id != job_id,
+            )
+        )
+        for row in result.scalars():
+            exact[row.fingerprint].append(Candidate(row.job_id, row.transaction_id, row.vendor))
+
+    near = defaultdict(list)
+    for chunk in _chunks(list({band for k in keys for band in k.bands})):
+        result = await session.execute(
+            select(TransactionLshBand.band_key, TransactionFingerprint)
+            .join(TransactionFingerprint, TransactionFingerprint.id == TransactionLshBand.fingerprint_id)
+            .where(
+                TransactionLshBand.customer_id == customer_id,
+                TransactionLshBand.band_key.in_(chunk),
+                TransactionFingerprint.job_id != job_id,
+            )
+        )
+        for band, row in result:
+            near[band].append(Candidate(row.job_id, row.transaction_id, row.vendor))
+
+    return match_duplicates(keys, exact, near)
+
+
+async def record_transactions(session: AsyncSession, customer_id: str, job_id: str, keys: list[TransactionKeys]):
+    """Store the statement's keys; a retried job's rows already exist and are left as they are"""
+    if not keys:
+        return
+    by_id = {k.transaction_id: k for k in keys}
+    stored = []
+    # seven parameters a row, chunked like the lookups
+    for chunk in _chunks(keys, _LOOKUP_CHUNK // 7):
+        result = await session.execute(
+            insert(TransactionFingerprint)
+            .values([
+                dict(customer_id=customer_id, job_id=job_id, transaction_id=k.transaction_id,
+                     date=k.date, vendor=k.vendor, amount=k.amount, fingerprint=k.fingerprint)
+                for k in chunk
+            ])
+            .on_conflict_do_nothing(index_elements=["job_id", "transaction_id"])
+            .returning(TransactionFingerprint.id, TransactionFingerprint.transaction_id)
+        )
+        stored.extend(result.all())
+
+    bands = [
+        dict(fingerprint_id=fingerprint_id, customer_id=customer_id, band_key=band)
+        for fingerprint_id, transaction_id in stored
+        for band in by_id[transaction_id].bands
+    ]
+    if bands:
+        await session.execute(insert(TransactionLshBand), bands)
@@ -0,0 +1,293 @@
+"""
+Cross-customer counterparty graph.
+
+Customers and counterparties (normalised vendors) are nodes; an edge holds
+the money between one customer and one counterparty over every statement
+analysed so far. Only counterparties the merchant dictionary doesn't know,
+or knows in one of GRAPH_COUNTERPARTY_CATEGORIES, are linked - a
+supermarket shared by every customer says nothing.
+
+Connected components are kept up to date as edges arrive: every node
+carries its component id, and when a statement links components the
+largest keeps its id and the others are relabelled into it. A node only
+moves into a component at least twice the size of its old one, so no node
+is relabelled more than log2(n) times over the graph's life. Each component
+row keeps its counts, shared counterparties (two or more customers) and
+largest counterparty degree, so a statement only touches its own
+neighbourhood and a cluster query is one index scan.
+
+    python -m services.analysis.graph clusters --min-customers 3
+    python -m services.analysis.graph customer 000_000_042
+"""
+import argparse
+import asyncio
+import json
+from dataclasses import dataclass, asdict, fields
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.analysis.config import GRAPH_COUNTERPARTY_CATEGORIES, GRAPH_CLUSTER_MIN_CUSTOMERS
+from services.analysis.duplicates import normalise_vendor
+from services.analysis.stats import claim_history_update
+from shared.models import GraphNode, GraphEdge, GraphComponent
+
+CUSTOMER = "customer"
+COUNTERPARTY = "counterparty"
+# merges relabel nodes outside the statement's neighbourhood, so graph writes take this
+# transaction-scoped advisory lock; each holds it for a handful of index probes
+GRAPH_LOCK_KEY = 0x6772617068
+# counterparties listed per cluster, most customers first
+CLUSTER_HUBS = 10
+# keep IN lists well under asyncpg's bind parameter limit
+_LOOKUP_CHUNK = 5000
+
+
+@dataclass
+class Activity:
+    """One statement's dealings with one counterparty"""
+    transactions: int = 0
+    inflow: Decimal = Decimal("0")
+    outflow: Decimal = Decimal("0")
+    first_seen: Optional[date] = None
+    last_seen: Optional[date] = None
+
+    def add(self, day: date, amount: Decimal):
+        self.transactions += 1
+        if amount > 0:
+            self.inflow += amount
+        else:
+            self.outflow -= amount
+        self.first_seen = min(self.first_seen or day, day)
+        self.last_seen = max(self.last_seen or day, day)
+
+
+@dataclass
+class ComponentStats:
+    customers: int = 0
+    counterparties: int = 0
+    edges: int = 0
+    shared_counterparties: int = 0
+    max_counterparty_degree: int = 0
+
+    @property
+    def size(self) -> int:
+        return self.customers + self.counterparties
+
+    def merge(self, other: "ComponentStats") -> "ComponentStats":
+        return ComponentStats(
+            self.customers + other.customers,
+            self.counterparties + other.counterparties,
+            self.edges + other.edges,
+            self.shared_counterparties + other.shared_counterparties,
+            max(self.max_counterparty_degree, other.max_counterparty_degree),
+        )
+
+    @classmethod
+    def from_row(cls, row: GraphComponent) -> "ComponentStats":
+        return cls(**{f.name: getattr(row, f.name) for f in fields(cls)})
+
+
+def counterparty_activity(transactions: Iterable,
+                          categories: Iterable[str] = GRAPH_COUNTERPARTY_CATEGORIES) -> dict[str, Activity]:
+    categories = set(categories)
+    activity: dict[str, Activity] = {}
+    for t in transactions:
+        if t.category is not None and t.category not in categories:
+            continue
+        key = t.normalized_vendor or normalise_vendor(t.vendor)
+        if key:
+            activity.setdefault(key, Activity()).add(t.date.date(), t.amount)
+    return activity
+
+
+def merge_plan(components: dict[int, ComponentStats]) -> tuple[int, list[int], ComponentStats]:
+    """The component that keeps its id, the ones relabelled into it, and the merged stats"""
+    keep = max(components, key=lambda c: (components[c].size, -c))
+    absorbed = sorted(c for c in components if c != keep)
+    merged = components[keep]
+    for c in absorbed:
+        merged = merged.merge(components[c])
+    return keep, absorbed, merged
+
+
+async def _nodes(session: AsyncSession, customer_id: str,
+                 counterparties: list[str]) -> dict[tuple[str, str], GraphNode]:
+    """The statement's customer and counterparty nodes, missing ones created in components of their own"""
+    wanted = [(CUSTOMER, customer_id)] + [(COUNTERPARTY, key) for key in counterparties]
+    result = await session.execute(select(GraphNode).where(GraphNode.kind == CUSTOMER, GraphNode.key == customer_id))
+    nodes = {(n.kind, n.key): n for n in result.scalars()}
+    for i in range(0, len(counterparties), _LOOKUP_CHUNK):
+        result = await session.execute(select(GraphNode).where(
+            GraphNode.kind == COUNTERPARTY, GraphNode.key.in_(counterparties[i:i + _LOOKUP_CHUNK]),
+        ))
+        nodes.update({(n.kind, n.key): n for n in result.scalars()})
+
+    missing = [k for k in wanted if k not in nodes]
+    if missing:
+        component_ids = (await session.execute(
+            insert(GraphComponent).returning(GraphComponent.id, sort_by_parameter_order=True),
+            [dict(customers=int(kind == CUSTOMER), counterparties=int(kind == COUNTERPARTY), edges=0,
+                  shared_counterparties=0, max_counterparty_degree=0) for kind, _ in missing],
+        )).scalars().all()
+        created = (await session.execute(
+            insert(GraphNode).returning(GraphNode, sort_by_parameter_order=True),
+            [dict(kind=kind, key=key, component_id=c, degree=0) for (kind, key), c in zip(missing, component_ids)],
+        )).scalars().all()
+        nodes.update({(n.kind, n.key): n for n in created})
+    return nodes
+
+
+async def update_graph(session: AsyncSession, customer_id: str, job_id: str,
+                       activity: dict[str, Activity]) -> Optional[ComponentStats]:
+    """
+    Add one statement's counterparties in the caller's transaction, returns
+    the customer's component after it. A job already added is left out of
+    the edge sums, its customer's component is returned as it stands.
+    """
+    if not activity:
+        return None
+    if not await claim_history_update(session, job_id, "counterparty_graph"):
+        row = (await session.execute(
+            select(GraphComponent)
+            .join(GraphNode, GraphNode.component_id == GraphComponent.id)
+            .where(GraphNode.kind == CUSTOMER, GraphNode.key == customer_id)
+        )).scalar_one_or_none()
+        return ComponentStats.from_row(row) if row else None
+    await session.execute(select(func.pg_advisory_xact_lock(GRAPH_LOCK_KEY)))
+
+    nodes = await _nodes(session, customer_id, list(activity))
+    customer = nodes[(CUSTOMER, customer_id)]
+    by_id = {nodes[(COUNTERPARTY, key)].id: key for key in activity}
+
+    # a customer's own edges are few, reading all of them beats an IN list of this statement's
+    linked = set((await session.execute(
+        select(GraphEdge.counterparty_node_id).where(GraphEdge.customer_node_id == customer.id)
+    )).scalars())
+
+    stmt = insert(GraphEdge)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["customer_node_id", "counterparty_node_id"],
+            set_={
+                "transactions": GraphEdge.transactions + stmt.excluded.transactions,
+                "inflow": GraphEdge.inflow + stmt.excluded.inflow,
+                "outflow": GraphEdge.outflow + stmt.excluded.outflow,
+                "first_seen": func.least(GraphEdge.first_seen, stmt.excluded.first_seen),
+                "last_seen": func.greatest(GraphEdge.last_seen, stmt.excluded.last_seen),
+            },
+        ),
+        [dict(customer_node_id=customer.id, counterparty_node_id=node_id, **asdict(activity[key]))
+         for node_id, key in by_id.items()],
+    )
+
+    new = [node_id for node_id in by_id if node_id not in linked]
+    if not new:
+        row = await session.get(GraphComponent, customer.component_id)
+        return ComponentStats.from_row(row)
+
+    await session.execute(
+        update(GraphNode).where(GraphNode.id == customer.id).values(degree=GraphNode.degree + len(new))
+    )
+    degrees = []
+    for i in range(0, len(new), _LOOKUP_CHUNK):
+        degrees.extend((await session.execute(
+            update(GraphNode).where(GraphNode.id.in_(new[i:i + _LOOKUP_CHUNK])).values(degree=GraphNode.degree + 1)
+            .returning(GraphNode.degree, GraphNode.component_id)
+        )).all())
+
+    involved = {customer.component_id} | {component_id for _, component_id in degrees}
+    rows = (await session.execute(
+        select(GraphComponent).where(GraphComponent.id.in_(involved))
+    )).scalars().all()
+    keep, absorbed, merged = merge_plan({row.id: ComponentStats.from_row(row) for row in rows})
+    merged.edges += len(new)
+    merged.shared_counterparties += sum(1 for degree, _ in degrees if degree == 2)
+    merged.max_counterparty_degree = max(merged.max_counterparty_degree, *(degree for degree, _ in degrees))
+
+    if absorbed:
+        await session.execute(
+            update(GraphNode).where(GraphNode.component_id.in_(absorbed)).values(component_id=keep)
+        )
+        await session.execute(delete(GraphComponent).where(GraphComponent.id.in_(absorbed)))
+    await session.execute(update(GraphComponent).where(GraphComponent.id == keep).values(**asdict(merged)))
+    return merged
+
+
+async def _describe(session: AsyncSession, components: list[GraphComponent]) -> list[dict]:
+    if not components:
+        return []
+    result = await session.execute(
+        select(GraphNode)
+        .where(GraphNode.component_id.in_([c.id for c in components]))
+        .where((GraphNode.kind == CUSTOMER) | (GraphNode.degree >= 2))
+        .order_by(GraphNode.degree.desc(), GraphNode.key)
+    )
+    members: dict[int, dict[str, list]] = {c.id: {CUSTOMER: [], COUNTERPARTY: []} for c in components}
+    for node in result.scalars():
+        members[node.component_id][node.kind].append(node)
+
+    return [
+        {
+            "component_id": c.id,
+            **asdict(ComponentStats.from_row(c)),
+            "customer_ids": sorted(n.key for n in members[c.id][CUSTOMER]),
+            "shared_counterparties_top": [
+                {"counterparty": n.key, "customers": n.degree} for n in members[c.id][COUNTERPARTY][:CLUSTER_HUBS]
+            ],
+        }
+        for c in components
+    ]
+
+
+async def risky_clusters(session: AsyncSession, min_customers: int = GRAPH_CLUSTER_MIN_CUSTOMERS,
+                         min_shared: int = 1, limit: int = 20) -> list[dict]:
+    """Components linking at least `min_customers` customers through shared counterparties, most shared first"""
+    result = await session.execute(
+        select(GraphComponent)
+        .where(GraphComponent.customers >= min_customers, GraphComponent.shared_counterparties >= min_shared)
+        .order_by(GraphComponent.shared_counterparties.desc(), GraphComponent.customers.desc())
+        .limit(limit)
+    )
+    return await _describe(session, result.scalars().all())
+
+
+async def customer_cluster(session: AsyncSession, customer_id: str) -> Optional[dict]:
+    result = await session.execute(
+        select(GraphComponent)
+        .join(GraphNode, GraphNode.component_id == GraphComponent.id)
+        .where(GraphNode.kind == CUSTOMER, GraphNode.key == customer_id)
+    )
+    described = await _describe(session, result.scalars().all())
+    return described[0] if described else None
+
+
+async def _run(args):
+    from shared.db import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        if args.command == "clusters":
+            return await risky_clusters(session, args.min_customers, args.min_shared, args.limit)
+        return await customer_cluster(session, args.customer_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the cross-customer counterparty graph")
+    sub = parser.add_subparsers(dest="command", required=True)
+    clusters = sub.add_parser("clusters", help="components linking several customers through shared counterparties")
+    clusters.add_argument("--min-customers", type=int, default=GRAPH_CLUSTER_MIN_CUSTOMERS)
+    clusters.add_argument("--min-shared", type=int, default=1)
+    clusters.add_argument("--limit", type=int, default=20)
+    customer = sub.add_parser("customer", help="the component a customer belongs to")
+    customer.add_argument("customer_id")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(_run(args)), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
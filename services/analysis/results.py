@@ -0,0 +1,66 @@
+import json
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.models import AnalysisResult
+
+# flags and fields the worker adds from the customer's stored history (continuity, duplicates,
+# counterparty graph); perform_analysis alone can't reproduce them, so a re-analysis keeps the stored ones
+HISTORY_FLAG_TYPES = {
+    "statement_balance_gap", "statement_period_overlap", "duplicate_transaction", "near_duplicate_transaction",
+}
+HISTORY_FIELDS = ("counterparty_cluster",)
+
+
+def result_row(job_id: str, customer_id: str, results: dict, source: str) -> dict:
+    # round-trip through the same encoding the job events use, so Decimals and dates become JSON values
+    results = json.loads(json.dumps(results, default=str))
+    return dict(
+        job_id=job_id,
+        customer_id=customer_id,
+        source=source,
+        hard_flags=len(results["alerts"]["hard_flags"]),
+        soft_flags=len(results["alerts"]["soft_flags"]),
+        results=results,
+    )
+
+
+async def upsert_results(session: AsyncSession, rows: list[dict]):
+    """Insert or replace each job's latest result, one executemany for the lot"""
+    if not rows:
+        return
+    stmt = insert(AnalysisResult)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["job_id"],
+            set_={
+                "customer_id": stmt.excluded.customer_id,
+                "source": stmt.excluded.source,
+                "hard_flags": stmt.excluded.hard_flags,
+                "soft_flags": stmt.excluded.soft_flags,
+                "results": stmt.excluded.results,
+                "analysed_at": stmt.excluded.analysed_at,
+            },
+        ),
+        rows,
+    )
+
+
+async def load_results(session: AsyncSession, job_ids: list[str]) -> dict[str, dict]:
+    result = await session.execute(
+        select(AnalysisResult.job_id, AnalysisResult.results).where(AnalysisResult.job_id.in_(job_ids))
+    )
+    return {job_id: results for job_id, results in result.all()}
+
+
+def carry_history(results: dict, previous: dict) -> dict:
+    """Copy the history-based flags and fields of a job's stored result into its re-analysis"""
+    for severity in ("hard_flags", "soft_flags"):
+        carried = [f for f in previous["alerts"][severity] if f.get("type") in HISTORY_FLAG_TYPES]
+        results["alerts"][severity].extend(carried)
+    for key in HISTORY_FIELDS:
+        if key in previous:
+            results[key] = previous[key]
+    return results
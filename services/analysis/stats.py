@@ -0,0 +1,100 @@
+import math
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.models import CustomerStats, HistoryUpdate
+
+
+@dataclass
+class RunningStats:
+    """
+    Count, mean and sum of squared deviations (M2), updated one value at a
+    time with Welford's method and combined across documents with Chan's
+    parallel formula, so a customer's history never has to be re-read.
+    """
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    @classmethod
+    def from_values(cls, values: Iterable[float]) -> "RunningStats":
+        stats = cls()
+        for value in values:
+            stats.add(value)
+        return stats
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        if not other.count:
+            return RunningStats(self.count, self.mean, self.m2)
+        if not self.count:
+            return RunningStats(other.count, other.mean, other.m2)
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        return RunningStats(
+            count=count,
+            mean=self.mean + delta * other.count / count,
+            m2=self.m2 + other.m2 + delta * delta * self.count * other.count / count,
+        )
+
+    @property
+    def variance(self) -> float:
+        # sample variance, the same as statistics.stdev on the raw values
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(max(self.variance, 0.0))
+
+
+async def load_customer_stats(session: AsyncSession, customer_id: str) -> Optional[RunningStats]:
+    result = await session.execute(select(CustomerStats).where(CustomerStats.customer_id == customer_id))
+    row = result.scalar_one_or_none()
+    return RunningStats(row.count, row.mean, row.m2) if row else None
+
+
+async def claim_history_update(session: AsyncSession, job_id: str, history: str) -> bool:
+    """
+    Mark the job as folded into `history`, False if an earlier delivery of
+    it already was. A concurrent claim waits on the row until the first commits.
+    """
+    result = await session.execute(
+        insert(HistoryUpdate)
+        .values(job_id=job_id, history=history)
+        .on_conflict_do_nothing(index_elements=["job_id", "history"])
+        .returning(HistoryUpdate.job_id)
+    )
+    return result.first() is not None
+
+
+async def merge_customer_stats(session: AsyncSession, customer_id: str, job_id: str,
+                               stats: RunningStats) -> Optional[RunningStats]:
+    """
+    Fold one document's stats into the stored ones, the row lock serialises
+    concurrent workers. None if the job was folded in before.
+    """
+    if not await claim_history_update(session, job_id, "customer_stats"):
+        return None
+    await session.execute(
+        insert(CustomerStats)
+        .values(customer_id=customer_id, count=0, mean=0.0, m2=0.0)
+        .on_conflict_do_nothing(index_elements=["customer_id"])
+    )
+    result = await session.execute(
+        select(CustomerStats).where(CustomerStats.customer_id == customer_id).with_for_update()
+    )
+    row = result.scalar_one()
+
+    merged = RunningStats(row.count, row.mean, row.m2).merge(stats)
+    row.count, row.mean, row.m2 = merged.count, merged.mean, merged.m2
+    return merged
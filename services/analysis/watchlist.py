@@ -0,0 +1,222 @@
+"""
+Sanctions and PEP screening against a character trigram index.
+
+The index is built offline from a CSV list (entry_id, name, list, plus any
+other columns, which are kept as entry details):
+
+    python -m services.analysis.watchlist build sanctions.csv
+
+Names are reduced to their sorted canonical tokens (shared/matching.py),
+padded with spaces and cut into trigrams. Over an alphabet of 37 symbols a
+trigram is a number below 37**3, so the inverted index is three flat
+arrays: `offsets` indexed directly by trigram, `postings` holding each
+trigram's entries in id order, and `gram_counts` per entry. They're saved
+as .npy and memory-mapped.
+
+A query gathers candidates only from the postings of its rarest trigrams -
+an entry scoring at least the threshold on Dice similarity must share one
+of them (prefix filtering) - drops candidates whose trigram count rules
+them out, and counts the survivors' overlap with every query trigram by
+binary search in the postings, so a query touches a few hundred entries
+rather than the whole list.
+
+Each build goes to its own directory and CURRENT is replaced atomically to
+point at it; workers notice the change on their next screening and map the
+new index, so a rebuild needs no restart.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from services.analysis.config import WATCHLIST_INDEX_DIR
+from shared.matching import name_tokens
+
+ALPHABET = " 0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_SYMBOLS = {c: i for i, c in enumerate(ALPHABET)}
+VOCABULARY = len(ALPHABET) ** 3
+_TABLES = ("offsets", "postings", "gram_counts")
+# builds kept next to CURRENT, so a worker still mapping the previous one isn't left without files
+_KEEP_BUILDS = 2
+# slack on the filter bounds, so float error in t*q/(2-t) never drops an entry scoring exactly the threshold
+_SLACK = 1e-9
+
+
+def trigrams(name: str) -> np.ndarray:
+    """Sorted unique trigram codes of a name's canonical form"""
+    text = f" {' '.join(sorted(name_tokens(name)))} "
+    if len(text) < 3 or not text.strip():
+        return np.empty(0, dtype=np.int32)
+    codes = [_SYMBOLS[c] for c in text]
+    width = len(ALPHABET)
+    return np.unique(np.array(
+        [(codes[i] * width + codes[i + 1]) * width + codes[i + 2] for i in range(len(codes) - 2)],
+        dtype=np.int32,
+    ))
+
+
+@dataclass
+class WatchlistHit:
+    entry: dict
+    score: float
+
+
+def load_list(path: str) -> list[dict]:
+    with open(path, newline="") as f:
+        return [row for row in csv.DictReader(f) if row.get("name", "").strip()]
+
+
+def build_index(entries: list[dict], directory: str = WATCHLIST_INDEX_DIR) -> str:
+    """Write a new index build and point CURRENT at it, returns the build's directory"""
+    grams = [trigrams(e["name"]) for e in entries]
+    counts = np.array([len(g) for g in grams], dtype=np.int32)
+    all_grams = np.concatenate(grams) if grams else np.empty(0, dtype=np.int32)
+    entry_ids = np.repeat(np.arange(len(entries), dtype=np.int32), counts)
+
+    # stable sort keeps each trigram's postings in entry order, which the queries binary search
+    order = np.argsort(all_grams, kind="stable")
+    postings = entry_ids[order]
+    offsets = np.zeros(VOCABULARY + 1, dtype=np.int64)
+    np.cumsum(np.bincount(all_grams, minlength=VOCABULARY), out=offsets[1:])
+
+    digest = hashlib.sha256(json.dumps(entries, sort_keys=True).encode()).hexdigest()[:16]
+    os.makedirs(directory, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=directory, prefix=".build-")
+    target = os.path.join(directory, digest)
+    try:
+        for name, table in (("offsets", offsets), ("postings", postings), ("gram_counts", counts)):
+            np.save(os.path.join(staging, f"{name}.npy"), table)
+        with open(os.path.join(staging, "entries.json"), "w") as f:
+            json.dump(entries, f)
+        if not os.path.exists(target):
+            os.rename(staging, target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    pointer = os.path.join(directory, "CURRENT")
+    with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as f:
+        f.write(digest)
+    os.replace(f.name, pointer)
+    _prune(directory, keep=digest)
+    return target
+
+
+def _prune(directory: str, keep: str):
+    builds = sorted(
+        (os.path.join(directory, d) for d in os.listdir(directory)
+         if d != keep and not d.startswith(".") and os.path.isdir(os.path.join(directory, d))),
+        key=os.path.getmtime, reverse=True,
+    )
+    for old in builds[_KEEP_BUILDS - 1:]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+class WatchlistIndex:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.offsets, self.postings, self.gram_counts = (
+            np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in _TABLES
+        )
+        with open(os.path.join(directory, "entries.json")) as f:
+            self.entries = json.load(f)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, name: str, threshold: float) -> list[WatchlistHit]:
+        """Entries whose trigram Dice similarity with the name is at least `threshold`, best first"""
+        grams = trigrams(name)
+        q = len(grams)
+        if not q or not len(self.entries):
+            return []
+
+        starts = np.asarray(self.offsets[grams])
+        ends = np.asarray(self.offsets[grams + 1])
+        # a candidate needs at least min_overlap shared trigrams, so it must hold one of the q - min_overlap + 1 rarest
+        min_overlap = math.ceil(threshold * q / (2 - threshold) - _SLACK)
+        order = np.argsort(ends - starts, kind="stable")
+        prefix = q - min_overlap + 1
+        candidates, overlap = np.unique(
+            np.concatenate([self.postings[starts[i]:ends[i]] for i in order[:prefix]]), return_counts=True,
+        )
+
+        # Dice >= t bounds the candidate's own trigram count to [t*q/(2-t), q*(2-t)/t]
+        counts = np.asarray(self.gram_counts[candidates])
+        keep = (counts >= threshold * q / (2 - threshold) - _SLACK) & (counts <= q * (2 - threshold) / threshold + _SLACK)
+        candidates, counts, overlap = candidates[keep], counts[keep], overlap[keep]
+        needed = threshold * (q + counts) / 2 - _SLACK
+
+        # the remaining lists, rarest first, dropping candidates that can no longer reach their needed overlap
+        for left, i in enumerate(order[prefix:]):
+            keep = overlap + (q - prefix - left) >= needed
+            candidates, counts, overlap, needed = candidates[keep], counts[keep], overlap[keep], needed[keep]
+            if not len(candidates):
+                return []
+            posting = self.postings[starts[i]:ends[i]]
+            if not len(posting):
+                continue
+            at = np.minimum(np.searchsorted(posting, candidates), len(posting) - 1)
+            overlap += posting[at] == candidates
+
+        scores = 2 * overlap / (q + counts)
+        found = np.flatnonzero(scores >= threshold - _SLACK)
+        return sorted(
+            (WatchlistHit(self.entries[candidates[i]], round(float(scores[i]), 3)) for i in found),
+            key=lambda hit: -hit.score,
+        )
+
+
+class WatchlistRegistry:
+    """The index CURRENT points at, remapped when a rebuild replaces CURRENT"""
+
+    def __init__(self, directory: str = WATCHLIST_INDEX_DIR):
+        self.directory = directory
+        self._mtime: Optional[int] = None
+        self._index: Optional[WatchlistIndex] = None
+        self._warned = False
+
+    def index(self) -> Optional[WatchlistIndex]:
+        pointer = os.path.join(self.directory, "CURRENT")
+        try:
+            mtime = os.stat(pointer).st_mtime_ns
+        except FileNotFoundError:
+            if not self._warned:
+                print(f"[!] [watchlist] No index in {self.directory}, screening is off until one is built")
+                self._warned = True
+            return self._index
+
+        if mtime != self._mtime:
+            with open(pointer) as f:
+                build = f.read().strip()
+            self._index = WatchlistIndex(os.path.join(self.directory, build))
+            self._mtime = mtime
+            print(f"[*] [watchlist] Mapped {len(self._index)} entries from build {build}")
+        return self._index
+
+
+registry = WatchlistRegistry()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the watchlist screening index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="index a CSV list with entry_id, name and list columns")
+    build.add_argument("source")
+    build.add_argument("--out", default=WATCHLIST_INDEX_DIR)
+    args = parser.parse_args()
+
+    entries = load_list(args.source)
+    target = build_index(entries, args.out)
+    print(f"[+] Indexed {len(entries)} entries into {target}")
+
+
+if __name__ == "__main__":
+    main()
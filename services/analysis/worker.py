@@ -2,161 +2,131 @@ import asyncio
 import aio_pika
 import json
 import os
-import statistics
-from decimal import Decimal
+from dataclasses import asdict
 from sqlalchemy import update
 from shared.db import AsyncSessionLocal
 from shared.models import Job, JobEvent
-from models.models import AnalysisResponse, Document, Customer
-from services.analysis.config import DEBUG, SOFT_FLAG_EPSILON, RABBITMQ_URL, INPUT_QUEUE, OUTPUT_QUEUE
+from models.models import Document
+from services.analysis.core import perform_analysis
+from services.analysis.stats import RunningStats, load_customer_stats, merge_customer_stats
+from services.analysis.continuity import StatementEntry, find_neighbours, record_statement, check_continuity
+from services.analysis.duplicates import transaction_keys, find_duplicates, record_transactions
+from services.analysis.graph import counterparty_activity, update_graph
+from services.analysis.results import result_row, upsert_results
+from services.analysis.config import DEBUG, RABBITMQ_URL, INPUT_QUEUE, OUTPUT_QUEUE, METRICS_PORT
+from shared.metrics import (
+    JOBS_PROCESSED, stage_timer, track_in_flight,
+    publish_headers, observe_queue_lag, start_metrics_server,
+)
+from shared.profiling import JobProfiler, listen_for_control
+from shared.tracing import init_tracing, start_span, inject_trace_context, extract_trace_context
 
 WORKER_NAME = os.getenv('HOSTNAME', 'analysis_worker_local')
+profiler = JobProfiler("analysis", WORKER_NAME)
 
 async def update_job_status(job_id: str, status: str, message: str = None):
 
-    async with AsyncSessionLocal() as session:
-        async with session.begin():
+    with stage_timer("analysis", "db_write"), start_span("update_job_status", status=status):
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
 
-            await session.execute(
-                update(Job).where(Job.job_id == job_id).values(current_status=status)
-            )
-
-            event = JobEvent(
-                job_id=job_id, 
-                status=status, 
-                message=message,
-                worker_name=WORKER_NAME
-            )
-            session.add(event)
-
-async def perform_analysis(data: dict) -> dict:
-    customer = Customer(**data['customer'])
-    doc = Document(**data['document'])
-    transactions = doc.transactions
-
-    hard_flags = []
-    
-    total_inflow = sum(t.amount for t in transactions if t.amount > 0)
-    total_outflow = sum(t.amount for t in transactions if t.amount < 0)
-    net_change = total_inflow + total_outflow
-    avg_daily_balance = sum(t.balance for t in transactions) / Decimal(len(transactions)) if transactions else Decimal(0)
-
-    # hard flags
-    
-    # name mismatch
-    if customer.name != doc.customer_name:
-        hard_flags.append({
-            "type": "name_mismatch",
-            "customer_profile_name": customer.name,
-            "document_name": doc.customer_name,
-        })
-
-    # address mismatch
-    if customer.address != doc.customer_address:
-        hard_flags.append({
-            "type": "address_mismatch",
-            "customer_profile_address": customer.address,
-            "document_address": doc.customer_address,
-        })
-
-    # balance mismatch
-    transactions_sorted = sorted(transactions, key=lambda t: t.date)
-    for i, t in enumerate(transactions):
-        if i == 0: continue
-        prev = transactions_sorted[i-1]
-
-        expected_balance = prev.balance + t.amount
-        if expected_balance != t.balance:
-            hard_flags.append({
-                "type": "balance_mismatch",
-                "date": t.date.isoformat(),
-                "vendor": t.vendor,
-                "transaction_id": t.transaction_id,
-                "expected_balance": expected_balance,
-                "actual_balance": t.balance,
-            })
-
-    # soft flags
-    amounts = [t.amount for t in transactions]
-    if len(amounts) > 1:
-        mean_amt = statistics.mean(amounts)
-        std_amt = statistics.stdev(amounts)
-    else:
-        mean_amt = amounts[0] if amounts else 0
-        std_amt = 0
-
-    soft_flags = [
-        {
-            "type": "std_dev_outlier",
-            "transaction_id": t.transaction_id,
-            "amount": t.amount,
-            "date": t.date,
-            "vendor": t.vendor,
-            "std_dev_deviation": deviation,
-            "std_dev_threshold": SOFT_FLAG_EPSILON
-        }
-        for i, t in enumerate(transactions, start=1)
-        if std_amt > 0
-        and (deviation := round(abs(t.amount - mean_amt) / std_amt, 2)) > Decimal(SOFT_FLAG_EPSILON)
-    ]
-
-    response_data = AnalysisResponse(
-        customer=customer,
-        filename=doc.filename,
-        summary={
-            "total_inflow": total_inflow,
-            "total_outflow": total_outflow,
-            "net_change": net_change,
-            "avg_daily_balance": avg_daily_balance,
-        },
-        alerts={
-            "soft_flags": soft_flags, 
-            "hard_flags": hard_flags,
-        }
-    )
+                await session.execute(
+                    update(Job).where(Job.job_id == job_id).values(current_status=status)
+                )
 
-    return response_data.dict()
+                event = JobEvent(
+                    job_id=job_id, 
+                    status=status, 
+                    message=message,
+                    worker_name=WORKER_NAME
+                )
+                session.add(event)
 
 async def process_message(message: aio_pika.IncomingMessage):
-    async with message.process():
+    async with message.process(), track_in_flight("analysis"):
+        observe_queue_lag("analysis", INPUT_QUEUE, message.headers)
         job_id = message.correlation_id
         body = json.loads(message.body.decode())
+        profiler.tag(transactions=len(body['document']['transactions']))
+
+        with start_span("process_message", parent=extract_trace_context(message.headers), job_id=job_id) as span:
+            print(f"[*] [{WORKER_NAME}] Analyzing: {body['customer']['name']}")
+            await update_job_status(job_id, "ANALYSIS_STARTED")
         
-        print(f"[*] [{WORKER_NAME}] Analyzing: {body['customer']['name']}")
-        await update_job_status(job_id, "ANALYSIS_STARTED")
-        
-        try:
-            results = await perform_analysis(body)
+            try:
+                customer_id = body['customer']['customer_id']
+                with stage_timer("analysis", "stats_read"), start_span("load_customer_stats"):
+                    async with AsyncSessionLocal() as session:
+                        history = await load_customer_stats(session, customer_id)
+
+                with stage_timer("analysis", "analysis"), start_span("perform_analysis"):
+                    results = await perform_analysis(body, history)
+
+                with stage_timer("analysis", "duplicate_keys"), start_span("transaction_keys"):
+                    transactions = Document(**body['document']).transactions
+                    keys = transaction_keys(transactions)
+                with stage_timer("analysis", "counterparty_activity"), start_span("counterparty_activity"):
+                    activity = counterparty_activity(transactions)
+
+                with stage_timer("analysis", "history_write"), start_span("update_customer_history"):
+                    async with AsyncSessionLocal() as session:
+                        async with session.begin():
+                            await merge_customer_stats(
+                                session, customer_id, job_id, RunningStats(**results["amount_stats"]["document"])
+                            )
+                            if results["statement"]:
+                                entry = StatementEntry(job_id=job_id, **results["statement"])
+                                previous, following = await find_neighbours(session, customer_id, entry)
+                                results["alerts"]["hard_flags"].extend(check_continuity(entry, previous, following))
+                                await record_statement(session, customer_id, entry)
+                            duplicates, near_duplicates = await find_duplicates(session, customer_id, job_id, keys)
+                            results["alerts"]["hard_flags"].extend(duplicates)
+                            results["alerts"]["soft_flags"].extend(near_duplicates)
+                            await record_transactions(session, customer_id, job_id, keys)
+                            cluster = await update_graph(session, customer_id, job_id, activity)
+                            if cluster:
+                                results["counterparty_cluster"] = asdict(cluster)
+                            await upsert_results(session, [result_row(job_id, customer_id, results, "worker")])
             
-            print(f"[+] [{WORKER_NAME}] [{job_id}] Analysis finished.")
-            await update_job_status(job_id, "ANALYSIS_SUCCESS", json.dumps(results, default=str))
-
-            connection = await aio_pika.connect_robust(RABBITMQ_URL)
-            async with connection:
-                channel = await connection.channel()
-                await channel.declare_queue(OUTPUT_QUEUE, durable=True)
-                await channel.default_exchange.publish(
-                    aio_pika.Message(
-                        body=json.dumps(results, default=str).encode(),
-                        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
-                        correlation_id=job_id
-                    ),
-                    routing_key=OUTPUT_QUEUE
-                )
-
-        except Exception as e:
-            print(f"[!] [{WORKER_NAME}] [{job_id}] Analysis error: {e}")
-            await update_job_status(job_id, "ANALYSIS_FAILED", str(e))
+                print(f"[+] [{WORKER_NAME}] [{job_id}] Analysis finished.")
+                await update_job_status(job_id, "ANALYSIS_SUCCESS", json.dumps(results, default=str))
+
+                with stage_timer("analysis", "publish"), start_span("publish"):
+                    connection = await aio_pika.connect_robust(RABBITMQ_URL)
+                    async with connection:
+                        channel = await connection.channel()
+                        await channel.declare_queue(OUTPUT_QUEUE, durable=True)
+                        await channel.default_exchange.publish(
+                            aio_pika.Message(
+                                body=json.dumps(results, default=str).encode(),
+                                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                                correlation_id=job_id,
+                                headers=inject_trace_context(publish_headers())
+                            ),
+                            routing_key=OUTPUT_QUEUE
+                        )
+                JOBS_PROCESSED.labels("analysis", "success").inc()
+
+            except Exception as e:
+                print(f"[!] [{WORKER_NAME}] [{job_id}] Analysis error: {e}")
+                span.status = "error"
+                await update_job_status(job_id, "ANALYSIS_FAILED", str(e))
+                JOBS_PROCESSED.labels("analysis", "failed").inc()
 
 async def main():
+    if not RABBITMQ_URL:
+        raise ValueError("ERROR: RABBITMQ_URL environment variable not set")
+    init_tracing("analysis")
+    start_metrics_server(METRICS_PORT)
     connection = await aio_pika.connect_robust(RABBITMQ_URL)
     async with connection:
         channel = await connection.channel()
         await channel.set_qos(prefetch_count=1)
+        await listen_for_control(connection, profiler)
         queue = await channel.declare_queue(INPUT_QUEUE, durable=True)
         
         print(f" [*] [{WORKER_NAME}] Analysis Worker active. Listening on {INPUT_QUEUE}...")
-        await queue.consume(process_message)
+        await queue.consume(profiler.wrap(process_message))
         
         await asyncio.Future()
 
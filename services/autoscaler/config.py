@@ -0,0 +1,32 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEBUG = os.getenv("DEBUG") == "True"
+
+RABBITMQ_MANAGEMENT_URL = os.getenv("RABBITMQ_MANAGEMENT_URL", "http://rabbitmq:15672")
+RABBITMQ_MANAGEMENT_USER = os.getenv("RABBITMQ_MANAGEMENT_USER", "guest")
+RABBITMQ_MANAGEMENT_PASSWORD = os.getenv("RABBITMQ_MANAGEMENT_PASSWORD", "guest")
+RABBITMQ_VHOST = os.getenv("RABBITMQ_VHOST", "/")
+
+# queues feeding each worker fleet (extraction also has the _fast and _bulk lanes)
+EXTRACTED_DATA_QUEUE = os.getenv("EXTRACTED_DATA_QUEUE") or "extracted_data_queue"
+ANALYSIS_RESULTS_QUEUE = os.getenv("ANALYSIS_RESULTS_QUEUE") or "analysis_results_queue"
+
+AUTOSCALER_INTERVAL_S = float(os.getenv("AUTOSCALER_INTERVAL_S", "15"))
+# replicas are sized so workers are busy this share of the time at the current arrival rate...
+AUTOSCALER_TARGET_UTILISATION = float(os.getenv("AUTOSCALER_TARGET_UTILISATION", "0.7"))
+# ...plus enough to clear the current backlog within this many seconds
+AUTOSCALER_DRAIN_SECONDS = float(os.getenv("AUTOSCALER_DRAIN_SECONDS", "300"))
+AUTOSCALER_MIN_REPLICAS = int(os.getenv("AUTOSCALER_MIN_REPLICAS", "1"))
+AUTOSCALER_MAX_REPLICAS = int(os.getenv("AUTOSCALER_MAX_REPLICAS", "10"))
+# scale up straight away, scale down only to the highest recommendation seen in this window
+AUTOSCALER_SCALE_DOWN_WINDOW_S = float(os.getenv("AUTOSCALER_SCALE_DOWN_WINDOW_S", "300"))
+# per-job processing time is taken from job_events over this window
+AUTOSCALER_PROCESSING_WINDOW_S = float(os.getenv("AUTOSCALER_PROCESSING_WINDOW_S", "600"))
+# used until a stage has finished any jobs in the window
+AUTOSCALER_DEFAULT_SERVICE_TIME_S = float(os.getenv("AUTOSCALER_DEFAULT_SERVICE_TIME_S", "5"))
+
+# start and stop worker processes on this machine to match the recommendation
+AUTOSCALER_LOCAL_MODE = os.getenv("AUTOSCALER_LOCAL_MODE") == "True"
@@ -0,0 +1,48 @@
+import asyncio
+import os
+import sys
+
+from services.autoscaler.config import DEBUG
+
+
+class LocalFleet:
+    """
+    Worker processes on this machine, resized to match a replica count.
+
+    Each process gets its own HOSTNAME so job events show which one ran a
+    job, and METRICS_PORT=0 so they don't fight over the sidecar port.
+    Stopping sends SIGTERM to the newest processes first; a job they were
+    running is left unacked and goes back to its queue.
+    """
+
+    def __init__(self, stage: str, module: str = None):
+        self.stage = stage
+        self.module = module or f"services.{stage}.worker"
+        self.processes: list[asyncio.subprocess.Process] = []
+        self._started = 0
+
+    def running(self) -> int:
+        self.processes = [p for p in self.processes if p.returncode is None]
+        return len(self.processes)
+
+    async def scale_to(self, replicas: int):
+        current = self.running()
+
+        for _ in range(replicas - current):
+            self._started += 1
+            env = {**os.environ, "HOSTNAME": f"{self.stage}_local_{self._started}", "METRICS_PORT": "0"}
+            process = await asyncio.create_subprocess_exec(sys.executable, "-m", self.module, env=env)
+            self.processes.append(process)
+            print(f"[*] [autoscaler] Started {self.stage} worker pid {process.pid}")
+
+        for process in reversed(self.processes[replicas:]):
+            process.terminate()
+            await process.wait()
+            print(f"[*] [autoscaler] Stopped {self.stage} worker pid {process.pid}")
+        del self.processes[replicas:]
+
+        if DEBUG and current != replicas:
+            print(f"[*] [autoscaler] {self.stage}: {current} -> {replicas} local workers")
+
+    async def stop_all(self):
+        await self.scale_to(0)
@@ -0,0 +1,78 @@
+import asyncio
+from dataclasses import asdict
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from prometheus_client import make_asgi_app
+
+from shared.db import AsyncSessionLocal
+from services.autoscaler.config import (
+    RABBITMQ_MANAGEMENT_URL, RABBITMQ_MANAGEMENT_USER, RABBITMQ_MANAGEMENT_PASSWORD,
+    AUTOSCALER_INTERVAL_S, AUTOSCALER_LOCAL_MODE,
+)
+from services.autoscaler.local import LocalFleet
+from services.autoscaler.scaler import Autoscaler, Stage, recent_service_times
+
+app = FastAPI()
+app.mount("/metrics", make_asgi_app())
+
+state = {}
+
+
+async def service_times_from_db(stage: Stage) -> list[float]:
+    async with AsyncSessionLocal() as session:
+        return await recent_service_times(session, stage)
+
+
+async def control_loop(autoscaler: Autoscaler, fleets: dict[str, LocalFleet]):
+    while True:
+        try:
+            recommendations = await autoscaler.sample()
+            for stage, fleet in fleets.items():
+                await fleet.scale_to(recommendations[stage].replicas)
+        except Exception as e:
+            print(f"[!] [autoscaler] Sampling failed: {e}")
+        await asyncio.sleep(AUTOSCALER_INTERVAL_S)
+
+
+@app.on_event("startup")
+async def startup():
+    client = httpx.AsyncClient(
+        base_url=RABBITMQ_MANAGEMENT_URL,
+        auth=(RABBITMQ_MANAGEMENT_USER, RABBITMQ_MANAGEMENT_PASSWORD),
+        timeout=10,
+    )
+    autoscaler = Autoscaler(client, service_times=service_times_from_db)
+    fleets = {stage.name: LocalFleet(stage.name) for stage in autoscaler.stages} if AUTOSCALER_LOCAL_MODE else {}
+    state.update(
+        client=client,
+        autoscaler=autoscaler,
+        fleets=fleets,
+        task=asyncio.create_task(control_loop(autoscaler, fleets)),
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    state["task"].cancel()
+    for fleet in state["fleets"].values():
+        await fleet.stop_all()
+    await state["client"].aclose()
+
+
+@app.get("/recommendations")
+async def get_recommendations():
+    return {stage: asdict(r) for stage, r in state["autoscaler"].latest.items()}
+
+
+@app.get("/recommendations/{stage}")
+async def get_recommendation(stage: str):
+    recommendation = state["autoscaler"].latest.get(stage)
+    if not recommendation:
+        raise HTTPException(status_code=404, detail="No recommendation for this stage yet")
+    return asdict(recommendation)
+
+
+@app.get("/health")
+async def health_check():
+    return {"status": "ok", "service": "autoscaler", "local_mode": AUTOSCALER_LOCAL_MODE}
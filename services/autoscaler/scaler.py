@@ -0,0 +1,187 @@
+"""
+Replica recommendations for the worker fleets.
+
+Each worker runs one job at a time, so by Little's law a stage needs
+`arrival_rate x service_time` busy workers to keep up. The recommendation
+divides that by the target utilisation and adds enough workers to clear
+the current backlog within AUTOSCALER_DRAIN_SECONDS.
+"""
+import math
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from urllib.parse import quote
+
+import httpx
+from sqlalchemy import select
+
+from services.autoscaler.config import (
+    RABBITMQ_VHOST, EXTRACTED_DATA_QUEUE, ANALYSIS_RESULTS_QUEUE, AUTOSCALER_TARGET_UTILISATION,
+    AUTOSCALER_DRAIN_SECONDS, AUTOSCALER_MIN_REPLICAS, AUTOSCALER_MAX_REPLICAS,
+    AUTOSCALER_SCALE_DOWN_WINDOW_S, AUTOSCALER_PROCESSING_WINDOW_S, AUTOSCALER_DEFAULT_SERVICE_TIME_S,
+)
+from shared.config import SCHEDULER_QUEUE
+from shared.lanes import LANES, queue_for_lane
+from shared.models import JobEvent
+from shared.metrics import (
+    AUTOSCALER_RECOMMENDED_REPLICAS, AUTOSCALER_BACKLOG, AUTOSCALER_ARRIVAL_RATE, AUTOSCALER_SERVICE_TIME,
+)
+
+
+@dataclass
+class Stage:
+    name: str
+    queues: list[str]
+    # job_events statuses that open and close one job in this stage
+    started: str
+    finished: tuple[str, ...]
+    # queues holding jobs before they reach this stage's queues, counted in the backlog only
+    # since their publishes would count every job twice in the arrival rate
+    upstream: list[str] = field(default_factory=list)
+
+
+STAGES = [
+    Stage("extraction", [queue_for_lane(lane) for lane in LANES],
+          "EXTRACTION_STARTED", ("EXTRACTION_SUCCESS", "EXTRACTION_FAILED"), upstream=[SCHEDULER_QUEUE]),
+    Stage("analysis", [EXTRACTED_DATA_QUEUE], "ANALYSIS_STARTED", ("ANALYSIS_SUCCESS", "ANALYSIS_FAILED")),
+    Stage("report", [ANALYSIS_RESULTS_QUEUE], "REPORTING_STARTED", ("COMPLETED", "REPORTING_FAILED")),
+]
+
+
+@dataclass
+class QueueSample:
+    backlog: int = 0       # ready + unacknowledged
+    consumers: int = 0
+    publish_rate: float = 0.0
+    ack_rate: float = 0.0
+
+
+@dataclass
+class Recommendation:
+    stage: str
+    replicas: int
+    raw_replicas: int
+    backlog: int
+    consumers: int
+    arrival_rate: float
+    ack_rate: float
+    service_time_s: float
+    service_time_source: str
+    sampled_at: float = field(default_factory=time.time)
+
+
+def _rate(stats: dict, key: str) -> float:
+    return float(((stats or {}).get(key) or {}).get("rate") or 0.0)
+
+
+async def fetch_queue_samples(client: httpx.AsyncClient, queues: list[str], vhost: str = RABBITMQ_VHOST) -> QueueSample:
+    """Sum of the management API's numbers over the given queues, missing queues count as empty"""
+    total = QueueSample()
+    for queue in queues:
+        response = await client.get(f"/api/queues/{quote(vhost, safe='')}/{quote(queue, safe='')}")
+        if response.status_code == 404:
+            continue
+        response.raise_for_status()
+        data = response.json()
+        message_stats = data.get("message_stats") or {}
+        total.backlog += int(data.get("messages_ready") or 0) + int(data.get("messages_unacknowledged") or 0)
+        total.consumers += int(data.get("consumers") or 0)
+        total.publish_rate += _rate(message_stats, "publish_details")
+        total.ack_rate += _rate(message_stats, "ack_details")
+    return total
+
+
+async def recent_service_times(session, stage: Stage, window_s: float = AUTOSCALER_PROCESSING_WINDOW_S) -> list[float]:
+    """Seconds between a job's start and finish events for jobs finished in the window"""
+    since = datetime.utcnow() - timedelta(seconds=window_s)
+    result = await session.execute(
+        select(JobEvent.job_id, JobEvent.status, JobEvent.timestamp)
+        .where(JobEvent.timestamp >= since)
+        .where(JobEvent.status.in_((stage.started, *stage.finished)))
+        .order_by(JobEvent.timestamp)
+    )
+
+    started = {}
+    durations = []
+    for job_id, status, timestamp in result:
+        if status == stage.started:
+            started[job_id] = timestamp
+        elif job_id in started:
+            durations.append((timestamp - started.pop(job_id)).total_seconds())
+    return durations
+
+
+def recommend_replicas(arrival_rate: float, backlog: int, service_time_s: float,
+                       target_utilisation: float = AUTOSCALER_TARGET_UTILISATION,
+                       drain_seconds: float = AUTOSCALER_DRAIN_SECONDS) -> int:
+    steady = arrival_rate * service_time_s / target_utilisation
+    drain = backlog * service_time_s / drain_seconds
+    return math.ceil(steady + drain)
+
+
+class Autoscaler:
+    def __init__(self, client: httpx.AsyncClient,
+                 service_times: Optional[Callable[[Stage], Awaitable[list[float]]]] = None,
+                 stages: list[Stage] = STAGES,
+                 min_replicas: int = AUTOSCALER_MIN_REPLICAS, max_replicas: int = AUTOSCALER_MAX_REPLICAS,
+                 scale_down_window_s: float = AUTOSCALER_SCALE_DOWN_WINDOW_S):
+        self.client = client
+        self.service_times = service_times
+        self.stages = stages
+        self.min_replicas = min_replicas
+        self.max_replicas = max_replicas
+        self.scale_down_window_s = scale_down_window_s
+        self.latest: dict[str, Recommendation] = {}
+        self._history = {stage.name: deque() for stage in stages}
+
+    async def _service_time(self, stage: Stage, sample: QueueSample) -> tuple[float, str]:
+        if self.service_times:
+            durations = await self.service_times(stage)
+            if durations:
+                return statistics.median(durations), "job_events"
+        # busy consumers finishing ack_rate jobs a second between them
+        if sample.ack_rate > 0 and sample.consumers:
+            return sample.consumers / sample.ack_rate, "ack_rate"
+        return AUTOSCALER_DEFAULT_SERVICE_TIME_S, "default"
+
+    def _stabilise(self, stage: str, raw: int, now: float) -> int:
+        """Follow increases at once, decreases only once they have held for the whole window"""
+        history = self._history[stage]
+        history.append((now, raw))
+        while history and now - history[0][0] > self.scale_down_window_s:
+            history.popleft()
+        return max(value for _, value in history)
+
+    async def sample(self, now: Optional[float] = None) -> dict[str, Recommendation]:
+        now = time.monotonic() if now is None else now
+        for stage in self.stages:
+            queues = await fetch_queue_samples(self.client, stage.queues)
+            if stage.upstream:
+                queues.backlog += (await fetch_queue_samples(self.client, stage.upstream)).backlog
+            service_time, source = await self._service_time(stage, queues)
+
+            raw = recommend_replicas(queues.publish_rate, queues.backlog, service_time)
+            raw = min(self.max_replicas, max(self.min_replicas, raw))
+            replicas = self._stabilise(stage.name, raw, now)
+
+            self.latest[stage.name] = Recommendation(
+                stage=stage.name,
+                replicas=replicas,
+                raw_replicas=raw,
+                backlog=queues.backlog,
+                consumers=queues.consumers,
+                arrival_rate=queues.publish_rate,
+                ack_rate=queues.ack_rate,
+                service_time_s=service_time,
+                service_time_source=source,
+            )
+
+            AUTOSCALER_RECOMMENDED_REPLICAS.labels(stage.name).set(replicas)
+            AUTOSCALER_BACKLOG.labels(stage.name).set(queues.backlog)
+            AUTOSCALER_ARRIVAL_RATE.labels(stage.name).set(queues.publish_rate)
+            AUTOSCALER_SERVICE_TIME.labels(stage.name).set(service_time)
+
+        return self.latest
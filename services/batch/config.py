@@ -0,0 +1,15 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# customer records keyed by customer id, same shape as the customer lookup seed file
+BATCH_CUSTOMERS_FILE = os.getenv(
+    "BATCH_CUSTOMERS_FILE",
+    os.path.join(os.path.dirname(__file__), "..", "customer_lookup", "data", "customers.json"),
+)
+# processes running extraction, parsing and analysis (0 means one per CPU)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "0")) or os.cpu_count() or 1
+# statements waiting for a worker and results waiting for the report writer, per queue
+BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", "32"))
+BATCH_REPORTS_DIR = os.getenv("BATCH_REPORTS_DIR") or os.getenv("REPORTS_DIR") or "data/batch_reports"
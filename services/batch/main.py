@@ -0,0 +1,250 @@
+"""
+Offline batch mode, the whole pipeline in-process over a directory of statements.
+
+    python -m services.batch.main statements/2025-01 --workers 8
+
+Statements are laid out one folder per customer,
+
+    statements/2025-01/000_000_042/january.pdf
+
+and the customers are read from a local JSON file instead of the lookup
+service. Worker processes take statements from a bounded queue and run
+the same stage functions the extraction and analysis workers use (layout
+templates and table reads, extract_text_from_pdf, parse_document,
+enrich_transactions, perform_analysis), then put the results on a second
+bounded queue for the report writer in the main process, so a slow disk
+holds the workers back rather than piling results up in memory. Nothing
+goes through RabbitMQ or Postgres: there are no job rows, and the checks
+that need stored history (customer baselines, continuity, duplicates,
+counterparty graph) are left out, every statement is scored against itself.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+
+from services.analysis.core import perform_analysis
+from services.batch.config import BATCH_CUSTOMERS_FILE, BATCH_WORKERS, BATCH_QUEUE_SIZE, BATCH_REPORTS_DIR
+from services.extraction.config import LAYOUT_TEMPLATES_DIR
+from services.extraction.layouts import identify, templates as layout_templates
+from services.extraction.merchants import get_automaton, enrich_transactions
+from services.extraction.ocr import get_engine
+from services.extraction.parser import parse_document
+from services.extraction.tables import read_statement, learn_columns
+from services.extraction.utils import extract_text_from_pdf
+from services.report.core import write_report
+from shared.matching import party_profile
+
+STAGES = ["extraction", "parse", "vendor_normalisation", "analysis"]
+
+
+@dataclass
+class Statement:
+    job_id: str
+    path: str
+    customer_id: str
+    customer: Optional[dict]
+
+
+@dataclass
+class Outcome:
+    job_id: str
+    path: str
+    results: Optional[dict] = None
+    error: Optional[str] = None
+    transactions: int = 0
+    seconds: dict = field(default_factory=dict)
+
+
+def load_customers(path: str = BATCH_CUSTOMERS_FILE) -> dict[str, dict]:
+    """Customer records as the lookup service returns them, match profile included"""
+    with open(path) as f:
+        data = json.load(f)
+    return {
+        cid: {
+            "customer_id": cid,
+            "name": info["name"],
+            "address": info["address"],
+            "match_profile": party_profile(info["name"], info["address"]).to_dict(),
+        }
+        for cid, info in data.items()
+    }
+
+
+def discover(directory: str, customers: dict[str, dict]) -> list[Statement]:
+    """Every PDF under a customer folder, in a stable order"""
+    statements = []
+    for customer_id in sorted(os.listdir(directory)):
+        folder = os.path.join(directory, customer_id)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(".pdf"):
+                statements.append(Statement(str(uuid.uuid4()), os.path.join(folder, name), customer_id,
+                                            customers.get(customer_id)))
+    return statements
+
+
+def process_statement(statement: Statement, loop: asyncio.AbstractEventLoop) -> Outcome:
+    outcome = Outcome(statement.job_id, statement.path)
+    try:
+        if not statement.customer:
+            raise Exception(f"Validation failed: Customer {statement.customer_id} not found in customers file.")
+
+        start = time.perf_counter()
+        fingerprint = identify(statement.path) if LAYOUT_TEMPLATES_DIR else None
+        template = layout_templates.get(fingerprint, record=False) if fingerprint else None
+        document = None
+        if template and template.boundaries:
+            document = read_statement(statement.path, template, statement.customer_id, os.path.basename(statement.path))
+        if document is None:
+            raw_text, _, method = extract_text_from_pdf(statement.path)
+        outcome.seconds["extraction"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if document is None:
+            document = parse_document(raw_text, statement.customer_id, os.path.basename(statement.path), fingerprint)
+            if fingerprint and method == "pdfplumber":
+                learn_columns(statement.path, fingerprint, document)
+        outcome.seconds["parse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        enrich_transactions(document.transactions)
+        outcome.seconds["vendor_normalisation"] = time.perf_counter() - start
+
+        # same JSON round trip the payload takes through the queue
+        payload = json.loads(json.dumps({"customer": statement.customer, "document": document.dict()}, default=str))
+        start = time.perf_counter()
+        outcome.results = loop.run_until_complete(perform_analysis(payload))
+        outcome.seconds["analysis"] = time.perf_counter() - start
+        outcome.transactions = len(document.transactions)
+    except Exception as e:
+        outcome.error = str(e)
+    return outcome
+
+
+def _work(statements: multiprocessing.Queue, outcomes: multiprocessing.Queue):
+    get_automaton()
+    # daemonic processes can't start an OCR pool, and the batch already runs a statement per process
+    get_engine(workers=0)
+    loop = asyncio.new_event_loop()
+    while (statement := statements.get()) is not None:
+        outcomes.put(process_statement(statement, loop))
+    outcomes.put(None)
+
+
+def _feed(statements: list[Statement], tasks: multiprocessing.Queue, workers: int):
+    for statement in statements:
+        tasks.put(statement)
+    for _ in range(workers):
+        tasks.put(None)
+
+
+class Progress:
+    def __init__(self, total: int, every_s: float):
+        self.total = total
+        self.every_s = every_s
+        self.started = self.last_report = time.perf_counter()
+        self.done = self.failed = self.transactions = 0
+        self.seconds = {stage: 0.0 for stage in STAGES}
+
+    def add(self, outcome: Outcome):
+        self.done += 1
+        self.failed += outcome.error is not None
+        self.transactions += outcome.transactions
+        for stage, seconds in outcome.seconds.items():
+            self.seconds[stage] += seconds
+        if time.perf_counter() - self.last_report >= self.every_s:
+            self.report()
+
+    def summary(self) -> dict:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        succeeded = max(self.done - self.failed, 1)
+        return {
+            "docs": self.done,
+            "failed": self.failed,
+            "elapsed_s": round(elapsed, 2),
+            "docs_per_s": round(self.done / elapsed, 2),
+            "transactions_per_s": round(self.transactions / elapsed, 1),
+            # time per statement inside a worker, summed across workers it exceeds the wall clock
+            "stage_mean_ms": {stage: round(s / succeeded * 1000, 2) for stage, s in self.seconds.items()},
+        }
+
+    def report(self):
+        self.last_report = time.perf_counter()
+        s = self.summary()
+        print(f"[*] [batch] {s['docs']}/{self.total} statements, {s['docs_per_s']} docs/s, "
+              f"{s['transactions_per_s']} transactions/s, {s['failed']} failed")
+
+
+def run_batch(directory: str, customers: dict[str, dict], reports_dir: str = BATCH_REPORTS_DIR,
+              workers: int = BATCH_WORKERS, queue_size: int = BATCH_QUEUE_SIZE,
+              report_every_s: float = 5.0) -> dict:
+    """Process every statement under `directory`, returns the throughput summary"""
+    # 0 means one per CPU, as for BATCH_WORKERS
+    workers = workers or os.cpu_count() or 1
+    statements = discover(directory, customers)
+    progress = Progress(len(statements), report_every_s)
+    print(f"[*] [batch] {len(statements)} statements in {directory}, {workers} workers")
+
+    tasks = multiprocessing.Queue(queue_size)
+    outcomes = multiprocessing.Queue(queue_size)
+    processes = [multiprocessing.Process(target=_work, args=(tasks, outcomes), daemon=True) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    feeder = threading.Thread(target=_feed, args=(statements, tasks, workers), daemon=True)
+    feeder.start()
+
+    finished = 0
+    while finished < workers:
+        try:
+            outcome = outcomes.get(timeout=1)
+        except queue.Empty:
+            if not any(p.is_alive() for p in processes):
+                print("[!] [batch] Workers exited before the batch finished")
+                break
+            continue
+        if outcome is None:
+            finished += 1
+            continue
+        if outcome.error is None:
+            try:
+                write_report(outcome.results, outcome.job_id, reports_dir)
+            except Exception as e:
+                outcome.error = f"Report error: {e}"
+        if outcome.error:
+            print(f"[!] [batch] [{outcome.job_id}] {outcome.path}: {outcome.error}")
+        progress.add(outcome)
+
+    for p in processes:
+        p.join()
+    progress.report()
+    return progress.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run extraction, analysis and reporting over a directory of statements")
+    parser.add_argument("directory", help="one folder of PDFs per customer id")
+    parser.add_argument("--customers", default=BATCH_CUSTOMERS_FILE, help="customer records JSON")
+    parser.add_argument("--reports-dir", default=BATCH_REPORTS_DIR)
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="processes, 0 means one per CPU")
+    parser.add_argument("--queue-size", type=int, default=BATCH_QUEUE_SIZE)
+    parser.add_argument("--report-every", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args()
+
+    summary = run_batch(args.directory, load_customers(args.customers), args.reports_dir,
+                        args.workers, args.queue_size, args.report_every)
+    print(f"[+] [batch] {summary['docs'] - summary['failed']} reports written to {args.reports_dir}, "
+          f"{summary['failed']} failed, {summary['docs_per_s']} docs/s")
+    print(json.dumps(summary["stage_mean_ms"]))
+
+
+if __name__ == "__main__":
+    main()
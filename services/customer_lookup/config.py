@@ -0,0 +1,8 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# customer records plus their normalised name/address, kept in memory for CUSTOMER_CACHE_TTL_S
+CUSTOMER_CACHE_SIZE = int(os.getenv("CUSTOMER_CACHE_SIZE", "10000"))
+CUSTOMER_CACHE_TTL_S = float(os.getenv("CUSTOMER_CACHE_TTL_S", "300"))
@@ -1,12 +1,20 @@
+from cachetools import TTLCache
 from fastapi import FastAPI, HTTPException, Depends
+from prometheus_client import make_asgi_app
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from shared.db import AsyncSessionLocal
 from shared.models import Customer
+from shared.metrics import stage_timer, record_cache_lookup
+from shared.matching import party_profile
+from services.customer_lookup.config import CUSTOMER_CACHE_SIZE, CUSTOMER_CACHE_TTL_S
 import json
 from pathlib import Path
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
+
+customer_cache = TTLCache(maxsize=CUSTOMER_CACHE_SIZE, ttl=CUSTOMER_CACHE_TTL_S)
 
 async def get_db():
     async with AsyncSessionLocal() as session:
@@ -14,17 +22,27 @@ async def get_db():
 
 @app.get("/get/{customer_id}")
 async def get_customer(customer_id: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Customer).where(Customer.customer_id == customer_id))
+    cached = customer_cache.get(customer_id)
+    record_cache_lookup("customer_lookup", cached is not None)
+    if cached is not None:
+        return cached
+
+    with stage_timer("customer_lookup", "db_read"):
+        result = await db.execute(select(Customer).where(Customer.customer_id == customer_id))
     customer = result.scalar_one_or_none()
     
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    return {
+    record = {
         "customer_id": customer.customer_id,
         "name": customer.name,
-        "address": customer.address
+        "address": customer.address,
+        # normalised once here so analysis only has to normalise the document side
+        "match_profile": party_profile(customer.name, customer.address).to_dict(),
     }
+    customer_cache[customer_id] = record
+    return record
 
 @app.post("/seed")
 async def seed_customers(db: AsyncSession = Depends(get_db)):
@@ -42,6 +60,7 @@ async def seed_customers(db: AsyncSession = Depends(get_db)):
         await db.merge(customer)
     
     await db.commit()
+    customer_cache.clear()
     return {"message": f"Imported {len(data)} customers"}
 
 @app.get("/")
@@ -32,7 +32,7 @@ def get_live_jobs():
         SELECT j.job_id, c.name as customer, j.current_status as status, j.created_at
         FROM jobs j
         JOIN customers c ON j.customer_id = c.customer_id
-        WHERE j.current_status NOT IN ('COMPLETED', 'FAILED', 'EXTRACTION_FAILED', 'ANALYSIS_FAILED', 'QUEUE_FAILED')
+        WHERE j.current_status NOT IN ('COMPLETED', 'FAILED', 'EXTRACTION_FAILED', 'ANALYSIS_FAILED', 'QUEUE_FAILED', 'REJECTED')
         ORDER BY j.created_at DESC
     """)
     with engine.connect() as conn:
@@ -8,14 +8,51 @@ CL_IP = os.getenv("CL_IP") or "customer_lookup"
 CL_PORT = os.getenv("CL_PORT") or "8001"
 CL_URL = "http://" + CL_IP + ":" + CL_PORT
 
+# checked when the worker starts, batch mode imports these settings without a broker
 RABBITMQ_URL = os.getenv("RABBITMQ_URL")
-if not RABBITMQ_URL:
-	raise ValueError("ERROR: RABBITMQ_URL environment variable not set")
 INPUT_QUEUE = os.getenv("RAW_EXTRACTION_QUEUE")
 OUTPUT_QUEUE = os.getenv("EXTRACTED_DATA_QUEUE")
 
 MIN_TRANSACTIONS = int(os.getenv("MIN_TRANSACTIONS", "30"))
 OCR_CONFIDENCE_THRESHOLD = float(os.getenv("OCR_CONFIDENCE_THRESHOLD", "60.0"))
 
+# "auto" tries the fast pdfium text layer first and falls back to pdfplumber, with OCR
+# for pages that have no text layer; "pdfium" or "pdfplumber" pin a single backend, and
+# "ocr" skips straight to the OCR engine (text-layer pages are still read directly)
+EXTRACTION_BACKEND = os.getenv("EXTRACTION_BACKEND", "auto")
+# share of dated lines that must look like full transaction rows to trust the pdfium layout
+LAYOUT_ROW_RATIO = float(os.getenv("LAYOUT_ROW_RATIO", "0.8"))
+
+# row templates learned per bank layout (blank disables fingerprinting), and the grid
+# header word x positions are rounded to when fingerprinting, in PDF points
+LAYOUT_TEMPLATES_DIR = os.getenv("LAYOUT_TEMPLATES_DIR", "data/layout_templates")
+LAYOUT_X_TOLERANCE = float(os.getenv("LAYOUT_X_TOLERANCE", "4"))
+
+# OCR for pages without a text layer, pages are rendered one at a time at OCR_DPI
+# and run through tesseract on OCR_WORKERS processes (0 runs it in-process)
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_TESSERACT_CONFIG = os.getenv("OCR_TESSERACT_CONFIG", "--psm 6")
+# a page with fewer text-layer characters than this is treated as scanned
+OCR_MIN_PAGE_CHARS = int(os.getenv("OCR_MIN_PAGE_CHARS", "20"))
+# OCR results cache, keyed by a hash of the rendered page plus the tesseract settings.
+# "exact" hashes the pixels, "perceptual" also matches re-scans of the same page but can
+# hand one page's text to another that differs only in a few figures, so it's opt-in
+# (blank OCR_CACHE_DIR disables it)
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "data/ocr_cache")
+OCR_CACHE_MAX_MB = int(os.getenv("OCR_CACHE_MAX_MB", "512"))
+OCR_CACHE_HASH = os.getenv("OCR_CACHE_HASH", "exact")
+
+# merchant dictionary for vendor normalisation, compiled once per dictionary
+# into MERCHANT_AUTOMATON_DIR and memory-mapped by every worker on the host
+MERCHANT_DICTIONARY_PATH = os.getenv(
+    "MERCHANT_DICTIONARY_PATH", os.path.join(os.path.dirname(__file__), "data", "merchants.csv")
+)
+MERCHANT_AUTOMATON_DIR = os.getenv("MERCHANT_AUTOMATON_DIR", "data/merchant_automaton")
+
+# sidecar port serving /metrics (0 disables it)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
 # Debug mode
 DEBUG = os.getenv("DEBUG") == "True"
\ No newline at end of file
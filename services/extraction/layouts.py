@@ -0,0 +1,305 @@
+"""
+Bank layout fingerprints and the row templates learned for them.
+
+A statement's layout is identified from its first page's text layer,
+read with pdfium: the transaction table header (the first line naming at
+least three of date, description, amount and balance), the fonts it is set
+in and the x position of each header word, rounded to LAYOUT_X_TOLERANCE.
+The same bank's statements give the same fingerprint whatever the
+customer, period or row count.
+
+The first statement of an unknown layout that the generic parser reads in
+full teaches the layout's template: the header text that starts the table,
+the column order and the date format, compiled into one anchored row
+pattern. The template is kept only if it reproduces exactly the rows the
+generic parser found. Later statements of that layout are parsed with the
+template alone, with no keyword search for the table or number guessing,
+and fall back to the generic parser if it comes up short.
+
+Templates are JSON files, one per fingerprint, under LAYOUT_TEMPLATES_DIR,
+written under a temporary name and renamed, so every worker on a host
+shares what any one of them learned. Lookups are counted in the cache
+metrics, and documents and rows per template (parse rate = parsed rows /
+all dated rows) in amlytica_layout_template_*.
+
+    python -m services.extraction.layouts list
+    python -m services.extraction.layouts identify statement.pdf
+"""
+import argparse
+import ctypes
+import hashlib
+import json
+import os
+import re
+import tempfile
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from services.extraction.config import LAYOUT_TEMPLATES_DIR, LAYOUT_X_TOLERANCE, DEBUG
+from shared.metrics import LAYOUT_TEMPLATE_DOCUMENTS, LAYOUT_TEMPLATE_ROWS, record_cache_lookup
+
+# header words naming each column, anything else in a header except symbols makes the layout unsupported
+FIELD_WORDS = {
+    "date": {"DATE"},
+    "vendor": {"VENDOR", "DESCRIPTION", "DETAILS", "PAYEE", "NARRATIVE", "PARTICULARS"},
+    "amount": {"AMOUNT"},
+    "balance": {"BALANCE"},
+}
+_WORD_FIELD = {word: name for name, words in FIELD_WORDS.items() for word in words}
+_WORD = re.compile(r"\S+")
+_LETTERS = re.compile(r"[A-Z]")
+_SPACES = re.compile(r"\s+")
+_DATE = re.compile(r"\d{1,2}/\d{1,2}/\d{2,4}")
+_VENDOR_NOISE = re.compile(r"[|€$¥]")
+_MONEY = r"[€$¥]?(?P<{}>[-+]?(?:\d{{1,3}}(?:,\d{{3}})+|\d+)\.\d{{2}})"
+_DATE_PIECES = {
+    "%d/%m/%Y": r"(?P<day>\d{1,2})/(?P<month>\d{1,2})/(?P<year>\d{4})",
+    "%d/%m/%y": r"(?P<day>\d{1,2})/(?P<month>\d{1,2})/(?P<year>\d{2})",
+}
+
+
+def normalise_header(line: str) -> str:
+    return _SPACES.sub(" ", line).strip().upper()
+
+
+def named_fields(text: str) -> Optional[list[str]]:
+    """Columns named by header text in order, None if it has a word naming none of them"""
+    fields = []
+    for word in _WORD.findall(normalise_header(text)):
+        if word in _WORD_FIELD:
+            fields.append(_WORD_FIELD[word])
+        elif _LETTERS.search(word.strip("()")):
+            return None
+    return fields
+
+
+def header_fields(line: str) -> Optional[list[str]]:
+    """Column order named by a header line, None unless it names exactly the four columns"""
+    fields = named_fields(line)
+    return fields if fields and sorted(fields) == sorted(FIELD_WORDS) else None
+
+
+def _is_header(line: str) -> bool:
+    return len({_WORD_FIELD[w] for w in _WORD.findall(line.upper()) if w in _WORD_FIELD}) >= 3
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    header: str
+    fonts: tuple
+    columns: tuple
+
+    @property
+    def key(self) -> str:
+        raw = json.dumps([self.header, self.fonts, self.columns])
+        return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _font_name(textpage: pdfium.PdfTextPage, index: int) -> str:
+    buffer = ctypes.create_string_buffer(128)
+    flags = ctypes.c_int()
+    pdfium_c.FPDFText_GetFontInfo(textpage.raw, index, buffer, len(buffer), ctypes.byref(flags))
+    return buffer.value.decode("latin-1")
+
+
+def identify(file_path: str, tolerance: float = LAYOUT_X_TOLERANCE) -> Optional[Fingerprint]:
+    """Fingerprint of the first page's table header, None for pages without a text layer or header"""
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        page = pdf[0]
+        textpage = page.get_textpage()
+        try:
+            # one character per index, so offsets into the text are character indices too
+            text = textpage.get_text_range()
+            offset = 0
+            for line in text.split("\n"):
+                if _is_header(line):
+                    break
+                offset += len(line) + 1
+            else:
+                return None
+            fonts, columns = set(), []
+            for word in _WORD.finditer(line):
+                start = offset + word.start()
+                fonts.add(_font_name(textpage, start))
+                columns.append(round(textpage.get_charbox(start)[0] / tolerance) * tolerance)
+            return Fingerprint(normalise_header(line), tuple(sorted(fonts)), tuple(columns))
+        finally:
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+
+
+@dataclass
+class Template:
+    key: str
+    header: str
+    fields: list[str]
+    date_format: str
+    fonts: list[str] = field(default_factory=list)
+    columns: list[float] = field(default_factory=list)
+    learned_from: str = ""
+    learned_at: str = ""
+    # x positions splitting the table's columns, learned for layouts read by geometry (tables.py)
+    boundaries: list[float] = field(default_factory=list)
+
+    def __post_init__(self):
+        pieces = {"date": _DATE_PIECES[self.date_format], "vendor": r"(?P<vendor>.*?)",
+                  "amount": _MONEY.format("amount"), "balance": _MONEY.format("balance")}
+        self._row = re.compile(r"\s*" + r"\s+".join(pieces[f] for f in self.fields) + r"\s*$")
+        self._cells = {f: re.compile(pieces[f]) for f in ("date", "amount", "balance")}
+        self._two_digit_year = self.date_format.endswith("%y")
+
+    def _row_values(self, date_match: re.Match, vendor: str, amount: str, balance: str) -> Optional[tuple]:
+        year = int(date_match["year"])
+        if self._two_digit_year:
+            # strptime's %y pivot
+            year += 2000 if year < 69 else 1900
+        try:
+            date = datetime(year, int(date_match["month"]), int(date_match["day"]))
+        except ValueError:
+            return None
+        vendor = _VENDOR_NOISE.sub("", vendor).strip()
+        return date, vendor, Decimal(amount.replace(",", "")), Decimal(balance.replace(",", ""))
+
+    def rows(self, raw_text: str) -> tuple[list[tuple], int]:
+        """(date, vendor, Decimal amount, Decimal balance) for each row below the header, plus the dated lines seen"""
+        lines = raw_text.split("\n")
+        start = next((i + 1 for i, line in enumerate(lines) if normalise_header(line) == self.header), None)
+        if start is None:
+            return [], 0
+
+        rows, dated = [], 0
+        for line in lines[start:]:
+            if not _DATE.search(line):
+                continue
+            dated += 1
+            match = self._row.match(line)
+            row = match and self._row_values(match, match["vendor"], match["amount"], match["balance"])
+            if row:
+                rows.append(row)
+        return rows, dated
+
+    def is_date(self, text: str) -> bool:
+        return self._cells["date"].fullmatch(text) is not None
+
+    def cell_row(self, cells: dict) -> Optional[tuple]:
+        """The same values from one table row's cell texts by field, None if a cell doesn't read"""
+        date, amount, balance = (self._cells[f].fullmatch(cells.get(f, "")) for f in ("date", "amount", "balance"))
+        if not (date and amount and balance):
+            return None
+        return self._row_values(date, cells.get("vendor", ""), amount["amount"], balance["balance"])
+
+
+def _date_format(raw_text: str, header: str) -> str:
+    lines = raw_text.split("\n")
+    start = next((i + 1 for i, line in enumerate(lines) if normalise_header(line) == header), len(lines))
+    for line in lines[start:]:
+        match = _DATE.search(line)
+        if match:
+            return "%d/%m/%Y" if len(match.group().rsplit("/", 1)[1]) == 4 else "%d/%m/%y"
+    return "%d/%m/%Y"
+
+
+class LayoutTemplates:
+    """Learned templates by fingerprint key, read from disk once per process and shared between workers"""
+
+    def __init__(self, directory: str = LAYOUT_TEMPLATES_DIR):
+        self.directory = directory
+        self._templates: dict[str, Template] = {}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, fingerprint: Fingerprint, record: bool = True) -> Optional[Template]:
+        key = fingerprint.key
+        template = self._templates.get(key)
+        if template is None and os.path.exists(self._path(key)):
+            # learned by another worker since this one started
+            with open(self._path(key)) as f:
+                template = self._templates[key] = Template(**json.load(f))
+        if record:
+            record_cache_lookup("layout_templates", template is not None)
+        return template
+
+    def learn(self, fingerprint: Fingerprint, raw_text: str, rows: list[tuple],
+              filename: str = "") -> Optional[Template]:
+        """Keep a template for the layout if it reads exactly the rows the generic parser found"""
+        fields = header_fields(fingerprint.header)
+        if fields is None:
+            return None
+        template = Template(
+            key=fingerprint.key, header=fingerprint.header, fields=fields,
+            date_format=_date_format(raw_text, fingerprint.header),
+            fonts=list(fingerprint.fonts), columns=list(fingerprint.columns),
+            learned_from=filename, learned_at=datetime.now().isoformat(timespec="seconds"),
+        )
+        if template.rows(raw_text)[0] != rows:
+            if DEBUG:
+                print(f"Layout {fingerprint.key} template disagrees with the generic parser, not kept")
+            return None
+
+        self.save(template)
+        return template
+
+    def save(self, template: Template):
+        os.makedirs(self.directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=self.directory, suffix=".tmp", delete=False) as f:
+            json.dump(asdict(template), f, indent=2)
+        os.replace(f.name, self._path(template.key))
+        self._templates[template.key] = template
+
+    def all(self) -> list[Template]:
+        if not os.path.isdir(self.directory):
+            return []
+        templates = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name)) as f:
+                    templates.append(Template(**json.load(f)))
+        return templates
+
+
+def record_parse(template: Template, rows: int, dated: int, used: bool):
+    LAYOUT_TEMPLATE_DOCUMENTS.labels(template.key, "parsed" if used else "fallback").inc()
+    LAYOUT_TEMPLATE_ROWS.labels(template.key, "parsed").inc(rows)
+    LAYOUT_TEMPLATE_ROWS.labels(template.key, "skipped").inc(dated - rows)
+
+
+templates = LayoutTemplates()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect bank layout fingerprints and learned templates")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="learned templates")
+    check = sub.add_parser("identify", help="fingerprint a statement and say whether its layout is known")
+    check.add_argument("pdf")
+    parser.add_argument("--dir", default=LAYOUT_TEMPLATES_DIR)
+    args = parser.parse_args()
+    store = LayoutTemplates(args.dir)
+
+    if args.command == "list":
+        for t in store.all():
+            print(f"{t.key}  {' | '.join(t.fields)}  {t.date_format}  {','.join(t.fonts)}  "
+                  f"learned from {t.learned_from or '?'} at {t.learned_at}")
+        return
+
+    fingerprint = identify(args.pdf)
+    if fingerprint is None:
+        print("[!] No table header found on the first page's text layer")
+        return
+    print(json.dumps({"key": fingerprint.key, **asdict(fingerprint)}, indent=2))
+    template = store.get(fingerprint)
+    print(f"[+] Known layout, template learned from {template.learned_from}" if template
+          else "[*] Unknown layout, the next statement the generic parser reads fully will teach it")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Vendor normalisation against the merchant dictionary.
+
+The dictionary's patterns are compiled into an Aho-Corasick automaton with
+every transition filled in, so scanning a vendor string is one table read
+per character with no failure-link chasing. Vendors are cleaned to an
+alphabet of space, digits and A-Z and padded with spaces, as are the
+patterns, so a pattern only matches whole words; the longest match in the
+string wins.
+
+The tables are flat int32 arrays written as .npy files under a directory
+named after a hash of the dictionary, built by whichever worker starts
+first and memory-mapped read-only by the rest, so every worker process on
+a host shares one copy through the page cache.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from services.extraction.config import DEBUG, MERCHANT_DICTIONARY_PATH, MERCHANT_AUTOMATON_DIR
+
+ALPHABET = " 0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+# byte -> symbol index, anything outside the alphabet reads as a space
+_SYMBOLS = bytes(ALPHABET.index(chr(b)) if chr(b) in ALPHABET else 0 for b in range(256))
+_TABLES = ("delta", "output", "lengths")
+_NON_WORD = re.compile(r"[^0-9A-Z]+")
+
+
+@dataclass
+class MerchantEntry:
+    pattern: str
+    # blank for keyword patterns such as ATM, which name a category but not a counterparty
+    merchant: str
+    category: str
+
+
+def clean_vendor(vendor: str) -> str:
+    """Upper case ASCII words, accents folded and punctuation dropped"""
+    if not vendor.isascii():
+        vendor = unicodedata.normalize("NFKD", vendor).encode("ascii", "ignore").decode()
+    return " ".join(_NON_WORD.sub(" ", vendor.upper()).split())
+
+
+def _codes(cleaned: str) -> bytes:
+    return f" {cleaned} ".encode().translate(_SYMBOLS)
+
+
+def load_merchant_dictionary(path: str = MERCHANT_DICTIONARY_PATH) -> list[MerchantEntry]:
+    with open(path, newline="") as f:
+        return [
+            MerchantEntry(clean_vendor(row["pattern"]), row["merchant"].strip(), row["category"].strip())
+            for row in csv.DictReader(f)
+            if clean_vendor(row["pattern"])
+        ]
+
+
+def dictionary_digest(entries: list[MerchantEntry]) -> str:
+    h = hashlib.sha256()
+    for e in entries:
+        h.update(f"{e.pattern}\t{e.merchant}\t{e.category}\n".encode())
+    return h.hexdigest()[:16]
+
+
+def build_tables(entries: list[MerchantEntry]) -> dict[str, np.ndarray]:
+    """Trie, failure links by BFS, then each state's row copied from its failure state's"""
+    width = len(ALPHABET)
+    goto: list[dict[int, int]] = [{}]
+    own = [-1]
+    for index, entry in enumerate(entries):
+        state = 0
+        for c in _codes(entry.pattern):
+            if c not in goto[state]:
+                goto[state][c] = len(goto)
+                goto.append({})
+                own.append(-1)
+            state = goto[state][c]
+        if own[state] < 0:
+            own[state] = index
+
+    n = len(goto)
+    delta = np.zeros((n, width), dtype=np.int32)
+    fail = np.zeros(n, dtype=np.int32)
+    output = np.full(n, -1, dtype=np.int32)
+
+    queue = deque()
+    for c, child in goto[0].items():
+        delta[0, c] = child
+        queue.append(child)
+    while queue:
+        state = queue.popleft()
+        # the failure state is shallower, so its output and row are final already
+        output[state] = own[state] if own[state] >= 0 else output[fail[state]]
+        delta[state] = delta[fail[state]]
+        for c, child in goto[state].items():
+            fail[child] = delta[fail[state], c]
+            delta[state, c] = child
+            queue.append(child)
+
+    lengths = np.array([len(e.pattern) for e in entries], dtype=np.int32)
+    return {"delta": delta.ravel(), "output": output, "lengths": lengths}
+
+
+def build_automaton(entries: list[MerchantEntry], directory: str = MERCHANT_AUTOMATON_DIR) -> str:
+    """Write the tables for this dictionary unless another process already has, returns their directory"""
+    target = os.path.join(directory, dictionary_digest(entries))
+    if os.path.exists(os.path.join(target, "merchants.json")):
+        return target
+
+    os.makedirs(directory, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=directory, prefix=".build-")
+    try:
+        for name, table in build_tables(entries).items():
+            np.save(os.path.join(staging, f"{name}.npy"), table)
+        with open(os.path.join(staging, "merchants.json"), "w") as f:
+            json.dump([[e.merchant, e.category] for e in entries], f)
+        os.rename(staging, target)
+    except OSError:
+        # lost the race to a worker that built the same dictionary
+        if not os.path.exists(os.path.join(target, "merchants.json")):
+            raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+
+class MerchantAutomaton:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in _TABLES}
+        # memoryviews index in a fraction of the time numpy scalars take
+        self._delta, self._output, self._lengths = (memoryview(self._arrays[name]) for name in _TABLES)
+        with open(os.path.join(directory, "merchants.json")) as f:
+            self.merchants = [tuple(m) for m in json.load(f)]
+        self.states = len(self._output)
+        self.lookup = lru_cache(maxsize=65536)(self._lookup)
+
+    def match(self, cleaned: str) -> int:
+        """Index of the longest dictionary pattern in the cleaned vendor, -1 for none"""
+        delta, output, lengths = self._delta, self._output, self._lengths
+        width = len(ALPHABET)
+        state, best, best_length = 0, -1, 0
+        for c in _codes(cleaned):
+            state = delta[state * width + c]
+            found = output[state]
+            if found >= 0 and lengths[found] > best_length:
+                best, best_length = found, lengths[found]
+        return best
+
+    def _lookup(self, vendor: str) -> tuple[str, Optional[str]]:
+        """Normalised vendor and category; unmatched vendors keep their cleaned text minus reference numbers"""
+        cleaned = clean_vendor(vendor)
+        found = self.match(cleaned)
+        if found >= 0 and self.merchants[found][0]:
+            return self.merchants[found][0], self.merchants[found][1]
+        name = " ".join(word for word in cleaned.split() if not word.isdigit()) or cleaned
+        return name, (self.merchants[found][1] if found >= 0 else None)
+
+
+_automaton: Optional[MerchantAutomaton] = None
+
+
+def get_automaton() -> MerchantAutomaton:
+    """Build or map the automaton for the configured dictionary, once per process"""
+    global _automaton
+    if _automaton is None:
+        entries = load_merchant_dictionary()
+        _automaton = MerchantAutomaton(build_automaton(entries))
+        if DEBUG:
+            print(f"[*] [merchants] {len(entries)} patterns, {_automaton.states} states in {_automaton.directory}")
+    return _automaton
+
+
+def enrich_transactions(transactions: list, automaton: Optional[MerchantAutomaton] = None):
+    automaton = automaton or get_automaton()
+    for t in transactions:
+        t.normalized_vendor, t.category = automaton.lookup(t.vendor)
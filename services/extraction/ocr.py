@@ -0,0 +1,224 @@
+"""
+OCR for scanned statements.
+
+Pages are rendered one at a time with pdfium and tesseract runs on a
+process pool, so memory holds a single page image per pool process rather
+than the whole document. Pages that already have a text layer are read
+directly and never rasterised. Results are yielded in page order as soon
+as a page and every page before it is done.
+"""
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, Tuple
+
+import pypdfium2 as pdfium
+import pytesseract
+
+from services.extraction.config import (
+    OCR_DPI, OCR_WORKERS, OCR_LANG, OCR_TESSERACT_CONFIG, OCR_MIN_PAGE_CHARS,
+    OCR_CACHE_DIR, OCR_CACHE_MAX_MB, OCR_CACHE_HASH, DEBUG,
+)
+from services.extraction.ocr_cache import OcrCache
+from shared.metrics import record_cache_lookup
+
+
+@dataclass
+class PageResult:
+    page_number: int
+    text: str
+    confidence: float
+    method: str  # "text_layer" or "ocr"
+    cached: bool = False
+    # tesseract time for this page, for a cache hit the time it took when first OCRed
+    ocr_seconds: float = 0.0
+
+
+def page_text(page: pdfium.PdfPage) -> str:
+    textpage = page.get_textpage()
+    try:
+        return textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n").strip()
+    finally:
+        textpage.close()
+
+
+def _lines_from_data(data: dict) -> Tuple[str, float]:
+    """
+    Rebuild text lines from image_to_data output.
+
+    Each statement row has to stay on one line for the parser, so words are
+    grouped by tesseract's block/paragraph/line numbers rather than joined.
+    """
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        word = word.strip()
+        if not word:
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+        conf = float(data["conf"][i])
+        if conf >= 0:  # tesseract returns -1 for unrecognised
+            confidences.append(conf)
+
+    text = "\n".join(" ".join(words) for words in lines.values())
+    confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    return text, confidence
+
+
+def render_page(file_path: str, page_index: int, dpi: int = OCR_DPI):
+    """Rasterise a single page as a greyscale PIL image"""
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        page = pdf[page_index]
+        image = page.render(scale=dpi / 72, grayscale=True).to_pil()
+        page.close()
+        return image
+    finally:
+        pdf.close()
+
+
+def ocr_page(file_path: str, page_index: int, dpi: int = OCR_DPI, lang: str = OCR_LANG,
+             config: str = OCR_TESSERACT_CONFIG, cache: Optional[OcrCache] = None) -> PageResult:
+    """Render and OCR one page, this is what runs inside the pool"""
+    try:
+        image = render_page(file_path, page_index, dpi)
+
+        key = cache.key(image, dpi, lang, config) if cache else None
+        entry = cache.get(key) if cache else None
+        if entry:
+            return PageResult(page_index + 1, entry["text"], entry["confidence"], "ocr",
+                              cached=True, ocr_seconds=entry["ocr_seconds"])
+
+        start = time.perf_counter()
+        data = pytesseract.image_to_data(image, lang=lang, config=config, output_type=pytesseract.Output.DICT)
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        # pytesseract's exceptions don't survive pickling back from the pool
+        raise RuntimeError(f"OCR failed on page {page_index + 1}: {e}")
+
+    text, confidence = _lines_from_data(data)
+    if cache:
+        cache.put(key, text, confidence, elapsed)
+    return PageResult(page_index + 1, text, confidence, "ocr", ocr_seconds=elapsed)
+
+
+def _result(item) -> PageResult:
+    return item.result() if isinstance(item, Future) else item
+
+
+class OcrEngine:
+    def __init__(self, workers: int = OCR_WORKERS, dpi: int = OCR_DPI, lang: str = OCR_LANG,
+                 config: str = OCR_TESSERACT_CONFIG, min_page_chars: int = OCR_MIN_PAGE_CHARS,
+                 cache: Optional[OcrCache] = None):
+        self.workers = workers
+        self.dpi = dpi
+        self.lang = lang
+        self.config = config
+        self.min_page_chars = min_page_chars
+        self.cache = cache
+        self.stats = {"lookups": 0, "hits": 0, "seconds_saved": 0.0}
+        self._pool = None
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers > 0 and self._pool is None:
+            # spawn, so pool processes don't inherit the worker's event loop and connections
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _ocr(self, file_path: str, page_index: int, pool: Optional[ProcessPoolExecutor]):
+        if pool is None:
+            return ocr_page(file_path, page_index, self.dpi, self.lang, self.config, self.cache)
+        return pool.submit(ocr_page, file_path, page_index, self.dpi, self.lang, self.config, self.cache)
+
+    def iter_pages(self, file_path: str, page_texts: Optional[list[str]] = None) -> Iterator[PageResult]:
+        """
+        Page results in order, at most 2 pages per pool process are in flight.
+        `page_texts` replaces pdfium's text layer per page, e.g. pdfplumber's
+        for tables pdfium reads out of row order.
+        """
+        pool = self._executor()
+        window = max(1, self.workers * 2)
+        pending = deque()
+
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            for index in range(len(pdf)):
+                if page_texts is not None:
+                    text = page_texts[index]
+                else:
+                    page = pdf[index]
+                    text = page_text(page)
+                    page.close()
+
+                if len(text) >= self.min_page_chars:
+                    pending.append(PageResult(index + 1, text, 100.0, "text_layer"))
+                else:
+                    pending.append(self._ocr(file_path, index, pool))
+
+                # hand back whatever is finished at the head, block once the window is full
+                while pending and (len(pending) >= window or not isinstance(pending[0], Future) or pending[0].done()):
+                    yield _result(pending.popleft())
+
+            while pending:
+                yield _result(pending.popleft())
+        finally:
+            pdf.close()
+            for item in pending:
+                if isinstance(item, Future):
+                    item.cancel()
+
+    def extract(self, file_path: str, on_page: Optional[Callable[[PageResult], None]] = None,
+                page_texts: Optional[list[str]] = None) -> Tuple[str, float]:
+        """Full text and mean page confidence, `on_page` sees each page as it arrives"""
+        text_parts = []
+        confidences = []
+        for result in self.iter_pages(file_path, page_texts):
+            if DEBUG:
+                print(f"Page {result.page_number}: {result.method}, confidence {result.confidence:.1f}%")
+            if on_page:
+                on_page(result)
+            if result.text:
+                text_parts.append(result.text)
+            confidences.append(result.confidence)
+            if self.cache and result.method == "ocr":
+                self._record_lookup(result)
+                if not result.cached:
+                    self.cache.added(result.text, result.confidence, result.ocr_seconds)
+
+        if self.cache:
+            if DEBUG:
+                print(f"OCR cache hit rate {self.hit_rate:.1%}, {self.stats['seconds_saved']:.1f}s of OCR saved")
+
+        confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        return "\n".join(text_parts), confidence
+
+    @property
+    def hit_rate(self) -> float:
+        return self.stats["hits"] / self.stats["lookups"] if self.stats["lookups"] else 0.0
+
+    def _record_lookup(self, result: PageResult):
+        saved = result.ocr_seconds if result.cached else 0.0
+        self.stats["lookups"] += 1
+        self.stats["hits"] += result.cached
+        self.stats["seconds_saved"] += saved
+        record_cache_lookup("ocr", result.cached, saved)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+_engine = None
+
+
+def get_engine(workers: int = OCR_WORKERS) -> OcrEngine:
+    """Engine shared across jobs, so the pool is started once per worker; `workers` only counts on the first call"""
+    global _engine
+    if _engine is None:
+        cache = OcrCache(OCR_CACHE_DIR, OCR_CACHE_MAX_MB * 1024 * 1024, OCR_CACHE_HASH) if OCR_CACHE_DIR else None
+        _engine = OcrEngine(workers=workers, cache=cache)
+    return _engine
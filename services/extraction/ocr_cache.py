@@ -0,0 +1,128 @@
+"""
+Disk cache of OCR output for rendered pages.
+
+Entries are small JSON files named after the page key, so every process in
+the OCR pool can share the directory without locking. A hit touches the
+file's mtime and eviction removes the least recently used files once the
+directory grows past its size limit. The directory is only walked when the
+running total of what this process has added says it might have.
+"""
+import functools
+import hashlib
+import json
+import os
+from typing import Optional
+
+import pytesseract
+from PIL import Image
+
+# dHash grid, 32x32 = 1024 bits. At that size a whole page shrinks to a
+# few pixels per text line, so pages that differ in a single figure share a
+# key, which is why perceptual mode is opt-in
+PERCEPTUAL_HASH_SIZE = 32
+
+
+@functools.lru_cache(maxsize=1)
+def _tesseract_version() -> str:
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return "unknown"
+
+
+def exact_hash(image: Image.Image) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def perceptual_hash(image: Image.Image, size: int = PERCEPTUAL_HASH_SIZE) -> str:
+    """Difference hash, survives re-scans and re-encoding that change individual pixels"""
+    small = image.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+
+class OcrCache:
+    def __init__(self, directory: str, max_bytes: int, hash_mode: str = "exact"):
+        if hash_mode not in ("exact", "perceptual"):
+            raise ValueError(f"Unknown OCR cache hash mode: {hash_mode}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hash_mode = hash_mode
+        # bytes in the directory as of the last walk plus what was added since (None = not walked yet)
+        self._bytes = None
+        os.makedirs(directory, exist_ok=True)
+        if hash_mode == "perceptual":
+            print("[!] OCR cache in perceptual mode, pages that differ only in a few figures will share cached text")
+
+    def key(self, image: Image.Image, dpi: int, lang: str, config: str) -> str:
+        """Page hash plus everything that changes tesseract's output for it"""
+        page_hash = perceptual_hash(image) if self.hash_mode == "perceptual" else exact_hash(image)
+        settings = f"{self.hash_mode}|{page_hash}|{dpi}|{lang}|{config}|{_tesseract_version()}"
+        return hashlib.sha256(settings.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, text: str, confidence: float, ocr_seconds: float):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(_encode(text, confidence, ocr_seconds))
+        # atomic, another pool process may be writing the same page
+        os.replace(tmp_path, path)
+
+    def added(self, text: str, confidence: float, ocr_seconds: float) -> int:
+        """
+        Count an entry a put() wrote, in this process or a pool process, and
+        evict once the running total passes max_bytes
+        """
+        if self._bytes is None:
+            return self.evict()
+        self._bytes += len(_encode(text, confidence, ocr_seconds).encode())
+        return self.evict() if self._bytes > self.max_bytes else 0
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._bytes = total
+        return removed
+
+
+def _encode(text: str, confidence: float, ocr_seconds: float) -> str:
+    return json.dumps({"text": text, "confidence": confidence, "ocr_seconds": ocr_seconds})
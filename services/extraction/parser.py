@@ -4,24 +4,26 @@ from decimal import Decimal
 from typing import List, Optional
 from models.models import Document, Transaction
 from services.extraction.config import MIN_TRANSACTIONS, DEBUG
+from services.extraction.layouts import Fingerprint, record_parse, templates as layout_templates
 
 
-def parse_document(raw_text: str, customer_id: str, filename: str) -> Document:
+def parse_document(raw_text: str, customer_id: str, filename: str,
+                   fingerprint: Optional[Fingerprint] = None) -> Document:
     
     # Extract account holder
-    account_holder_name = _extract_account_holder(raw_text)
+    account_holder_name = extract_account_holder(raw_text)
     
     if not account_holder_name:
         raise ValueError("Could not extract account holder name from document")
 
     # Extract customer address
-    customer_address = _extract_address(raw_text)
+    customer_address = extract_address(raw_text)
     
     if not customer_address:
         raise ValueError("Could not extract customer address from document")
     
     # Extract transactions
-    transactions = _extract_transactions(raw_text, customer_id, filename)
+    transactions = _extract_transactions(raw_text, customer_id, filename, fingerprint)
     
     if len(transactions) < MIN_TRANSACTIONS:
         raise ValueError(
@@ -40,7 +42,7 @@ def parse_document(raw_text: str, customer_id: str, filename: str) -> Document:
         transactions=transactions
     )
 
-def _extract_account_holder(text: str) -> Optional[str]:
+def extract_account_holder(text: str) -> Optional[str]:
     patterns = [
         r"(?i)Account\s*Holder\s*:\s*(.*)",
         r"(?i)Name\s*:\s*(.*)"
@@ -61,7 +63,7 @@ def _extract_account_holder(text: str) -> Optional[str]:
     
     return None
 
-def _extract_address(text: str) -> Optional[str]:
+def extract_address(text: str) -> Optional[str]:
 
     # explicit regex
     address_match = re.search(r"(?i)Address\s*:\s*(.*)", text)
@@ -85,8 +87,43 @@ def _extract_address(text: str) -> Optional[str]:
     return None
 
 
-def _extract_transactions(raw_text: str, customer_id: str, filename: str) -> List[Transaction]:
-    transactions = []
+def _extract_transactions(raw_text: str, customer_id: str, filename: str,
+                          fingerprint: Optional[Fingerprint] = None) -> List[Transaction]:
+    if fingerprint is None:
+        return to_transactions(_generic_rows(raw_text), customer_id, filename)
+
+    # a known layout is read with its template only, the generic heuristics are the fallback
+    template = layout_templates.get(fingerprint)
+    if template:
+        rows, dated = template.rows(raw_text)
+        # a template that skips dated lines would silently drop rows the generic parser reads
+        used = len(rows) >= MIN_TRANSACTIONS and len(rows) == dated
+        record_parse(template, len(rows), dated, used)
+        if used:
+            return to_transactions(rows, customer_id, filename)
+
+    rows = _generic_rows(raw_text)
+    if template is None and len(rows) >= MIN_TRANSACTIONS:
+        layout_templates.learn(fingerprint, raw_text, rows, filename)
+    return to_transactions(rows, customer_id, filename)
+
+
+def to_transactions(rows: list[tuple], customer_id: str, filename: str) -> List[Transaction]:
+    return [
+        Transaction(
+            transaction_id=f"{customer_id}_{filename.split('.')[0]}_{n:03d}",
+            date=date_obj,
+            vendor=vendor,
+            amount=amount,
+            balance=balance,
+        )
+        for n, (date_obj, vendor, amount, balance) in enumerate(rows, start=1)
+    ]
+
+
+def _generic_rows(raw_text: str) -> list[tuple]:
+    """(date, vendor, Decimal amount, Decimal balance) for each line below the first header-like line that looks like a row"""
+    rows = []
     lines = raw_text.split('\n')
     
     table_start = None
@@ -98,7 +135,6 @@ def _extract_transactions(raw_text: str, customer_id: str, filename: str) -> Lis
     if table_start is None:
         return []
 
-    txn_counter = 1
     for line in lines[table_start:]:
         line = line.strip()
         if not line: continue
@@ -126,29 +162,21 @@ def _extract_transactions(raw_text: str, customer_id: str, filename: str) -> Lis
             vendor = remaining_text.replace(amount_str, "").replace(balance_str, "").strip()
             vendor = re.sub(r'[|€$¥]', '', vendor).strip()
 
-            # cleaning data to convert to Decimal
+            # strip thousands separators, a malformed number skips the row
             amount = Decimal(amount_str.replace(',', ''))
             balance = Decimal(balance_str.replace(',', ''))
-            
+
+
             # date normalisation
             try:
                 date_obj = datetime.strptime(date_str, "%d/%m/%Y")
             except ValueError:
                 date_obj = datetime.strptime(date_str, "%d/%m/%y")
 
-            txn_id = f"{customer_id}_{filename.split('.')[0]}_{txn_counter:03d}"
-            
-            transactions.append(Transaction(
-                transaction_id=txn_id,
-                date=date_obj,
-                vendor=vendor,
-                amount=amount,
-                balance=balance
-            ))
-            txn_counter += 1
+            rows.append((date_obj, vendor, amount, balance))
 
         except Exception as e:
             if DEBUG: print(f"Row skip: {e} on line: {line}")
             continue
             
-    return transactions
\ No newline at end of file
+    return rows
@@ -0,0 +1,239 @@
+"""
+Geometry reads of the transaction table for known layouts.
+
+pdfium returns a page's text in content stream order, so statements that
+draw their table a column at a time fail the row layout check and are
+read again with pdfplumber, a full layout analysis at tens of ms a page.
+For a layout whose template (layouts.py) has learned its column
+boundaries, this module reads the table from pdfium's text rectangles
+instead: each cell's box and text, binned into columns by the cached x
+boundaries and into rows by lining up with the date column, whatever
+order the cells were drawn in.
+
+Boundaries are learned once per layout, from the first statement that
+needed the slow fallback and that its template parsed: every cell on the
+first page is put under the nearest header cell, and each boundary sits
+halfway between neighbouring columns' extents. Layouts whose text already
+reads in row order never need them, reading text and matching the row
+pattern is cheaper still.
+"""
+from bisect import bisect, bisect_left
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from models.models import Document
+from services.extraction.config import MIN_TRANSACTIONS, OCR_MIN_PAGE_CHARS, DEBUG
+from services.extraction.layouts import (
+    Fingerprint, Template, named_fields, normalise_header, record_parse, templates as layout_templates,
+)
+from services.extraction.parser import extract_account_holder, extract_address, to_transactions
+from shared.metrics import record_cache_lookup
+
+# share of a date cell's height another cell's centre may be off its centre and still be on the row
+ROW_TOLERANCE = 0.6
+
+
+@dataclass
+class Cell:
+    left: float
+    bottom: float
+    right: float
+    top: float
+    text: str
+
+    @property
+    def centre_x(self) -> float:
+        return (self.left + self.right) / 2
+
+    @property
+    def centre_y(self) -> float:
+        return (self.bottom + self.top) / 2
+
+
+def page_cells(textpage: pdfium.PdfTextPage) -> list[Cell]:
+    """
+    Text rectangles with their text.
+
+    Rectangles come in character order, one per run of characters drawn
+    together, so a rectangle's text runs from its first character to the
+    next rectangle's first: one position lookup per cell instead of a
+    bounded text read.
+    """
+    text = textpage.get_text_range()
+    rects = [textpage.get_rect(i) for i in range(textpage.count_rects())]
+    starts = [pdfium_c.FPDFText_GetCharIndexAtPos(textpage.raw, left + 0.5, (bottom + top) / 2, 0.5, 0.5)
+              for left, bottom, right, top in rects]
+    cells = []
+    for i, (left, bottom, right, top) in enumerate(rects):
+        end = starts[i + 1] if i + 1 < len(starts) else len(text)
+        if 0 <= starts[i] < end:
+            content = text[starts[i]:end]
+        else:
+            # overlapping glyphs can hide the first character, read the box instead
+            content = textpage.get_text_bounded(left, bottom, right, top)
+        cells.append(Cell(left, bottom, right, top, content.strip()))
+    return cells
+
+
+def _header_row(cells: list[Cell], header: str) -> Optional[list[Cell]]:
+    rows: dict[int, list[Cell]] = {}
+    for cell in cells:
+        rows.setdefault(round(cell.top), []).append(cell)
+    for row in rows.values():
+        row.sort(key=lambda c: c.left)
+        if normalise_header(" ".join(c.text for c in row)) == header:
+            return row
+    return None
+
+
+def learn_boundaries(cells: list[Cell], template: Template) -> Optional[list[float]]:
+    """Column boundaries from one page's cells, None unless each header cell names one column"""
+    header = _header_row(cells, template.header)
+    if header is None or [_cell_field(c.text) for c in header] != template.fields:
+        return None
+
+    extents = [[c.left, c.right] for c in header]
+    for cell in cells:
+        if cell.text and cell.top < header[0].bottom:
+            nearest = min(range(len(header)), key=lambda i: _gap(cell, header[i]))
+            extents[nearest][0] = min(extents[nearest][0], cell.left)
+            extents[nearest][1] = max(extents[nearest][1], cell.right)
+
+    boundaries = []
+    for (_, right), (left, _) in zip(extents, extents[1:]):
+        if left <= right:
+            return None
+        boundaries.append(round((right + left) / 2, 1))
+    return boundaries
+
+
+def _cell_field(text: str) -> Optional[str]:
+    fields = named_fields(text)
+    return fields[0] if fields and len(fields) == 1 else None
+
+
+def _gap(cell: Cell, header: Cell) -> float:
+    return max(header.left - cell.right, cell.left - header.right, 0.0)
+
+
+def table_rows(cells: list[Cell], template: Template) -> tuple[list[tuple], int]:
+    """Rows of one page top to bottom, plus the date cells seen, each cell placed by position alone"""
+    columns: dict[str, list[Cell]] = {f: [] for f in template.fields}
+    for cell in cells:
+        if cell.text:
+            columns[template.fields[bisect(template.boundaries, cell.centre_x)]].append(cell)
+
+    anchors = sorted((c for c in columns["date"] if template.is_date(c.text)), key=lambda c: c.centre_y)
+    if not anchors:
+        return [], 0
+    centres = [c.centre_y for c in anchors]
+    row_cells: list[dict[str, list[Cell]]] = [{} for _ in anchors]
+    for name, cells_in_column in columns.items():
+        if name == "date":
+            continue
+        for cell in cells_in_column:
+            i = bisect_left(centres, cell.centre_y)
+            nearest = min((j for j in (i - 1, i) if 0 <= j < len(anchors)),
+                          key=lambda j: abs(centres[j] - cell.centre_y))
+            anchor = anchors[nearest]
+            if abs(anchor.centre_y - cell.centre_y) <= (anchor.top - anchor.bottom) * ROW_TOLERANCE:
+                row_cells[nearest].setdefault(name, []).append(cell)
+
+    rows = []
+    for anchor, found in zip(reversed(anchors), reversed(row_cells)):
+        texts = {name: " ".join(c.text for c in sorted(found[name], key=lambda c: c.left)) for name in found}
+        texts["date"] = anchor.text
+        row = template.cell_row(texts)
+        if row:
+            rows.append(row)
+    return rows, len(anchors)
+
+
+def _read_pages(file_path: str, template: Template) -> Optional[tuple[list[tuple], int, str]]:
+    """Rows and date cells over every page, plus the first page's text, None if a page has no text layer"""
+    pdf = pdfium.PdfDocument(file_path)
+    rows, dated, first_page = [], 0, ""
+    try:
+        for number, page in enumerate(pdf):
+            textpage = page.get_textpage()
+            try:
+                if textpage.count_chars() < OCR_MIN_PAGE_CHARS:
+                    return None
+                if number == 0:
+                    first_page = textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n")
+                page_rows, page_dated = table_rows(page_cells(textpage), template)
+            finally:
+                textpage.close()
+                page.close()
+            rows.extend(page_rows)
+            dated += page_dated
+    finally:
+        pdf.close()
+    return rows, dated, first_page
+
+
+def read_statement(file_path: str, template: Template, customer_id: str, filename: str) -> Optional[Document]:
+    """The statement read through the template's column boundaries, None if it has to go the text route"""
+    read = _read_pages(file_path, template)
+    if read is None:
+        # scanned pages need OCR
+        return None
+    rows, dated, first_page = read
+
+    name, address = extract_account_holder(first_page), extract_address(first_page)
+    # like a template's text read, every dated row has to read or the statement goes the text route
+    used = len(rows) >= MIN_TRANSACTIONS and len(rows) == dated and bool(name) and bool(address)
+    record_parse(template, len(rows), dated, used)
+    if not used:
+        if DEBUG:
+            print(f"Layout {template.key} table read found {len(rows)} of {dated} rows, falling back to text")
+        return None
+    record_cache_lookup("layout_templates", True)
+    return Document(
+        customer_id=customer_id,
+        customer_name=name,
+        customer_address=address,
+        filename=filename,
+        transactions=to_transactions(rows, customer_id, filename),
+    )
+
+
+def learn_columns(file_path: str, fingerprint: Fingerprint, document: Document) -> Optional[Template]:
+    """
+    Learn and store the column boundaries of the layout's template, if it has
+    none yet, keeping them only if they read `document`'s rows exactly
+    """
+    template = layout_templates.get(fingerprint, record=False)
+    if template is None or template.boundaries:
+        return template
+
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        page = pdf[0]
+        textpage = page.get_textpage()
+        try:
+            cells = page_cells(textpage)
+        finally:
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+
+    boundaries = learn_boundaries(cells, template)
+    if boundaries is None:
+        if DEBUG:
+            print(f"Layout {template.key} has no separable columns, it stays on the text route")
+        return template
+
+    candidate = replace(template, boundaries=boundaries)
+    read = _read_pages(file_path, candidate)
+    expected = [(t.date, t.vendor, t.amount, t.balance) for t in document.transactions]
+    if read is None or read[0] != expected:
+        if DEBUG:
+            print(f"Layout {template.key} column boundaries {boundaries} misread the table, not kept")
+        return template
+    layout_templates.save(candidate)
+    return candidate
@@ -1,52 +1,145 @@
+import re
 import pdfplumber
-import pytesseract
-from pdf2image import convert_from_path
-from typing import Tuple
-from services.extraction.config import OCR_CONFIDENCE_THRESHOLD, DEBUG
+import pypdfium2 as pdfium
+from typing import Callable, Optional, Tuple
+from services.extraction.config import (
+    OCR_CONFIDENCE_THRESHOLD, OCR_MIN_PAGE_CHARS, EXTRACTION_BACKEND, LAYOUT_ROW_RATIO, DEBUG,
+)
+from services.extraction.ocr import PageResult, get_engine, page_text
+from shared.metrics import stage_timer
 
+DATE_PATTERN = re.compile(r'\d{1,2}/\d{1,2}/\d{2,4}')
+ROW_PATTERN = re.compile(r'\d{1,2}/\d{1,2}/\d{2,4}\s+\S.*?[-+]?[\d,]+\.\d{2}\s+[-+]?[\d,]+\.\d{2}')
 
-def extract_text_from_pdf(file_path: str) -> Tuple[str, float, str]:
-    
-    try:
-        text = _extract_with_pdfplumber(file_path)
-        
-        if _is_meaningful_text(text):
+
+def extract_text_from_pdf(file_path: str, backend: str = EXTRACTION_BACKEND,
+                          on_page: Optional[Callable[[PageResult], None]] = None) -> Tuple[str, float, str]:
+
+    # pages without a text layer can only be read with OCR, the others are still read from their text layer
+    scanned_pages = 0
+    # set when a document with scanned pages also needs pdfplumber's layout analysis for its text pages
+    needs_layout = False
+    page_texts = None
+
+    # fast path, pdfium reads the text layer without any layout analysis
+    if backend in ("auto", "pdfium"):
+        try:
+            text, scanned_pages = _extract_with_pdfium(file_path)
+
+            if scanned_pages and backend == "auto":
+                needs_layout = _is_meaningful_text(text) and not _has_statement_layout(text)
+                if DEBUG:
+                    print(f"{scanned_pages} pages have no text layer, using OCR"
+                          + (" and pdfplumber for the rest" if needs_layout else ""))
+            elif _is_meaningful_text(text) and _has_statement_layout(text):
+                if DEBUG:
+                    print(f"Successfully extracted text using pdfium: {len(text)} characters")
+                return text, 100.0, "pdfium"
+            else:
+                if DEBUG:
+                    print("pdfium text failed the content or layout checks, falling back")
+
+        except Exception as e:
             if DEBUG:
-                print(f"Successfully extracted text using pdfplumber: {len(text)} characters")
-            return text, 100.0, "pdfplumber"
-        else:
+                print(f"pdfium extraction failed: {e}")
+
+    if backend == "pdfplumber" or (backend == "auto" and (not scanned_pages or needs_layout)):
+        try:
+            pages = _extract_pages_with_pdfplumber(file_path)
+            text = "\n".join(p for p in pages if p)
+
+            if needs_layout:
+                # OCR fills in the pages pdfplumber found no text on
+                page_texts = pages
+            elif _is_meaningful_text(text):
+                if DEBUG:
+                    print(f"Successfully extracted text using pdfplumber: {len(text)} characters")
+                return text, 100.0, "pdfplumber"
+            else:
+                if DEBUG:
+                    print("pdfplumber extraction yielded insufficient content")
+
+        except Exception as e:
             if DEBUG:
-                print("pdfplumber extraction yielded insufficient content")
-    
-    except Exception as e:
-        if DEBUG:
-            print(f"pdfplumber extraction failed: {e}")
-    
-    # # Fall back to OCR (for scanned documents)
-    # try:
-    #     text, confidence = _extract_with_ocr(file_path)
-        
-    #     if confidence < OCR_CONFIDENCE_THRESHOLD:
-    #         if DEBUG:
-    #             print(f"Warning: OCR confidence ({confidence:.1f}%) below threshold ({OCR_CONFIDENCE_THRESHOLD}%)")
-        
-    #     return text, confidence, "ocr"
-    
-    # except Exception as e:
-    #     raise Exception(f"Both pdfplumber and OCR extraction failed: {e}")
+                print(f"pdfplumber extraction failed: {e}")
+
+    # Fall back to OCR (for scanned documents), pages with a text layer are still read directly
+    if backend in ("auto", "ocr"):
+        try:
+            with stage_timer("extraction", "ocr"):
+                text, confidence = get_engine().extract(file_path, on_page=on_page, page_texts=page_texts)
+
+            if confidence < OCR_CONFIDENCE_THRESHOLD:
+                if DEBUG:
+                    print(f"Warning: OCR confidence ({confidence:.1f}%) below threshold ({OCR_CONFIDENCE_THRESHOLD}%)")
+
+            return text, confidence, "ocr"
+
+        except Exception as e:
+            raise Exception(f"Both text layer and OCR extraction failed: {e}")
+
+    raise Exception(f"Text extraction with the {backend} backend failed")
+
+
+def _extract_with_pdfium(file_path: str) -> Tuple[str, int]:
+    """Extract the text layer using pdfium, in content stream order, plus the number of pages without one"""
+    text_parts = []
+    scanned_pages = 0
+
+    with stage_timer("extraction", "pdf_open"):
+        pdf = pdfium.PdfDocument(file_path)
+
+    try:
+        for page in pdf:
+            text = page_text(page)
+            page.close()
+            if len(text) < OCR_MIN_PAGE_CHARS:
+                scanned_pages += 1
+            if text:
+                text_parts.append(text)
+    finally:
+        pdf.close()
+
+    return "\n".join(text_parts), scanned_pages
 
 
 def _extract_with_pdfplumber(file_path: str) -> str:
     """Extract text using pdfplumber"""
-    text_parts = []
-    
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(page_text)
-    
-    return "\n".join(text_parts)
+    return "\n".join(text for text in _extract_pages_with_pdfplumber(file_path) if text)
+
+
+def _extract_pages_with_pdfplumber(file_path: str) -> list[str]:
+    """Each page's text from pdfplumber's layout analysis, empty for pages without a text layer"""
+    with stage_timer("extraction", "pdf_open"):
+        pdf = pdfplumber.open(file_path)
+
+    with pdf:
+        return [(page.extract_text() or "").strip() for page in pdf.pages]
+
+
+def get_page_count(file_path: str) -> int:
+    """Page count from the PDF's page tree, without parsing any page content"""
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _has_statement_layout(text: str) -> bool:
+    """
+    Check the text reads row by row.
+
+    pdfium returns text in content stream order, so a PDF that draws its
+    table column by column produces dates on lines of their own. Most lines
+    with a date should carry the vendor, amount and balance as well.
+    """
+    dated_lines = [line for line in text.split('\n') if DATE_PATTERN.search(line)]
+    if not dated_lines:
+        return False
+
+    rows = sum(1 for line in dated_lines if ROW_PATTERN.search(line))
+    return rows / len(dated_lines) >= LAYOUT_ROW_RATIO
 
 
 def _is_meaningful_text(text: str) -> bool:
@@ -70,40 +163,3 @@ def _is_meaningful_text(text: str) -> bool:
     has_dates = '/' in text or '-' in text
     
     return has_dates
-
-
-# def _extract_with_ocr(file_path: str) -> Tuple[str, float]:
-#     """
-#     Extract text using OCR (pytesseract).
-    
-#     Returns:
-#         Tuple of (extracted_text, average_confidence)
-#     """
-#     # Convert PDF to images
-#     images = convert_from_path(file_path)
-    
-#     text_parts = []
-#     confidences = []
-    
-#     for image in images:
-#         # Get OCR data with confidence scores
-#         ocr_data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-        
-#         # Extract text and confidences
-#         page_text = []
-#         page_confidences = []
-        
-#         for i, word in enumerate(ocr_data['text']):
-#             if word.strip():  # Skip empty strings
-#                 page_text.append(word)
-#                 conf = int(ocr_data['conf'][i])
-#                 if conf > 0:  # pytesseract returns -1 for unrecognized
-#                     page_confidences.append(conf)
-        
-#         text_parts.append(" ".join(page_text))
-#         confidences.extend(page_confidences)
-    
-#     full_text = "\n".join(text_parts)
-#     avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
-    
-#     return full_text, avg_confidence
\ No newline at end of file
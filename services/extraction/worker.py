@@ -6,25 +6,41 @@ import httpx
 from sqlalchemy import update
 from shared.db import AsyncSessionLocal
 from shared.models import Job, JobEvent
-from services.extraction.utils import extract_text_from_pdf
+from services.extraction.utils import extract_text_from_pdf, get_page_count
 from services.extraction.parser import parse_document
-from services.extraction.config import RABBITMQ_URL, INPUT_QUEUE, OUTPUT_QUEUE, CL_URL
+from services.extraction.layouts import identify, templates as layout_templates
+from services.extraction.tables import read_statement, learn_columns
+from services.extraction.merchants import get_automaton, enrich_transactions
+from shared.lake import append_transactions
+from services.extraction.config import (
+    RABBITMQ_URL, INPUT_QUEUE, OUTPUT_QUEUE, CL_URL, METRICS_PORT, LAYOUT_TEMPLATES_DIR,
+)
+from shared.metrics import (
+    BYTES_PROCESSED, JOBS_PROCESSED, stage_timer, track_in_flight,
+    publish_headers, observe_queue_lag, start_metrics_server,
+)
+from shared.config import SCHEDULER_ENABLED, EXTRACTION_DONE_QUEUE, TRANSACTION_LAKE_DIR
+from shared.lanes import WeightedLaneConsumer, parse_weights
+from shared.profiling import JobProfiler, listen_for_control
+from shared.tracing import init_tracing, start_span, inject_trace_context, extract_trace_context
 
 WORKER_NAME = os.getenv('HOSTNAME', 'extraction_worker_local')
+profiler = JobProfiler("extraction", WORKER_NAME)
 
 async def update_job_status(job_id: str, status: str, message: str = None):
-    async with AsyncSessionLocal() as session:
-        async with session.begin():
-            await session.execute(
-                update(Job).where(Job.job_id == job_id).values(current_status=status)
-            )
-            event = JobEvent(
-                job_id=job_id, 
-                status=status, 
-                message=message,
-                worker_name=WORKER_NAME
-            )
-            session.add(event)
+    with stage_timer("extraction", "db_write"), start_span("update_job_status", status=status):
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                await session.execute(
+                    update(Job).where(Job.job_id == job_id).values(current_status=status)
+                )
+                event = JobEvent(
+                    job_id=job_id, 
+                    status=status, 
+                    message=message,
+                    worker_name=WORKER_NAME
+                )
+                session.add(event)
 
 async def fetch_customer_metadata(customer_id: str):
     async with httpx.AsyncClient() as client:
@@ -38,61 +54,146 @@ async def fetch_customer_metadata(customer_id: str):
             print(f"[!] [{WORKER_NAME}] Customer lookup error: {e}")
             return None
 
+async def notify_scheduler(job_id: str, customer_id: str):
+    """Tell the fair scheduler the job is finished so the customer's slot frees up"""
+    try:
+        connection = await aio_pika.connect_robust(RABBITMQ_URL)
+        async with connection:
+            channel = await connection.channel()
+            await channel.declare_queue(EXTRACTION_DONE_QUEUE, durable=True)
+            await channel.default_exchange.publish(
+                aio_pika.Message(
+                    body=json.dumps({"job_id": job_id, "customer_id": customer_id}).encode(),
+                    correlation_id=job_id,
+                    headers=publish_headers()
+                ),
+                routing_key=EXTRACTION_DONE_QUEUE,
+            )
+    except Exception as e:
+        # the scheduler releases the slot on its own after SCHEDULER_INFLIGHT_TIMEOUT
+        print(f"[!] [{WORKER_NAME}] [{job_id}] Done notice failed: {e}")
+
 async def process_message(message: aio_pika.IncomingMessage):
-    async with message.process():
+    async with message.process(), track_in_flight("extraction"):
+        observe_queue_lag("extraction", message.routing_key or INPUT_QUEUE, message.headers)
         job_id = message.correlation_id
         data = json.loads(message.body.decode())
         customer_id = data.get('customer_id')
-        
-        print(f"[*] [{WORKER_NAME}] processing job {job_id}: {data.get('filename')}")
-        await update_job_status(job_id, "EXTRACTION_STARTED")
 
-        try:
-            customer_data = await fetch_customer_metadata(customer_id)
-            if not customer_data:
-                raise Exception(f"Validation failed: Customer {customer_id} not found in database.")
-
-            raw_text, confidence, method = extract_text_from_pdf(data['file_path'])
-            document = parse_document(
-                raw_text=raw_text,
-                customer_id=customer_id,
-                filename=data.get("filename")
-            )
+        with start_span("process_message", parent=extract_trace_context(message.headers), job_id=job_id,
+                        lane=data.get('lane', 'standard')) as span:
+            print(f"[*] [{WORKER_NAME}] processing job {job_id}: {data.get('filename')}")
+            await update_job_status(job_id, "EXTRACTION_STARTED")
 
-            analysis_payload = {
-                "customer": customer_data, 
-                "document": document.dict()
-            }
-
-            connection = await aio_pika.connect_robust(RABBITMQ_URL)
-            async with connection:
-                channel = await connection.channel()
-                await channel.declare_queue(OUTPUT_QUEUE, durable=True)
-                await channel.default_exchange.publish(
-                    aio_pika.Message(
-                        body=json.dumps(analysis_payload, default=str).encode(),
-                        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
-                        correlation_id=job_id 
-                    ),
-                    routing_key=OUTPUT_QUEUE,
-                )
+            try:
+                with stage_timer("extraction", "customer_lookup"), start_span("fetch_customer_metadata"):
+                    customer_data = await fetch_customer_metadata(customer_id)
+                if not customer_data:
+                    raise Exception(f"Validation failed: Customer {customer_id} not found in database.")
+
+                fingerprint = template = document = None
+                if LAYOUT_TEMPLATES_DIR:
+                    with stage_timer("extraction", "layout_fingerprint"), start_span("identify_layout") as step:
+                        fingerprint = identify(data['file_path'])
+                        template = layout_templates.get(fingerprint, record=False) if fingerprint else None
+                        step.attributes["layout"] = fingerprint.key if fingerprint else None
+
+                pages = []
+                if template and template.boundaries:
+                    # the layout's columns are known, so cells are read by position rather than from the text
+                    with stage_timer("extraction", "table_extraction"), start_span("read_statement") as step:
+                        document = read_statement(data['file_path'], template, customer_id, data.get("filename"))
+                        step.attributes["read"] = document is not None
+                    confidence, method = 100.0, "table"
+
+                if document is None:
+                    with stage_timer("extraction", "text_extraction"), start_span("extract_text_from_pdf") as step:
+                        raw_text, confidence, method = extract_text_from_pdf(data['file_path'], on_page=pages.append)
+                        step.attributes.update(method=method, confidence=confidence)
+
+                    with stage_timer("extraction", "parse"), start_span("parse_document") as step:
+                        document = parse_document(
+                            raw_text=raw_text,
+                            customer_id=customer_id,
+                            filename=data.get("filename"),
+                            fingerprint=fingerprint
+                        )
+                        step.attributes["transactions"] = len(document.transactions)
+
+                    if fingerprint and method == "pdfplumber":
+                        # pdfium's text was out of row order, learn the columns so the next one skips pdfplumber
+                        with stage_timer("extraction", "layout_learning"), start_span("learn_columns"):
+                            learn_columns(data['file_path'], fingerprint, document)
+                BYTES_PROCESSED.labels("extraction").inc(os.path.getsize(data['file_path']))
+
+                with stage_timer("extraction", "vendor_normalisation"), start_span("enrich_transactions"):
+                    enrich_transactions(document.transactions)
+
+                if TRANSACTION_LAKE_DIR:
+                    # the lake is for later re-analysis, losing one document there mustn't fail the job
+                    with stage_timer("extraction", "lake_write"), start_span("append_transactions"):
+                        try:
+                            append_transactions(customer_id, job_id, document.filename, document.transactions)
+                        except Exception as e:
+                            print(f"[!] [{WORKER_NAME}] [{job_id}] Transaction lake write failed: {e}")
+
+                if profiler.active:
+                    profiler.tag(pages=get_page_count(data['file_path']), transactions=len(document.transactions))
+
+                analysis_payload = {
+                    "customer": customer_data, 
+                    "document": document.dict(),
+                    "extraction_method": method,
+                    "confidence": confidence,
+                    "page_confidence": [
+                        {"page": p.page_number, "method": p.method, "confidence": round(p.confidence, 1), "cached": p.cached}
+                        for p in pages
+                    ]
+                }
+
+                with stage_timer("extraction", "publish"), start_span("publish"):
+                    connection = await aio_pika.connect_robust(RABBITMQ_URL)
+                    async with connection:
+                        channel = await connection.channel()
+                        await channel.declare_queue(OUTPUT_QUEUE, durable=True)
+                        await channel.default_exchange.publish(
+                            aio_pika.Message(
+                                body=json.dumps(analysis_payload, default=str).encode(),
+                                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                                correlation_id=job_id,
+                                headers=inject_trace_context(publish_headers())
+                            ),
+                            routing_key=OUTPUT_QUEUE,
+                        )
             
-            print(f"[+] [{WORKER_NAME}] [{job_id}] Extraction complete.")
-            await update_job_status(job_id, "EXTRACTION_SUCCESS", json.dumps(analysis_payload, default=str))
+                print(f"[+] [{WORKER_NAME}] [{job_id}] Extraction complete.")
+                await update_job_status(job_id, "EXTRACTION_SUCCESS", json.dumps(analysis_payload, default=str))
+                JOBS_PROCESSED.labels("extraction", "success").inc()
 
-        except Exception as e:
-            print(f"[!] [{WORKER_NAME}] [{job_id}] Extraction failed: {str(e)}")
-            await update_job_status(job_id, "EXTRACTION_FAILED", str(e))
+            except Exception as e:
+                print(f"[!] [{WORKER_NAME}] [{job_id}] Extraction failed: {str(e)}")
+                span.status = "error"
+                await update_job_status(job_id, "EXTRACTION_FAILED", str(e))
+                JOBS_PROCESSED.labels("extraction", "failed").inc()
+
+            if SCHEDULER_ENABLED:
+                await notify_scheduler(job_id, customer_id)
 
 async def main():
+    if not RABBITMQ_URL:
+        raise ValueError("ERROR: RABBITMQ_URL environment variable not set")
+    init_tracing("extraction")
+    start_metrics_server(METRICS_PORT)
+    # build or map the merchant automaton before the first job needs it
+    get_automaton()
     connection = await aio_pika.connect_robust(RABBITMQ_URL)
     async with connection:
-        channel = await connection.channel()
-        await channel.set_qos(prefetch_count=1)
-        queue = await channel.declare_queue(INPUT_QUEUE, durable=True)
-        print(f" [*] [{WORKER_NAME}] Extraction Worker active. Listening on {INPUT_QUEUE}...")
-        await queue.consume(process_message)
-        await asyncio.Future()
+        await listen_for_control(connection, profiler)
+        # one job at a time, taken from the fast/standard/bulk lanes by weight
+        lanes = WeightedLaneConsumer(profiler.wrap(process_message), parse_weights())
+        await lanes.subscribe(connection)
+        print(f" [*] [{WORKER_NAME}] Extraction Worker active. Listening on lanes {lanes.weights}...")
+        await lanes.run()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
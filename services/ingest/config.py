@@ -12,6 +12,10 @@ if not RABBITMQ_URL:
 UPLOAD_DIR = os.getenv("UPLOAD_DIR")
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE") or 10) * 1024 * 1024
 ALLOWED_TYPES = {"application/pdf", "image/png", "image/jpeg"}
+# PDFs with more pages are rejected at upload rather than left to tie up an extraction worker
+INGEST_MAX_PAGES = int(os.getenv("INGEST_MAX_PAGES", "500"))
+# same threshold extraction uses to send a page to OCR
+OCR_MIN_PAGE_CHARS = int(os.getenv("OCR_MIN_PAGE_CHARS", "20"))
 
 if not DEBUG and (UPLOAD_DIR == "/tmp/uploads" or not UPLOAD_DIR):
         raise RuntimeError("""
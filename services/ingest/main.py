@@ -1,16 +1,26 @@
+import asyncio
 import json
 import uuid
 import aio_pika
+from typing import Optional
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Depends
-from sqlalchemy import null
+from prometheus_client import make_asgi_app
+from sqlalchemy import null, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from shared.db import engine, Base, get_db
+from shared.db import engine, Base, get_db, AsyncSessionLocal
 from shared.models import Job, JobEvent
-from services.ingest.utils import save_uploaded_file
-from services.ingest.config import UPLOAD_DIR, DEBUG, MAX_FILE_SIZE, ALLOWED_TYPES, RABBITMQ_URL
+from services.ingest.utils import Preflight, save_uploaded_file, preflight
+from services.ingest.config import UPLOAD_DIR, DEBUG, MAX_FILE_SIZE, ALLOWED_TYPES, RABBITMQ_URL, INGEST_MAX_PAGES
+from shared.config import SCHEDULER_ENABLED, SCHEDULER_QUEUE
+from shared.lanes import estimate_pages, lane_for, queue_for_lane
+from shared.metrics import BYTES_PROCESSED, JOBS_PROCESSED, stage_timer, publish_headers
+from shared.tracing import init_tracing, start_span, inject_trace_context
+
+init_tracing("ingest")
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
 # Automatically create database tables on startup
 @app.on_event("startup")
@@ -30,21 +40,59 @@ async def upload_single_file(
         raise HTTPException(status_code=400, detail=f"Invalid type: {mime_type}")
     
     content = await file.read()
+    if not content:
+        raise HTTPException(status_code=400, detail="File is empty")
     if len(content) > MAX_FILE_SIZE:
         raise HTTPException(status_code=413, detail="File too large")
 
-    # generate identity and save to disk (this should work with S3)
+    # generate identity, the upload span is the root of the job's trace
     job_id = str(uuid.uuid4())
-    saved_path = save_uploaded_file(UPLOAD_DIR, file.filename, content)
+    with start_span("upload", job_id=job_id, customer_id=customer_id) as span:
+        # reject or route by what opening the PDF shows, in a thread so a large upload doesn't stall the event loop
+        with stage_timer("ingest", "preflight"), start_span("preflight"):
+            checked = await asyncio.to_thread(preflight, content, mime_type)
+        if checked.rejected:
+            span.attributes.update(rejected=checked.rejected)
+            await _reject_upload(job_id, file, customer_id, db, checked)
+        lane = lane_for(checked.pages, len(content), checked.text_layer)
+        span.attributes.update(pages=checked.pages, text_layer=checked.text_layer, lane=lane)
+        return await _accept_upload(job_id, file, content, customer_id, db, lane, checked)
+
+async def _reject_upload(job_id: str, file: UploadFile, customer_id: str, db: AsyncSession, checked: Preflight):
+    # the file is never saved, the job row keeps what the pre-flight found
+    JOBS_PROCESSED.labels("ingest", "rejected").inc()
+    try:
+        db.add(_job_row(job_id, customer_id, file.filename, checked, None, current_status="REJECTED"))
+        db.add(JobEvent(job_id=job_id, status="REJECTED", message=checked.rejected))
+        await db.commit()
+    except Exception as e:
+        if DEBUG: print(f"Database Error: {e}")
+    status = 413 if checked.pages and checked.pages > INGEST_MAX_PAGES else 400
+    raise HTTPException(status_code=status, detail=checked.rejected)
+
+def _job_row(job_id: str, customer_id: str, filename: str, checked: Preflight, lane: Optional[str], **kwargs) -> Job:
+    return Job(
+        job_id=job_id,
+        customer_id=customer_id,
+        filename=filename,
+        page_count=checked.pages,
+        encrypted=checked.encrypted,
+        text_layer=checked.text_layer,
+        lane=lane,
+        **kwargs
+    )
+
+async def _accept_upload(job_id: str, file: UploadFile, content: bytes, customer_id: str, db: AsyncSession,
+                         lane: str, checked: Preflight):
+    # save to disk (this should work with S3)
+    with stage_timer("ingest", "file_write"), start_span("file_write"):
+        saved_path = save_uploaded_file(UPLOAD_DIR, file.filename, content)
+    BYTES_PROCESSED.labels("ingest").inc(len(content))
 
     # database try/except
     try:
         # job record
-        new_job = Job(
-            job_id=job_id, 
-            customer_id=customer_id, 
-            filename=file.filename
-        )
+        new_job = _job_row(job_id, customer_id, file.filename, checked, lane)
 
         # create jobs_event row
         initial_event = JobEvent(
@@ -53,9 +101,10 @@ async def upload_single_file(
             message=saved_path
         )
 
-        db.add(new_job)
-        db.add(initial_event)
-        await db.commit()
+        with stage_timer("ingest", "db_write"), start_span("db_write"):
+            db.add(new_job)
+            db.add(initial_event)
+            await db.commit()
         
     except Exception as e:
         if DEBUG: print(f"Database Error: {e}")
@@ -63,29 +112,38 @@ async def upload_single_file(
 
     # rabbitmq try/except
     try:
-        connection = await aio_pika.connect_robust(RABBITMQ_URL)
-        async with connection:
-            channel = await connection.channel()
-            await channel.declare_queue("raw_extraction_queue", durable=True)
-            
-            payload = {
-                "job_id": job_id,
-                "file_path": saved_path,
-                "customer_id": customer_id,
-                "filename": file.filename
-            }
-
-            await channel.default_exchange.publish(
-                aio_pika.Message(
-                    body=json.dumps(payload).encode(),
-                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
-                    correlation_id=job_id
-                ),
-                routing_key="raw_extraction_queue",
-            )
+        with stage_timer("ingest", "publish"), start_span("publish"):
+            connection = await aio_pika.connect_robust(RABBITMQ_URL)
+            async with connection:
+                channel = await connection.channel()
+                # with fair scheduling on, the scheduler forwards the job to its lane
+                queue_name = SCHEDULER_QUEUE if SCHEDULER_ENABLED else queue_for_lane(lane)
+                await channel.declare_queue(queue_name, durable=True)
+                
+                payload = {
+                    "job_id": job_id,
+                    "file_path": saved_path,
+                    "customer_id": customer_id,
+                    "filename": file.filename,
+                    "lane": lane,
+                    "pages": checked.pages,
+                    "text_layer": checked.text_layer,
+                    "cost": estimate_pages(checked.pages, len(content), checked.text_layer)
+                }
+
+                await channel.default_exchange.publish(
+                    aio_pika.Message(
+                        body=json.dumps(payload).encode(),
+                        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                        correlation_id=job_id,
+                        headers=inject_trace_context(publish_headers())
+                    ),
+                    routing_key=queue_name,
+                )
 
     except Exception as e:
         if DEBUG: print(f"RabbitMQ Error: {e}")
+        JOBS_PROCESSED.labels("ingest", "queue_failed").inc()
         
         # update job as failed since it never made the queue
         try:
@@ -115,10 +173,12 @@ async def upload_single_file(
             detail="Job queue is currently unavailable. Please try again shortly."
         )
 
+    JOBS_PROCESSED.labels("ingest", "queued").inc()
     return {
         "status": "queued",
         "job_id": job_id,
-        "filename": file.filename
+        "filename": file.filename,
+        "lane": lane
     }
 
 @app.get("/health")
@@ -1,5 +1,16 @@
 import os
+import threading
 import time
+from dataclasses import dataclass
+from typing import Optional
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from services.ingest.config import INGEST_MAX_PAGES, OCR_MIN_PAGE_CHARS
+
+# pdfium isn't thread-safe and concurrent uploads run pre-flight on the shared thread pool
+_pdfium_lock = threading.Lock()
 
 def save_uploaded_file(upload_dir: str, filename: str, content: bytes) -> str:
 
@@ -17,4 +28,60 @@ def save_uploaded_file(upload_dir: str, filename: str, content: bytes) -> str:
     with open(file_location, "wb") as f:
         f.write(content)
     
-    return file_location
\ No newline at end of file
+    return file_location
+
+@dataclass
+class Preflight:
+    """What opening the upload told us, `rejected` is the reason it can't be processed"""
+    pages: Optional[int] = None
+    encrypted: Optional[bool] = None
+    text_layer: Optional[bool] = None
+    rejected: Optional[str] = None
+
+
+def preflight(content: bytes, mime_type: str) -> Preflight:
+    """
+    Open the PDF and check it without extracting anything.
+
+    Loading reads the trailer, cross-reference table and page tree only.
+    Of the pages, just the first is loaded and its characters counted, which
+    is enough to tell a scan (needs OCR) from a statement with a text layer.
+    """
+    if mime_type != "application/pdf":
+        # images can only be read with OCR
+        return Preflight(pages=1, encrypted=False, text_layer=False)
+    with _pdfium_lock:
+        return _preflight_pdf(content)
+
+
+def _preflight_pdf(content: bytes) -> Preflight:
+    try:
+        pdf = pdfium.PdfDocument(content)
+    except pdfium.PdfiumError as e:
+        if e.err_code in (pdfium_c.FPDF_ERR_PASSWORD, pdfium_c.FPDF_ERR_SECURITY):
+            return Preflight(encrypted=True, rejected="PDF is password protected")
+        return Preflight(rejected="PDF could not be read")
+    try:
+        result = Preflight(
+            pages=len(pdf),
+            # owner-password-only files open and extract like any other
+            encrypted=pdfium_c.FPDF_GetSecurityHandlerRevision(pdf.raw) != -1,
+        )
+        if not result.pages:
+            result.rejected = "PDF has no pages"
+            return result
+        if result.pages > INGEST_MAX_PAGES:
+            result.rejected = f"PDF has {result.pages} pages, the limit is {INGEST_MAX_PAGES}"
+            return result
+        page = pdf[0]
+        textpage = page.get_textpage()
+        try:
+            result.text_layer = textpage.count_chars() >= OCR_MIN_PAGE_CHARS
+        finally:
+            textpage.close()
+            page.close()
+        return result
+    except pdfium.PdfiumError:
+        return Preflight(rejected="PDF could not be read")
+    finally:
+        pdf.close()
@@ -9,5 +9,8 @@ if not RABBITMQ_URL:
 INPUT_QUEUE = os.getenv("ANALYSIS_RESULTS_QUEUE")
 REPORTS_DIR = os.getenv("REPORTS_DIR")
 
+# sidecar port serving /metrics (0 disables it)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
 # Debug mode
 DEBUG = os.getenv("DEBUG") == "True"
\ No newline at end of file
@@ -0,0 +1,23 @@
+"""
+Writing the final report file, no broker or database involved, so batch
+mode can share it with the report worker.
+"""
+import json
+import os
+from datetime import datetime
+
+
+def write_report(payload: dict, job_id: str, reports_dir: str) -> str:
+    """Stamp the analysis payload and write it as the job's final report, returns the path"""
+    payload["job_id"] = job_id
+    payload["generated_at"] = datetime.now().isoformat()
+
+    customer_name = payload.get("customer", {}).get("name", "unknown").replace(" ", "_")
+    report_filename = f"report_{customer_name}_{job_id[:8]}.json"
+    report_path = os.path.join(reports_dir, report_filename)
+
+    os.makedirs(reports_dir, exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(payload, f, indent=4, default=str)
+
+    return report_path
@@ -0,0 +1,29 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RABBITMQ_URL = os.getenv("RABBITMQ_URL")
+if not RABBITMQ_URL:
+	raise ValueError("ERROR: RABBITMQ_URL environment variable not set")
+
+# deficit round robin, each customer's turn is worth QUANTUM_PAGES x its weight
+SCHEDULER_QUANTUM_PAGES = int(os.getenv("SCHEDULER_QUANTUM_PAGES", "20"))
+# jobs a customer may have in the extraction lanes at once
+SCHEDULER_CUSTOMER_CAP = int(os.getenv("SCHEDULER_CUSTOMER_CAP", "2"))
+# overrides as "customer_id=value,..."
+SCHEDULER_CUSTOMER_CAPS = os.getenv("SCHEDULER_CUSTOMER_CAPS", "")
+SCHEDULER_CUSTOMER_WEIGHTS = os.getenv("SCHEDULER_CUSTOMER_WEIGHTS", "")
+# jobs released to the lanes in total, keep it near the number of extraction workers
+# so ordering decisions stay here instead of in the broker's FIFO
+SCHEDULER_MAX_DISPATCHED = int(os.getenv("SCHEDULER_MAX_DISPATCHED", "8"))
+# jobs held here waiting for their turn (unacked on the inbox queue)
+SCHEDULER_PREFETCH = int(os.getenv("SCHEDULER_PREFETCH", "2000"))
+# a dispatched job without a done notice after this long is assumed lost
+SCHEDULER_INFLIGHT_TIMEOUT = float(os.getenv("SCHEDULER_INFLIGHT_TIMEOUT", "1800"))
+
+# sidecar port serving /metrics (0 disables it)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+# Debug mode
+DEBUG = os.getenv("DEBUG") == "True"
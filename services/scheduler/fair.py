@@ -0,0 +1,109 @@
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+
+def parse_overrides(spec: str) -> dict[str, int]:
+    """"000_000_001=4,000_000_002=1" -> {"000_000_001": 4, "000_000_002": 1}"""
+    overrides = {}
+    for part in spec.split(","):
+        if "=" in part:
+            customer_id, value = part.split("=", 1)
+            overrides[customer_id.strip()] = int(value)
+    return overrides
+
+
+@dataclass
+class PendingJob:
+    job_id: str
+    customer_id: str
+    cost: int
+    item: Any = None  # the queued message, handed back on dispatch
+    dispatched_at: Optional[float] = field(default=None, compare=False)
+
+
+class FairScheduler:
+    """
+    Deficit round robin across customers.
+
+    Each customer has its own FIFO. On its turn a customer earns
+    `quantum x weight` pages of credit and sends jobs while the credit
+    covers their cost, so customers get an equal share of pages processed
+    however many statements each has queued. A customer at its concurrency
+    cap is skipped without earning credit, and nothing is released once
+    `max_dispatched` jobs are already out.
+    """
+
+    def __init__(self, quantum: int, default_cap: int, caps: Optional[dict] = None,
+                 weights: Optional[dict] = None, max_dispatched: int = 8):
+        self.quantum = quantum
+        self.default_cap = default_cap
+        self.caps = caps or {}
+        self.weights = weights or {}
+        self.max_dispatched = max_dispatched
+        self._queues: dict[str, deque] = {}
+        self._active = deque()  # customers with jobs waiting, in round robin order
+        self._deficit: dict[str, int] = {}
+        self._in_flight: dict[str, PendingJob] = {}
+
+    def add(self, job_id: str, customer_id: str, cost: int = 1, item: Any = None):
+        queue = self._queues.setdefault(customer_id, deque())
+        if not queue:
+            self._active.append(customer_id)
+            self._deficit[customer_id] = 0
+        queue.append(PendingJob(job_id, customer_id, max(1, cost), item))
+
+    def _at_cap(self, customer_id: str) -> bool:
+        return self.in_flight(customer_id) >= self.caps.get(customer_id, self.default_cap)
+
+    def next_job(self) -> Optional[PendingJob]:
+        if len(self._in_flight) >= self.max_dispatched:
+            return None
+
+        skipped = 0
+        while self._active and skipped < len(self._active):
+            customer_id = self._active[0]
+            if self._at_cap(customer_id):
+                self._active.rotate(-1)
+                skipped += 1
+                continue
+            skipped = 0
+
+            queue = self._queues[customer_id]
+            if self._deficit[customer_id] >= queue[0].cost:
+                job = queue.popleft()
+                self._deficit[customer_id] -= job.cost
+                if not queue:
+                    # an idle customer doesn't bank credit for later
+                    self._active.popleft()
+                    del self._queues[customer_id]
+                    self._deficit[customer_id] = 0
+                job.dispatched_at = time.monotonic()
+                self._in_flight[job.job_id] = job
+                return job
+
+            self._deficit[customer_id] += self.quantum * self.weights.get(customer_id, 1)
+            self._active.rotate(-1)
+
+        return None
+
+    def complete(self, job_id: str) -> bool:
+        return self._in_flight.pop(job_id, None) is not None
+
+    def expire(self, timeout: float, now: Optional[float] = None) -> list[str]:
+        """Forget dispatched jobs whose done notice never came, so their customer isn't capped forever"""
+        now = time.monotonic() if now is None else now
+        expired = [j.job_id for j in self._in_flight.values() if now - j.dispatched_at > timeout]
+        for job_id in expired:
+            del self._in_flight[job_id]
+        return expired
+
+    def depth(self, customer_id: str) -> int:
+        return len(self._queues.get(customer_id, ()))
+
+    def in_flight(self, customer_id: str) -> int:
+        return sum(1 for j in self._in_flight.values() if j.customer_id == customer_id)
+
+    def customers(self) -> set[str]:
+        return set(self._queues) | {j.customer_id for j in self._in_flight.values()}
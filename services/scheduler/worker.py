@@ -0,0 +1,120 @@
+import asyncio
+import aio_pika
+import json
+import os
+from services.scheduler.config import (
+    RABBITMQ_URL, SCHEDULER_QUANTUM_PAGES, SCHEDULER_CUSTOMER_CAP, SCHEDULER_CUSTOMER_CAPS,
+    SCHEDULER_CUSTOMER_WEIGHTS, SCHEDULER_MAX_DISPATCHED, SCHEDULER_PREFETCH,
+    SCHEDULER_INFLIGHT_TIMEOUT, METRICS_PORT, DEBUG,
+)
+from services.scheduler.fair import FairScheduler, PendingJob, parse_overrides
+from shared.config import SCHEDULER_QUEUE, EXTRACTION_DONE_QUEUE
+from shared.lanes import queue_for_lane
+from shared.metrics import (
+    SCHEDULER_QUEUE_DEPTH, SCHEDULER_IN_FLIGHT, publish_headers, observe_queue_lag, start_metrics_server,
+)
+from shared.tracing import init_tracing, start_span, inject_trace_context, extract_trace_context
+
+WORKER_NAME = os.getenv('HOSTNAME', 'scheduler_local')
+
+scheduler = FairScheduler(
+    quantum=SCHEDULER_QUANTUM_PAGES,
+    default_cap=SCHEDULER_CUSTOMER_CAP,
+    caps=parse_overrides(SCHEDULER_CUSTOMER_CAPS),
+    weights=parse_overrides(SCHEDULER_CUSTOMER_WEIGHTS),
+    max_dispatched=SCHEDULER_MAX_DISPATCHED,
+)
+_dispatch_lock = asyncio.Lock()
+_reported_customers = set()
+
+
+def update_gauges():
+    customers = scheduler.customers()
+    for customer_id in customers:
+        SCHEDULER_QUEUE_DEPTH.labels(customer_id).set(scheduler.depth(customer_id))
+        SCHEDULER_IN_FLIGHT.labels(customer_id).set(scheduler.in_flight(customer_id))
+    for customer_id in _reported_customers - customers:
+        SCHEDULER_QUEUE_DEPTH.remove(customer_id)
+        SCHEDULER_IN_FLIGHT.remove(customer_id)
+    _reported_customers.clear()
+    _reported_customers.update(customers)
+
+
+async def forward(channel: aio_pika.abc.AbstractChannel, job: PendingJob):
+    """Publish the held message to its extraction lane, then ack it on the scheduler queue"""
+    message = job.item
+    data = json.loads(message.body.decode())
+    lane_queue = queue_for_lane(data.get("lane", "standard"))
+
+    with start_span("dispatch", parent=extract_trace_context(message.headers), job_id=job.job_id,
+                    customer_id=job.customer_id, lane_queue=lane_queue):
+        await channel.declare_queue(lane_queue, durable=True)
+        await channel.default_exchange.publish(
+            aio_pika.Message(
+                body=message.body,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                correlation_id=job.job_id,
+                headers=inject_trace_context(publish_headers())
+            ),
+            routing_key=lane_queue,
+        )
+    await message.ack()
+    if DEBUG: print(f"[*] [{WORKER_NAME}] Dispatched {job.job_id} for {job.customer_id} to {lane_queue}")
+
+
+async def dispatch(channel: aio_pika.abc.AbstractChannel):
+    async with _dispatch_lock:
+        while (job := scheduler.next_job()) is not None:
+            try:
+                await forward(channel, job)
+            except Exception as e:
+                # hand it back to the broker, it comes round again through on_job
+                print(f"[!] [{WORKER_NAME}] Dispatch of {job.job_id} failed: {e}")
+                scheduler.complete(job.job_id)
+                await job.item.nack(requeue=True)
+                break
+        update_gauges()
+
+
+async def main():
+    init_tracing("scheduler")
+    start_metrics_server(METRICS_PORT)
+    connection = await aio_pika.connect_robust(RABBITMQ_URL)
+    async with connection:
+        channel = await connection.channel()
+        # jobs wait here unacked until their turn, so a restart hands them back to the broker
+        await channel.set_qos(prefetch_count=SCHEDULER_PREFETCH)
+        publish_channel = await connection.channel()
+
+        inbox = await channel.declare_queue(SCHEDULER_QUEUE, durable=True)
+        done = await channel.declare_queue(EXTRACTION_DONE_QUEUE, durable=True)
+
+        async def on_job(message: aio_pika.IncomingMessage):
+            observe_queue_lag("scheduler", SCHEDULER_QUEUE, message.headers)
+            try:
+                data = json.loads(message.body.decode())
+                scheduler.add(data["job_id"], data["customer_id"], int(data.get("cost") or 1), message)
+            except Exception as e:
+                print(f"[!] [{WORKER_NAME}] Rejecting malformed job message: {e}")
+                await message.reject()
+                return
+            await dispatch(publish_channel)
+
+        async def on_done(message: aio_pika.IncomingMessage):
+            async with message.process():
+                scheduler.complete(json.loads(message.body.decode()).get("job_id"))
+            await dispatch(publish_channel)
+
+        await inbox.consume(on_job)
+        await done.consume(on_done)
+        print(f" [*] [{WORKER_NAME}] Scheduler active. Listening on {SCHEDULER_QUEUE}...")
+
+        while True:
+            await asyncio.sleep(30)
+            expired = scheduler.expire(SCHEDULER_INFLIGHT_TIMEOUT)
+            if expired:
+                print(f"[!] [{WORKER_NAME}] No done notice for {len(expired)} jobs, releasing their slots")
+            await dispatch(publish_channel)
+
+if __name__ == "__main__":
+    asyncio.run(main())
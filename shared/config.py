@@ -5,4 +5,41 @@ load_dotenv()
 
 DEBUG = os.getenv("DEBUG") == "True"
 
-DATABASE_URL = os.getenv("DATABASE_URL")
\ No newline at end of file
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# span export, either a local JSON-lines file or an HTTP collector (both optional)
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")
+TRACE_EXPORT_URL = os.getenv("TRACE_EXPORT_URL")
+# span batches waiting for the exporter thread, more are dropped while the collector is slow
+TRACE_EXPORT_QUEUE_SIZE = int(os.getenv("TRACE_EXPORT_QUEUE_SIZE", "1000"))
+
+# opt-in per-worker profiling, can also be toggled at runtime with a control message
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED") == "True"
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")  # "sample" (folded stacks) or "cprofile"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "data/profiles")
+PROFILE_EVERY_N_JOBS = int(os.getenv("PROFILE_EVERY_N_JOBS", "20"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+WORKER_CONTROL_EXCHANGE = os.getenv("WORKER_CONTROL_EXCHANGE", "worker_control")
+
+# extraction lanes, ingest routes each job by its estimated cost so small statements
+# don't queue behind bulk ones. The standard lane is the plain raw extraction queue.
+RAW_EXTRACTION_QUEUE = os.getenv("RAW_EXTRACTION_QUEUE") or "raw_extraction_queue"
+FAST_LANE_MAX_PAGES = int(os.getenv("FAST_LANE_MAX_PAGES", "5"))
+BULK_LANE_MIN_PAGES = int(os.getenv("BULK_LANE_MIN_PAGES", "100"))
+# scans are mostly image bytes, so size is converted to a page estimate as well
+LANE_BYTES_PER_PAGE = int(os.getenv("LANE_BYTES_PER_PAGE", str(150 * 1024)))
+# pages without a text layer go through OCR, each costs this many text pages
+OCR_PAGE_COST = int(os.getenv("OCR_PAGE_COST", "10"))
+# relative share of picks each lane gets when several have work waiting
+LANE_WEIGHTS = os.getenv("LANE_WEIGHTS", "fast=6,standard=3,bulk=1")
+
+# per-customer fair scheduling between ingest and the extraction lanes (services/scheduler)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED") == "True"
+SCHEDULER_QUEUE = os.getenv("SCHEDULER_QUEUE", "extraction_scheduler_queue")
+EXTRACTION_DONE_QUEUE = os.getenv("EXTRACTION_DONE_QUEUE", "extraction_done_queue")
+
+# Parquet lake of parsed transactions, partitioned by month and customer (blank disables writes);
+# compaction merges a partition's files once they're old enough that no retry rewrites them
+TRANSACTION_LAKE_DIR = os.getenv("TRANSACTION_LAKE_DIR", "data/transaction_lake")
+LAKE_COMPACT_MIN_AGE_S = float(os.getenv("LAKE_COMPACT_MIN_AGE_S", "3600"))
+LAKE_COMPACT_TARGET_MB = int(os.getenv("LAKE_COMPACT_TARGET_MB", "128"))
@@ -1,7 +1,8 @@
 import os
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import sessionmaker
 from shared.config import DATABASE_URL
+from shared.models import Base  # noqa: F401, create_all and alembic import it from here
 
 
 engine = create_async_engine(DATABASE_URL, echo=False)
@@ -10,7 +11,6 @@ AsyncSessionLocal = sessionmaker(
     class_=AsyncSession, 
     expire_on_commit=False
 )
-Base = declarative_base()
 
 async def get_db():
     async with AsyncSessionLocal() as session:
@@ -0,0 +1,215 @@
+"""
+Parquet lake of every parsed transaction.
+
+Rows are partitioned hive-style by transaction month and customer,
+
+    <TRANSACTION_LAKE_DIR>/month=2025-01/customer_id=000_000_042/<job_id>.parquet
+
+one file per job and partition, written under a temporary name and renamed
+into place, so a retried job replaces its own file rather than adding a
+second copy. Reads go through pyarrow.dataset with filters on the
+partition fields, so a query for one customer and quarter opens only the
+files under those three months and that customer, and only the columns it
+asks for.
+
+Appends leave many small files; `python -m shared.lake compact` merges the
+files of each partition once they're older than LAKE_COMPACT_MIN_AGE_S
+(long after any retry of the job could rewrite them) into files of up to
+LAKE_COMPACT_TARGET_MB. The merged file is renamed in before the small
+ones are removed, so a reader never misses rows, at worst it sees a
+partition twice for the instant between the two.
+"""
+import argparse
+import os
+import time
+import uuid
+from datetime import date, datetime
+from typing import Iterable, Optional
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from shared.config import TRANSACTION_LAKE_DIR, LAKE_COMPACT_MIN_AGE_S, LAKE_COMPACT_TARGET_MB
+
+AMOUNT = pa.decimal128(14, 2)
+SCHEMA = pa.schema([
+    ("job_id", pa.string()),
+    ("filename", pa.string()),
+    ("transaction_id", pa.string()),
+    ("date", pa.timestamp("us")),
+    ("vendor", pa.string()),
+    ("amount", AMOUNT),
+    ("balance", AMOUNT),
+    ("normalized_vendor", pa.string()),
+    ("category", pa.string()),
+])
+PARTITION_SCHEMA = pa.schema([("month", pa.string()), ("customer_id", pa.string())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+# what a read returns: the stored columns plus the partition fields
+DATASET_SCHEMA = pa.unify_schemas([SCHEMA, PARTITION_SCHEMA])
+
+
+def _month(day: date) -> str:
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+def partition_dir(directory: str, month: str, customer_id: str) -> str:
+    # hive segments are URI-decoded on read, so odd characters in ids survive the round trip
+    return os.path.join(directory, f"month={month}", f"customer_id={quote(customer_id, safe='')}")
+
+
+def _write(table: pa.Table, path: str):
+    """Write next to `path` under a name dataset discovery skips, then rename over it"""
+    staging = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+    try:
+        pq.write_table(table, staging, compression="zstd")
+        os.replace(staging, path)
+    finally:
+        if os.path.exists(staging):
+            os.remove(staging)
+
+
+def append_transactions(customer_id: str, job_id: str, filename: str, transactions: list,
+                        directory: str = TRANSACTION_LAKE_DIR) -> list[str]:
+    """Store one document's transactions, returns the files written"""
+    by_month: dict[str, list] = {}
+    for t in transactions:
+        by_month.setdefault(_month(t.date), []).append(t)
+
+    written = []
+    for month, rows in sorted(by_month.items()):
+        table = pa.table({
+            "job_id": [job_id] * len(rows),
+            "filename": [filename] * len(rows),
+            "transaction_id": [t.transaction_id for t in rows],
+            "date": [t.date for t in rows],
+            "vendor": [t.vendor for t in rows],
+            "amount": [t.amount for t in rows],
+            "balance": [t.balance for t in rows],
+            "normalized_vendor": [t.normalized_vendor for t in rows],
+            "category": [t.category for t in rows],
+        }, schema=SCHEMA)
+        target = partition_dir(directory, month, customer_id)
+        os.makedirs(target, exist_ok=True)
+        path = os.path.join(target, f"{quote(job_id, safe='')}.parquet")
+        _write(table, path)
+        written.append(path)
+    return written
+
+
+def dataset(directory: str = TRANSACTION_LAKE_DIR) -> ds.Dataset:
+    return ds.dataset(directory, format="parquet", partitioning=PARTITIONING, schema=DATASET_SCHEMA)
+
+
+def _filter(customer_ids: Optional[Iterable[str]], start: Optional[date], end: Optional[date]):
+    """Partition predicates that prune directories, plus the exact date range on rows"""
+    expression = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    if customer_ids is not None:
+        expression = both(expression, ds.field("customer_id").isin(list(customer_ids)))
+    if start:
+        expression = both(expression, ds.field("month") >= _month(start))
+        expression = both(expression, ds.field("date") >= datetime.combine(start, datetime.min.time()))
+    if end:
+        expression = both(expression, ds.field("month") <= _month(end))
+        expression = both(expression, ds.field("date") <= datetime.combine(end, datetime.max.time()))
+    return expression
+
+
+def read_transactions(customer_ids: Optional[Iterable[str]] = None, start: Optional[date] = None,
+                      end: Optional[date] = None, columns: Optional[list[str]] = None,
+                      directory: str = TRANSACTION_LAKE_DIR) -> pa.Table:
+    """Transactions for the given customers and inclusive date range, only the listed columns"""
+    if not os.path.isdir(directory):
+        empty = DATASET_SCHEMA.empty_table()
+        return empty.select(columns) if columns else empty
+    return dataset(directory).to_table(columns=columns, filter=_filter(customer_ids, start, end))
+
+
+def files_for(customer_ids: Optional[Iterable[str]] = None, start: Optional[date] = None,
+              end: Optional[date] = None, directory: str = TRANSACTION_LAKE_DIR) -> list[str]:
+    """The files a read with these filters opens"""
+    return sorted(f.path for f in dataset(directory).get_fragments(filter=_filter(customer_ids, start, end)))
+
+
+def _partitions(directory: str):
+    for month in sorted(os.listdir(directory)):
+        if not month.startswith("month="):
+            continue
+        for customer in sorted(os.listdir(os.path.join(directory, month))):
+            if customer.startswith("customer_id="):
+                yield os.path.join(directory, month, customer)
+
+
+def _batches(files: list[str], target_bytes: int) -> list[list[str]]:
+    batches, size = [[]], 0
+    for path in files:
+        file_size = os.path.getsize(path)
+        if batches[-1] and size + file_size > target_bytes:
+            batches.append([])
+            size = 0
+        batches[-1].append(path)
+        size += file_size
+    return [b for b in batches if len(b) > 1]
+
+
+def compact(directory: str = TRANSACTION_LAKE_DIR, min_age_s: float = LAKE_COMPACT_MIN_AGE_S,
+            target_bytes: int = LAKE_COMPACT_TARGET_MB * 1024 * 1024) -> dict:
+    """Merge each partition's settled small files, returns counts of partitions and files touched"""
+    stats = {"partitions": 0, "files_in": 0, "files_out": 0}
+    if not os.path.isdir(directory):
+        return stats
+    cutoff = time.time() - min_age_s
+    for partition in _partitions(directory):
+        settled = sorted(
+            path for path in (os.path.join(partition, f) for f in os.listdir(partition) if f.endswith(".parquet"))
+            if os.path.getmtime(path) <= cutoff and os.path.getsize(path) < target_bytes
+        )
+        batches = _batches(settled, target_bytes)
+        for batch in batches:
+            table = pa.concat_tables(pq.read_table(path, schema=SCHEMA) for path in batch)
+            _write(table.sort_by([("date", "ascending"), ("job_id", "ascending")]),
+                   os.path.join(partition, f"compacted-{uuid.uuid4().hex}.parquet"))
+            for path in batch:
+                os.remove(path)
+            stats["files_in"] += len(batch)
+            stats["files_out"] += 1
+        stats["partitions"] += bool(batches)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain and query the Parquet transaction lake")
+    lake = argparse.ArgumentParser(add_help=False)
+    lake.add_argument("--dir", default=TRANSACTION_LAKE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    compaction = sub.add_parser("compact", parents=[lake], help="merge small files in each partition")
+    compaction.add_argument("--min-age-s", type=float, default=LAKE_COMPACT_MIN_AGE_S)
+    compaction.add_argument("--target-mb", type=int, default=LAKE_COMPACT_TARGET_MB)
+    query = sub.add_parser("query", parents=[lake], help="count and preview transactions matching the filters")
+    query.add_argument("--customer", action="append", dest="customers")
+    query.add_argument("--start", type=date.fromisoformat)
+    query.add_argument("--end", type=date.fromisoformat)
+    query.add_argument("--columns", help="comma separated")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        stats = compact(args.dir, args.min_age_s, args.target_mb * 1024 * 1024)
+        print(f"[+] Compacted {stats['files_in']} files into {stats['files_out']} "
+              f"across {stats['partitions']} partitions")
+        return
+
+    columns = args.columns.split(",") if args.columns else None
+    files = files_for(args.customers, args.start, args.end, args.dir)
+    table = read_transactions(args.customers, args.start, args.end, columns, args.dir)
+    print(f"[*] {table.num_rows} transactions from {len(files)} files")
+    print(table.slice(0, 20).to_pandas().to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Cost-based lanes for the raw extraction queue.
+
+Ingest estimates a job's cost from its page count, size and whether it has
+a text layer (scans need OCR) and publishes
+it to the fast, standard or bulk lane queue. Workers consume every lane
+and pick the next message with smooth weighted round robin, so a backlog
+of bulk statements only gets its share of the worker's time and small
+jobs keep moving.
+"""
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+import aio_pika
+
+from shared.config import (
+    RAW_EXTRACTION_QUEUE, FAST_LANE_MAX_PAGES, BULK_LANE_MIN_PAGES, LANE_BYTES_PER_PAGE, LANE_WEIGHTS, OCR_PAGE_COST,
+)
+
+LANES = ("fast", "standard", "bulk")
+
+
+def queue_for_lane(lane: str, base: str = RAW_EXTRACTION_QUEUE) -> str:
+    # the standard lane keeps the original queue name, so older publishers still work
+    return base if lane == "standard" else f"{base}_{lane}"
+
+
+def estimate_pages(pages: Optional[int], size_bytes: int, text_layer: Optional[bool] = None) -> int:
+    """
+    Cost in pages, the larger of the real page count and the size-based
+    estimate, with every page priced as OCR if the pre-flight found no text layer
+    """
+    by_size = -(-size_bytes // LANE_BYTES_PER_PAGE)
+    by_pages = (pages or 0) * (OCR_PAGE_COST if text_layer is False else 1)
+    return max(by_pages, by_size, 1)
+
+
+def lane_for(pages: Optional[int], size_bytes: int, text_layer: Optional[bool] = None) -> str:
+    cost = estimate_pages(pages, size_bytes, text_layer)
+    if cost <= FAST_LANE_MAX_PAGES:
+        return "fast"
+    if cost >= BULK_LANE_MIN_PAGES:
+        return "bulk"
+    return "standard"
+
+
+def parse_weights(spec: str = LANE_WEIGHTS) -> dict[str, int]:
+    """"fast=6,standard=3,bulk=1" -> {"fast": 6, ...}, unlisted lanes get weight 1"""
+    weights = {lane: 1 for lane in LANES}
+    for part in spec.split(","):
+        if "=" in part:
+            lane, weight = part.split("=", 1)
+            if lane.strip() not in weights:
+                raise ValueError(f"Unknown lane in LANE_WEIGHTS: {lane.strip()}")
+            weights[lane.strip()] = max(1, int(weight))
+    return weights
+
+
+class WeightedLaneConsumer:
+    """
+    Consume all lanes and run one message at a time, picked by weight.
+
+    Each lane has its own channel with prefetch 1, so at most one message
+    per lane waits here unacknowledged. When several lanes have a message
+    waiting, smooth weighted round robin decides which runs next; a lane
+    with nothing waiting gives up its turn rather than stalling the others.
+    """
+
+    def __init__(self, handler: Callable[[aio_pika.IncomingMessage], Awaitable], weights: dict[str, int]):
+        self.handler = handler
+        self.weights = weights
+        self._waiting: dict[str, list] = {lane: [] for lane in weights}
+        self._credit = {lane: 0 for lane in weights}
+        self._ready = asyncio.Event()
+
+    def offer(self, lane: str, message):
+        self._waiting[lane].append(message)
+        self._ready.set()
+
+    def next_lane(self) -> Optional[str]:
+        eligible = [lane for lane, messages in self._waiting.items() if messages]
+        if not eligible:
+            return None
+        total = sum(self.weights[lane] for lane in eligible)
+        for lane in eligible:
+            self._credit[lane] += self.weights[lane]
+        chosen = max(eligible, key=lambda lane: self._credit[lane])
+        self._credit[chosen] -= total
+        return chosen
+
+    async def subscribe(self, connection: aio_pika.abc.AbstractRobustConnection, base: str = RAW_EXTRACTION_QUEUE):
+        for lane in self.weights:
+            channel = await connection.channel()
+            await channel.set_qos(prefetch_count=1)
+            queue = await channel.declare_queue(queue_for_lane(lane, base), durable=True)
+
+            async def on_message(message: aio_pika.IncomingMessage, lane=lane):
+                self.offer(lane, message)
+
+            await queue.consume(on_message)
+
+    async def run(self):
+        while True:
+            lane = self.next_lane()
+            if lane is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            try:
+                await self.handler(self._waiting[lane].pop(0))
+            except Exception as e:
+                print(f"[!] Unhandled error in {lane} lane handler: {e}")
@@ -0,0 +1,130 @@
+"""
+Fuzzy name and address matching for customer-vs-document checks.
+
+Both sides are reduced to sets of canonical tokens: upper case ASCII,
+punctuation and line breaks dropped, titles removed from names, street
+type abbreviations expanded and postcodes joined into one token in
+addresses. Two token sets are compared by counting tokens in common, where
+a word of three or more characters also matches one a single edit away
+(OCR slips) and, in names, an initial matches the word it starts. The
+score averages the matched share of the shorter and of the longer set, so
+word order and an extra middle name or "Ireland" cost little while a
+different surname or street costs a lot. House numbers and street types
+are strict: if both addresses carry them and none agree the score is 0.
+
+The customer's token sets are computed once by customer_lookup and shipped
+with the profile; the document's are computed once per document.
+"""
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+# bump when normalisation changes, so profiles cached with the old rules are recomputed
+MATCHING_VERSION = 1
+
+NAME_STOPWORDS = frozenset({"MR", "MRS", "MS", "MISS", "MX", "DR", "PROF", "SIR", "JR", "SR", "AND"})
+ADDRESS_STOPWORDS = frozenset({"THE", "OF", "CO", "COUNTY"})
+ADDRESS_ABBREVIATIONS = {
+    "ST": "STREET", "STR": "STREET", "RD": "ROAD", "AVE": "AVENUE", "AV": "AVENUE", "DR": "DRIVE",
+    "LN": "LANE", "CT": "COURT", "PL": "PLACE", "SQ": "SQUARE", "TCE": "TERRACE", "TER": "TERRACE",
+    "CRES": "CRESCENT", "GRN": "GREEN", "GDNS": "GARDENS", "PK": "PARK", "HTS": "HEIGHTS", "CL": "CLOSE",
+    "BLVD": "BOULEVARD", "HWY": "HIGHWAY", "APT": "APARTMENT", "FL": "FLAT", "MT": "MOUNT", "UPR": "UPPER",
+    "LWR": "LOWER",
+}
+STREET_TYPES = frozenset(ADDRESS_ABBREVIATIONS.values()) - {"APARTMENT", "FLAT", "MOUNT", "UPPER", "LOWER"}
+# Irish Eircodes and UK postcodes, written with or without the inner space
+POSTCODE = re.compile(r"\b([AC-FHKNPRTV-Y]\d{2}|D6W)\s?([0-9AC-FHKNPRTV-Y]{4})\b|\b([A-Z]{1,2}\d[A-Z\d]?)\s?(\d[A-Z]{2})\b")
+_NON_WORD = re.compile(r"[^0-9A-Z]+")
+
+
+def _fold(text: str) -> str:
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    # O'Brien and D'Arcy are one word
+    return text.upper().replace("'", "")
+
+
+@lru_cache(maxsize=4096)
+def name_tokens(name: str) -> frozenset[str]:
+    return frozenset(t for t in _NON_WORD.sub(" ", _fold(name or "")).split() if t not in NAME_STOPWORDS)
+
+
+@lru_cache(maxsize=4096)
+def address_tokens(address: str) -> frozenset[str]:
+    text = POSTCODE.sub(lambda m: " " + "".join(g for g in m.groups() if g) + " ", _fold(address or ""))
+    tokens = (ADDRESS_ABBREVIATIONS.get(t, t) for t in _NON_WORD.sub(" ", text).split())
+    return frozenset(t for t in tokens if t not in ADDRESS_STOPWORDS)
+
+
+def _one_edit_apart(a: str, b: str) -> bool:
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    # substitution, or b has one extra character at i
+    return a[i + 1:] == b[i + 1:] if len(a) == len(b) else a[i:] == b[i + 1:]
+
+
+def _close(a: str, b: str, initials: bool) -> bool:
+    # plain numbers never match loosely, words with a digit in them may be OCR slips (0AK)
+    if a.isdigit() or b.isdigit():
+        return False
+    if initials and (len(a) == 1 or len(b) == 1):
+        return a[0] == b[0]
+    return min(len(a), len(b)) >= 3 and _one_edit_apart(a, b)
+
+
+def token_set_similarity(a: frozenset[str], b: frozenset[str], initials: bool = False) -> float:
+    if not a or not b:
+        return 1.0 if a == b else 0.0
+    common = a & b
+    matched = len(common)
+    if matched < min(len(a), len(b)):
+        rest_b = sorted(b - common)
+        for token in sorted(a - common):
+            for j, other in enumerate(rest_b):
+                if _close(token, other, initials):
+                    matched += 1
+                    del rest_b[j]
+                    break
+    return (matched / min(len(a), len(b)) + matched / max(len(a), len(b))) / 2
+
+
+def name_similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    return token_set_similarity(a, b, initials=True)
+
+
+def _disagree(a: set, b: set) -> bool:
+    return bool(a and b and not a & b)
+
+
+def address_similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    if _disagree({t for t in a if t.isdigit()}, {t for t in b if t.isdigit()}) \
+            or _disagree(a & STREET_TYPES, b & STREET_TYPES):
+        return 0.0
+    return token_set_similarity(a, b)
+
+
+@dataclass(frozen=True)
+class PartyProfile:
+    name: frozenset[str]
+    address: frozenset[str]
+
+    def to_dict(self) -> dict:
+        return {"version": MATCHING_VERSION, "name": sorted(self.name), "address": sorted(self.address)}
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional["PartyProfile"]:
+        """None for a missing profile or one normalised by an older version of this module"""
+        if not data or data.get("version") != MATCHING_VERSION:
+            return None
+        return cls(frozenset(data["name"]), frozenset(data["address"]))
+
+
+def party_profile(name: str, address: str) -> PartyProfile:
+    return PartyProfile(name_tokens(name), address_tokens(address))
@@ -0,0 +1,154 @@
+import time
+from contextlib import asynccontextmanager, contextmanager
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# latency buckets cover everything from a DB write (ms) to a long OCR run (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_LATENCY = Histogram(
+    "amlytica_stage_latency_seconds",
+    "Time spent in a single pipeline stage",
+    ["service", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+QUEUE_LAG = Histogram(
+    "amlytica_queue_consumer_lag_seconds",
+    "Delay between a message being published and a worker picking it up",
+    ["service", "queue"],
+    buckets=LATENCY_BUCKETS,
+)
+
+JOBS_IN_FLIGHT = Gauge(
+    "amlytica_jobs_in_flight",
+    "Jobs currently being processed",
+    ["service"],
+)
+
+JOBS_PROCESSED = Counter(
+    "amlytica_jobs_processed_total",
+    "Jobs processed, by outcome",
+    ["service", "outcome"],
+)
+
+BYTES_PROCESSED = Counter(
+    "amlytica_bytes_processed_total",
+    "Bytes of input processed",
+    ["service"],
+)
+
+# hit rate = result="hit" / all results for a given cache
+CACHE_REQUESTS = Counter(
+    "amlytica_cache_requests_total",
+    "Cache lookups, by result",
+    ["cache", "result"],
+)
+
+CACHE_SECONDS_SAVED = Counter(
+    "amlytica_cache_seconds_saved_total",
+    "Compute time a cache hit avoided, as measured when the entry was stored",
+    ["cache"],
+)
+
+# label per customer, the scheduler removes a customer's series once it has nothing queued or running
+SCHEDULER_QUEUE_DEPTH = Gauge(
+    "amlytica_scheduler_queue_depth",
+    "Jobs waiting in the fair scheduler, per customer",
+    ["customer_id"],
+)
+
+SCHEDULER_IN_FLIGHT = Gauge(
+    "amlytica_scheduler_in_flight",
+    "Jobs released to the extraction lanes and not yet finished, per customer",
+    ["customer_id"],
+)
+
+AUTOSCALER_RECOMMENDED_REPLICAS = Gauge(
+    "amlytica_autoscaler_recommended_replicas",
+    "Replica count the autoscaler recommends for a worker fleet",
+    ["stage"],
+)
+
+AUTOSCALER_BACKLOG = Gauge(
+    "amlytica_autoscaler_backlog_messages",
+    "Ready plus unacknowledged messages in a stage's input queues",
+    ["stage"],
+)
+
+AUTOSCALER_ARRIVAL_RATE = Gauge(
+    "amlytica_autoscaler_arrival_rate",
+    "Messages per second published to a stage's input queues",
+    ["stage"],
+)
+
+AUTOSCALER_SERVICE_TIME = Gauge(
+    "amlytica_autoscaler_service_time_seconds",
+    "Median per-job processing time of a stage",
+    ["stage"],
+)
+
+RULE_LATENCY = Histogram(
+    "amlytica_analysis_rule_latency_seconds",
+    "Time one analysis flag rule spent on a document",
+    ["rule"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025) + LATENCY_BUCKETS,
+)
+
+# label per learned bank layout, parse rate = outcome="parsed" rows / all rows of a template
+LAYOUT_TEMPLATE_DOCUMENTS = Counter(
+    "amlytica_layout_template_documents_total",
+    "Statements of a known layout, by whether its template parsed them or the generic parser had to",
+    ["template", "outcome"],
+)
+
+LAYOUT_TEMPLATE_ROWS = Counter(
+    "amlytica_layout_template_rows_total",
+    "Dated lines a layout template read as transactions or skipped",
+    ["template", "outcome"],
+)
+
+PUBLISHED_AT_HEADER = "x-published-at"
+
+
+@contextmanager
+def stage_timer(service: str, stage: str):
+    """Observe the wall time of the wrapped block in the stage latency histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(service, stage).observe(time.perf_counter() - start)
+
+
+@asynccontextmanager
+async def track_in_flight(service: str):
+    """Async so it can share an `async with` with message.process()"""
+    JOBS_IN_FLIGHT.labels(service).inc()
+    try:
+        yield
+    finally:
+        JOBS_IN_FLIGHT.labels(service).dec()
+
+
+def publish_headers() -> dict:
+    """Headers to attach to every published message so consumers can measure lag"""
+    return {PUBLISHED_AT_HEADER: time.time()}
+
+
+def observe_queue_lag(service: str, queue: str, headers: dict):
+    published_at = (headers or {}).get(PUBLISHED_AT_HEADER)
+    if published_at is None:
+        return
+    QUEUE_LAG.labels(service, queue).observe(max(0.0, time.time() - float(published_at)))
+
+
+def record_cache_lookup(cache: str, hit: bool, seconds_saved: float = 0.0):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+    if hit and seconds_saved:
+        CACHE_SECONDS_SAVED.labels(cache).inc(seconds_saved)
+
+
+def start_metrics_server(port: int):
+    """Expose /metrics on a sidecar port for the non-HTTP workers (0 disables it)"""
+    if port:
+        start_http_server(port)
@@ -1,7 +1,10 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, Date, ForeignKey, Integer, Text, Float, Numeric, Index, BigInteger, UniqueConstraint, Boolean
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
-from .db import Base
+
+# kept apart from shared.db so the models import without a DATABASE_URL
+Base = declarative_base()
 
 class Job(Base):
     __tablename__ = "jobs"
@@ -11,6 +14,11 @@ class Job(Base):
     filename = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     current_status = Column(String, default="PENDING")
+    # ingest pre-flight, null for jobs uploaded before it ran
+    page_count = Column(Integer, nullable=True)
+    encrypted = Column(Boolean, nullable=True)
+    text_layer = Column(Boolean, nullable=True)
+    lane = Column(String, nullable=True)
     events = relationship("JobEvent", back_populates="job", cascade="all, delete-orphan")
 
 class JobEvent(Base):
@@ -30,4 +38,127 @@ class Customer(Base):
 
     customer_id = Column(String, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    address = Column(Text, nullable=True)
\ No newline at end of file
+    address = Column(Text, nullable=True)
+
+class CustomerStats(Base):
+    """Running count/mean/M2 of a customer's transaction amounts across every analysed statement"""
+    __tablename__ = "customer_stats"
+
+    customer_id = Column(String, primary_key=True, index=True)
+    count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0.0)
+    m2 = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class HistoryUpdate(Base):
+    """A job already folded into a running history, so a redelivered job isn't counted twice"""
+    __tablename__ = "history_updates"
+
+    job_id = Column(String, primary_key=True)
+    # "customer_stats" or "counterparty_graph"
+    history = Column(String, primary_key=True)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+class StatementIndex(Base):
+    """Date range and boundary balances of each analysed statement, for continuity checks"""
+    __tablename__ = "statement_index"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    customer_id = Column(String, nullable=False)
+    job_id = Column(String, ForeignKey("jobs.job_id"), unique=True, nullable=False)
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False)
+    opening_balance = Column(Numeric(14, 2), nullable=False)
+    closing_balance = Column(Numeric(14, 2), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # predecessor/successor lookups are a single descent of this index
+    __table_args__ = (Index("ix_statement_index_customer_period", "customer_id", "period_start"),)
+
+class TransactionFingerprint(Base):
+    """One row per analysed transaction, keyed by a hash of its normalised (date, vendor, amount)"""
+    __tablename__ = "transaction_fingerprints"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    customer_id = Column(String, nullable=False)
+    job_id = Column(String, ForeignKey("jobs.job_id"), nullable=False)
+    transaction_id = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    vendor = Column(String, nullable=False)
+    amount = Column(Numeric(14, 2), nullable=False)
+    fingerprint = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("job_id", "transaction_id"),
+        Index("ix_transaction_fingerprints_customer_fingerprint", "customer_id", "fingerprint"),
+    )
+
+class TransactionLshBand(Base):
+    """MinHash band keys of a fingerprinted transaction's vendor, for near-duplicate candidates"""
+    __tablename__ = "transaction_lsh_bands"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    fingerprint_id = Column(Integer, ForeignKey("transaction_fingerprints.id", ondelete="CASCADE"), nullable=False)
+    customer_id = Column(String, nullable=False)
+    band_key = Column(BigInteger, nullable=False)
+
+    __table_args__ = (Index("ix_transaction_lsh_bands_customer_band", "customer_id", "band_key"),)
+
+class GraphNode(Base):
+    """A customer or a counterparty (normalised vendor) in the cross-customer graph"""
+    __tablename__ = "graph_nodes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    component_id = Column(Integer, nullable=False)
+    # distinct neighbours: counterparties of a customer, customers of a counterparty
+    degree = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("kind", "key"),
+        # merges relabel a whole component, cluster queries list one
+        Index("ix_graph_nodes_component", "component_id"),
+    )
+
+class GraphEdge(Base):
+    """Money between a customer and a counterparty, summed over every analysed statement"""
+    __tablename__ = "graph_edges"
+
+    customer_node_id = Column(Integer, ForeignKey("graph_nodes.id"), primary_key=True)
+    counterparty_node_id = Column(Integer, ForeignKey("graph_nodes.id"), primary_key=True)
+    transactions = Column(Integer, nullable=False, default=0)
+    inflow = Column(Numeric(14, 2), nullable=False, default=0)
+    outflow = Column(Numeric(14, 2), nullable=False, default=0)
+    first_seen = Column(Date, nullable=False)
+    last_seen = Column(Date, nullable=False)
+
+    __table_args__ = (Index("ix_graph_edges_counterparty", "counterparty_node_id"),)
+
+class GraphComponent(Base):
+    """Connected component of the graph with statistics kept up to date as it grows and merges"""
+    __tablename__ = "graph_components"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    customers = Column(Integer, nullable=False, default=0)
+    counterparties = Column(Integer, nullable=False, default=0)
+    edges = Column(Integer, nullable=False, default=0)
+    # counterparties that two or more customers deal with, and the most customers any one has
+    shared_counterparties = Column(Integer, nullable=False, default=0)
+    max_counterparty_degree = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (Index("ix_graph_components_shared", "shared_counterparties"),)
+
+class AnalysisResult(Base):
+    """Latest analysis of each job, written by the analysis worker and by backfill runs"""
+    __tablename__ = "analysis_results"
+
+    job_id = Column(String, ForeignKey("jobs.job_id"), primary_key=True)
+    customer_id = Column(String, nullable=False, index=True)
+    # "worker", or the run id of the backfill that wrote it
+    source = Column(String, nullable=False)
+    hard_flags = Column(Integer, nullable=False)
+    soft_flags = Column(Integer, nullable=False)
+    results = Column(JSONB, nullable=False)
+    analysed_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,253 @@
+"""
+Opt-in profiling of worker jobs.
+
+Enable with PROFILE_ENABLED=True, or at runtime for every running worker:
+
+    python -m shared.profiling enable --service extraction --jobs 50
+    python -m shared.profiling disable
+"""
+import argparse
+import asyncio
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+import aio_pika
+
+from shared.config import (
+    DEBUG, PROFILE_ENABLED, PROFILE_MODE, PROFILE_DIR, PROFILE_EVERY_N_JOBS,
+    PROFILE_SAMPLE_INTERVAL_MS, WORKER_CONTROL_EXCHANGE,
+)
+
+_job_tags: ContextVar[Optional[dict]] = ContextVar("profile_job_tags", default=None)
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack on an interval and counts folded stacks"""
+
+    def __init__(self, thread_id: int, interval: float, counts: Counter):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = counts
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class JobProfiler:
+    """
+    Profiles whole jobs and writes one profile per `every_n_jobs` jobs.
+
+    "sample" mode writes folded stacks (`frame;frame;frame count`), which
+    flamegraph.pl and speedscope read directly. "cprofile" mode writes a
+    pstats dump. Each profile gets a JSON sidecar listing the jobs it
+    covers with their tags (pages, transactions, duration).
+    """
+
+    def __init__(self, service: str, worker_name: str, enabled: bool = PROFILE_ENABLED,
+                 mode: str = PROFILE_MODE, output_dir: str = PROFILE_DIR,
+                 every_n_jobs: int = PROFILE_EVERY_N_JOBS,
+                 interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS):
+        self.service = service
+        self.worker_name = worker_name
+        self.mode = mode
+        self.output_dir = output_dir
+        self.every_n_jobs = max(1, every_n_jobs)
+        self.interval = interval_ms / 1000
+        self.enabled = enabled
+        # jobs left before profiling switches itself off again (None = until disabled)
+        self.remaining_jobs = None
+        self._sequence = 0
+        self._in_flight = False
+        self._reset()
+
+    @property
+    def active(self) -> bool:
+        return self.enabled
+
+    def enable(self, jobs: Optional[int] = None):
+        self.enabled = True
+        self.remaining_jobs = jobs
+
+    def disable(self):
+        self.enabled = False
+        self.remaining_jobs = None
+        # a job still being sampled flushes once its sampler has stopped
+        if not self._in_flight:
+            self.flush()
+
+    def tag(self, **tags):
+        """Attach job size tags (pages, transactions, ...) to the job being profiled"""
+        current = _job_tags.get()
+        if current is not None:
+            current.update(tags)
+
+    def wrap(self, handler):
+        """Wrap a message handler so each call is profiled while profiling is enabled"""
+        @functools.wraps(handler)
+        async def wrapped(message: aio_pika.IncomingMessage):
+            if not self.enabled:
+                return await handler(message)
+
+            tags = {"job_id": message.correlation_id}
+            token = _job_tags.set(tags)
+            start = time.perf_counter()
+            self._in_flight = True
+            self._start()
+            try:
+                return await handler(message)
+            finally:
+                self._stop()
+                self._in_flight = False
+                tags["duration_s"] = round(time.perf_counter() - start, 4)
+                _job_tags.reset(token)
+                self._record(tags)
+
+        return wrapped
+
+    def flush(self):
+        """Write out whatever has been collected so far"""
+        if not self._jobs:
+            return
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base = os.path.join(self.output_dir, f"{self.service}_{self.worker_name}_{stamp}_{self._sequence:04d}")
+        self._sequence += 1
+
+        if self.mode == "cprofile":
+            profile_path = base + ".prof"
+            self._profile.dump_stats(profile_path)
+        else:
+            profile_path = base + ".folded"
+            with open(profile_path, "w") as f:
+                for stack, count in self._counts.most_common():
+                    f.write(f"{stack} {count}\n")
+
+        with open(base + ".json", "w") as f:
+            json.dump({
+                "service": self.service,
+                "worker": self.worker_name,
+                "mode": self.mode,
+                "profile": os.path.basename(profile_path),
+                "jobs": self._jobs,
+                "totals": {
+                    "jobs": len(self._jobs),
+                    "pages": sum(j.get("pages", 0) for j in self._jobs),
+                    "transactions": sum(j.get("transactions", 0) for j in self._jobs),
+                    "duration_s": round(sum(j["duration_s"] for j in self._jobs), 4),
+                },
+            }, f, indent=4, default=str)
+
+        if DEBUG: print(f"[*] [{self.worker_name}] Profile written: {profile_path}")
+        self._reset()
+
+    def _reset(self):
+        self._jobs = []
+        self._counts = Counter()
+        self._profile = cProfile.Profile() if self.mode == "cprofile" else None
+
+    def _start(self):
+        if self._profile is not None:
+            self._profile.enable()
+        else:
+            self._sampler = _StackSampler(threading.get_ident(), self.interval, self._counts)
+            self._sampler.start()
+
+    def _stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+        else:
+            self._sampler.stop()
+
+    def _record(self, tags: dict):
+        self._jobs.append(tags)
+        if self.remaining_jobs is not None:
+            self.remaining_jobs -= 1
+            if self.remaining_jobs <= 0:
+                self.enabled = False
+                self.remaining_jobs = None
+
+        if len(self._jobs) >= self.every_n_jobs or not self.enabled:
+            self.flush()
+
+    def handle_control(self, command: dict):
+        target = command.get("service")
+        if target and target != self.service:
+            return
+
+        if command.get("command") == "enable":
+            self.enable(command.get("jobs"))
+            print(f"[*] [{self.worker_name}] Profiling enabled ({command.get('jobs') or 'until disabled'} jobs)")
+        elif command.get("command") == "disable":
+            self.disable()
+            print(f"[*] [{self.worker_name}] Profiling disabled")
+
+
+async def listen_for_control(connection: aio_pika.abc.AbstractRobustConnection, profiler: JobProfiler):
+    """Bind a private queue to the control fanout so profiling can be toggled at runtime"""
+    channel = await connection.channel()
+    exchange = await channel.declare_exchange(WORKER_CONTROL_EXCHANGE, aio_pika.ExchangeType.FANOUT)
+    queue = await channel.declare_queue(exclusive=True, auto_delete=True)
+    await queue.bind(exchange)
+
+    async def on_message(message: aio_pika.IncomingMessage):
+        async with message.process():
+            try:
+                profiler.handle_control(json.loads(message.body.decode()))
+            except Exception as e:
+                print(f"[!] [{profiler.worker_name}] Bad control message: {e}")
+
+    await queue.consume(on_message)
+
+
+async def _send_control(rabbitmq_url: str, command: dict):
+    connection = await aio_pika.connect_robust(rabbitmq_url)
+    async with connection:
+        channel = await connection.channel()
+        exchange = await channel.declare_exchange(WORKER_CONTROL_EXCHANGE, aio_pika.ExchangeType.FANOUT)
+        await exchange.publish(aio_pika.Message(body=json.dumps(command).encode()), routing_key="")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Toggle profiling on running workers")
+    parser.add_argument("command", choices=["enable", "disable"])
+    parser.add_argument("--service", help="only this service (extraction, analysis, report)")
+    parser.add_argument("--jobs", type=int, help="switch off again after this many jobs")
+    parser.add_argument("--rabbitmq-url", default=os.getenv("RABBITMQ_URL"))
+    args = parser.parse_args()
+
+    if not args.rabbitmq_url:
+        raise ValueError("ERROR: RABBITMQ_URL environment variable not set")
+
+    asyncio.run(_send_control(args.rabbitmq_url, {
+        "command": args.command,
+        "service": args.service,
+        "jobs": args.jobs,
+    }))
+
+
+if __name__ == "__main__":
+    main()
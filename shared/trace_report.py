@@ -0,0 +1,128 @@
+"""
+Critical-path breakdown of the slowest jobs in an exported span file.
+
+    python -m shared.trace_report traces.jsonl --slowest 10
+"""
+import argparse
+import json
+from collections import defaultdict
+
+
+def load_traces(paths: list[str]) -> dict[str, list[dict]]:
+    traces = defaultdict(list)
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    span = json.loads(line)
+                    traces[span["trace_id"]].append(span)
+    return traces
+
+
+def critical_path(spans: list[dict]) -> list[dict]:
+    """
+    Steps on the critical path of one trace, in order.
+
+    Inside each span the path goes through the child whose subtree finishes
+    last, then the child finishing last before that one started, and so on.
+    A step's self time is the part of the span not covered by the children
+    on the path; queued time is how long a child started after its parent
+    ended, which across services is time spent sitting in a queue.
+    """
+    by_id = {s["span_id"]: s for s in spans}
+    children = defaultdict(list)
+    roots = []
+    for s in spans:
+        if s["parent_id"] in by_id:
+            children[s["parent_id"]].append(s)
+        else:
+            roots.append(s)
+
+    subtree_end = {}
+
+    def _subtree_end(span):
+        if span["span_id"] not in subtree_end:
+            subtree_end[span["span_id"]] = max(
+                [span["end"]] + [_subtree_end(c) for c in children[span["span_id"]]]
+            )
+        return subtree_end[span["span_id"]]
+
+    def _walk(span, queued):
+        chosen = []
+        cursor = float("inf")
+        for kid in sorted(children[span["span_id"]], key=_subtree_end, reverse=True):
+            if _subtree_end(kid) <= cursor:
+                chosen.append(kid)
+                cursor = kid["start"]
+        chosen.reverse()
+
+        covered = sum(
+            max(0.0, min(span["end"], _subtree_end(k)) - max(span["start"], k["start"]))
+            for k in chosen
+        )
+        steps = [{
+            "name": span["name"],
+            "service": span["service"],
+            "queued_ms": queued * 1000,
+            "self_ms": (span["end"] - span["start"] - covered) * 1000,
+        }]
+
+        prev_end = span["end"]
+        for kid in chosen:
+            steps.extend(_walk(kid, max(0.0, kid["start"] - prev_end)))
+            prev_end = max(prev_end, _subtree_end(kid))
+        return steps
+
+    return _walk(min(roots, key=lambda s: s["start"]), 0.0)
+
+
+def summarise(traces: dict[str, list[dict]], slowest: int) -> list[dict]:
+    jobs = []
+    for trace_id, spans in traces.items():
+        job_id = next((s["attributes"]["job_id"] for s in spans if s["attributes"].get("job_id")), None)
+        total = max(s["end"] for s in spans) - min(s["start"] for s in spans)
+        jobs.append({
+            "trace_id": trace_id,
+            "job_id": job_id,
+            "total_ms": total * 1000,
+            "path": critical_path(spans),
+        })
+
+    jobs.sort(key=lambda j: j["total_ms"], reverse=True)
+    return jobs[:slowest]
+
+
+def print_report(jobs: list[dict]):
+    totals = defaultdict(float)
+
+    for job in jobs:
+        print(f"\njob {job['job_id'] or '?'} (trace {job['trace_id'][:12]}) total {job['total_ms']:.1f} ms")
+        print(f"  {'service':<16}{'span':<32}{'queued ms':>12}{'self ms':>12}")
+        for step in job["path"]:
+            print(f"  {step['service']:<16}{step['name']:<32}{step['queued_ms']:>12.1f}{step['self_ms']:>12.1f}")
+            totals[f"{step['service']}/{step['name']}"] += step["self_ms"]
+            if step["queued_ms"]:
+                totals[f"{step['service']}/<queued>"] += step["queued_ms"]
+
+    if not jobs:
+        print("No traces found")
+        return
+
+    grand_total = sum(totals.values()) or 1.0
+    print(f"\ncritical path share across {len(jobs)} jobs")
+    for name, ms in sorted(totals.items(), key=lambda kv: kv[1], reverse=True):
+        print(f"  {name:<48}{ms:>12.1f} ms {ms / grand_total:>7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="span files written via TRACE_EXPORT_PATH")
+    parser.add_argument("--slowest", type=int, default=10, help="number of jobs to break down")
+    args = parser.parse_args()
+
+    print_report(summarise(load_traces(args.paths), args.slowest))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import httpx
+
+from shared.config import DEBUG, TRACE_EXPORT_PATH, TRACE_EXPORT_URL, TRACE_EXPORT_QUEUE_SIZE
+
+# W3C trace context header, carried in AMQP message headers next to correlation_id
+TRACEPARENT_HEADER = "traceparent"
+
+_service_name = "unknown"
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+# closed spans waiting for their outermost span, the oldest are dropped past the limit
+_pending: deque = deque(maxlen=10_000)
+# batches handed to the exporter thread, so a slow collector never blocks the event loop
+_exports: queue.Queue = queue.Queue(maxsize=TRACE_EXPORT_QUEUE_SIZE)
+_exporter: Optional[threading.Thread] = None
+_exporter_pid: Optional[int] = None
+
+
+class SpanContext:
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: dict):
+        self.name = name
+        self.service = _service_name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time()
+        self.end = None
+        self.status = "ok"
+
+    def context(self) -> SpanContext:
+        return SpanContext(self.trace_id, self.span_id)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": round((self.end - self.start) * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+def init_tracing(service_name: str):
+    global _service_name
+    _service_name = service_name
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def start_span(name: str, parent: Optional[SpanContext] = None, **attributes):
+    """
+    Time the wrapped block as a span.
+
+    The parent is the active span in this task, or `parent` when a remote
+    context was extracted from message headers. With neither, a new trace starts.
+    """
+    local_parent = _current_span.get()
+    if parent is None and local_parent is not None:
+        parent = local_parent.context()
+
+    span = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        parent_id=parent.span_id if parent else None,
+        attributes=attributes,
+    )
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.status = "error"
+        span.attributes["error"] = str(e)
+        raise
+    finally:
+        span.end = time.time()
+        _current_span.reset(token)
+        _pending.append(span.to_dict())
+        # export once the outermost span in this process closes
+        if local_parent is None:
+            _flush()
+
+
+def inject_trace_context(headers: dict) -> dict:
+    """Add the active span's traceparent to outgoing message headers"""
+    span = _current_span.get()
+    if span is not None:
+        headers[TRACEPARENT_HEADER] = f"00-{span.trace_id}-{span.span_id}-01"
+    return headers
+
+
+def extract_trace_context(headers: Optional[dict]) -> Optional[SpanContext]:
+    value = (headers or {}).get(TRACEPARENT_HEADER)
+    if isinstance(value, bytes):
+        value = value.decode()
+    if not value:
+        return None
+
+    parts = value.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return SpanContext(parts[1], parts[2])
+
+
+def _flush():
+    spans = list(_pending)
+    _pending.clear()
+    if not spans or not (TRACE_EXPORT_PATH or TRACE_EXPORT_URL):
+        return
+    _start_exporter()
+    try:
+        _exports.put_nowait((spans, TRACE_EXPORT_PATH, TRACE_EXPORT_URL))
+    except queue.Full:
+        # the collector is behind, drop this batch rather than hold up jobs or grow memory
+        if DEBUG:
+            print(f"Trace export queue full, dropped {len(spans)} spans")
+
+
+def _start_exporter():
+    global _exporter, _exporter_pid
+    # a forked worker process inherits the queue but not the thread
+    if _exporter is not None and _exporter_pid == os.getpid() and _exporter.is_alive():
+        return
+    _exporter_pid = os.getpid()
+    _exporter = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+    _exporter.start()
+
+
+def _export_loop():
+    while True:
+        batch = _exports.get()
+        try:
+            _export(*batch)
+        finally:
+            _exports.task_done()
+
+
+def _export(spans: list[dict], path: Optional[str], url: Optional[str]):
+    try:
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a") as f:
+                for span in spans:
+                    f.write(json.dumps(span, default=str) + "\n")
+
+        if url:
+            httpx.post(url, json={"spans": spans}, timeout=2.0)
+
+    except Exception as e:
+        # tracing must never fail a job
+        if DEBUG:
+            print(f"Trace export failed: {e}")
+
+
+def flush_traces():
+    """Block until every span handed to the exporter is written, for shutdown and tests"""
+    if _exporter is not None and _exporter_pid == os.getpid():
+        _exports.join()
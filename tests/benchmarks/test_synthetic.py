@@ -0,0 +1,64 @@
+import asyncio
+import json
+from decimal import Decimal
+
+import pytest
+
+from benchmarks.synthetic import generate_statement, render_text, write_pdf
+from services.extraction.parser import parse_document
+from services.extraction.utils import extract_text_from_pdf
+from services.analysis.core import perform_analysis
+
+
+def test_generated_statement_is_consistent():
+    statement = generate_statement(120, pages=3, seed=7)
+    txns = statement.transactions
+
+    assert len(txns) == 120
+    assert txns[0].balance == statement.opening_balance + txns[0].amount
+    for prev, t in zip(txns, txns[1:]):
+        assert t.balance == prev.balance + t.amount
+        assert t.date >= prev.date
+
+
+def test_generation_is_deterministic():
+    a = generate_statement(50, seed=3)
+    b = generate_statement(50, seed=3)
+    assert render_text(a) == render_text(b)
+
+
+def test_text_parses_to_every_transaction():
+    statement = generate_statement(75, pages=2, seed=1, name="Jane Doe", address="1 High Street, Darlington")
+    doc = parse_document(render_text(statement), "000_000_002", "statement.pdf")
+
+    assert doc.customer_name == "Jane Doe"
+    assert doc.customer_address == "1 High Street, Darlington"
+    assert len(doc.transactions) == 75
+    assert [t.amount for t in doc.transactions] == [t.amount for t in statement.transactions]
+    assert doc.transactions[-1].balance == statement.transactions[-1].balance
+
+
+@pytest.mark.parametrize("transactions,pages", [(30, 1), (90, 3), (400, 1)])
+def test_pdf_round_trips_through_extraction(tmp_path, transactions, pages):
+    statement = generate_statement(transactions, pages=pages, seed=transactions)
+    pdf_path = write_pdf(statement, str(tmp_path / "statement.pdf"))
+
+    text, confidence, _ = extract_text_from_pdf(pdf_path)
+    assert text == render_text(statement)
+    assert confidence == 100.0
+
+    doc = parse_document(text, "CUST001", "statement.pdf")
+    assert len(doc.transactions) == transactions
+
+
+def test_synthetic_statement_has_no_hard_flags():
+    statement = generate_statement(60, seed=11)
+    doc = parse_document(render_text(statement), "CUST001", "statement.pdf")
+    payload = json.loads(json.dumps({
+        "customer": {"customer_id": "CUST001", "name": statement.name, "address": statement.address},
+        "document": doc.dict(),
+    }, default=str))
+
+    results = asyncio.run(perform_analysis(payload))
+    assert results["alerts"]["hard_flags"] == []
+    assert Decimal(str(results["summary"]["net_change"])) == sum(t.amount for t in statement.transactions)
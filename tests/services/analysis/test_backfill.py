@@ -0,0 +1,135 @@
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from services.analysis.backfill import (
+    BackfillFilter, Checkpoint, StoredDocument, analyse_chunk, init_worker, page_query, write_page,
+)
+from services.analysis.config import ANALYSIS_RULES_PATH
+from services.analysis.results import result_row
+
+
+def _payload(job, amounts):
+    balance = Decimal("1000.00")
+    transactions = []
+    for i, amount in enumerate(amounts):
+        balance += amount
+        transactions.append({
+            "transaction_id": f"{job}-{i:03d}", "date": datetime(2025, 1, 1 + i), "vendor": "TESCO STORES",
+            "amount": amount, "balance": balance,
+        })
+    return json.dumps({
+        "customer": {"customer_id": "000_000_001", "name": "John Smith", "address": "44 Oak Avenue, Cork"},
+        "document": {
+            "customer_id": "000_000_001", "customer_name": "John Smith", "customer_address": "44 Oak Avenue, Cork",
+            "filename": f"{job}.pdf", "transactions": transactions,
+        },
+    }, default=str)
+
+
+def test_checkpoint_resumes_only_the_same_run(tmp_path):
+    path = str(tmp_path / "backfill" / "checkpoint.json")
+    filters = BackfillFilter(since="2025-01-01", customers=["000_000_001"])
+    checkpoint = Checkpoint.open(path, filters)
+    checkpoint.last_event_id, checkpoint.processed, checkpoint.failed = 812, 400, 2
+    checkpoint.save()
+
+    resumed = Checkpoint.open(path, BackfillFilter(since="2025-01-01", customers=["000_000_001"]))
+    assert resumed == checkpoint
+
+    with pytest.raises(ValueError, match="--fresh"):
+        Checkpoint.open(path, BackfillFilter(since="2025-02-01"))
+    fresh = Checkpoint.open(path, BackfillFilter(since="2025-02-01"), fresh=True)
+    assert fresh.last_event_id == 0 and fresh.processed == 0
+
+
+def test_bad_document_fails_alone():
+    init_worker(ANALYSIS_RULES_PATH)
+    history = {"count": 40, "mean": -20.0, "m2": 40 * 25.0}
+    analysed = analyse_chunk([
+        ("job-a", _payload("a", [Decimal("-20.00")] * 5), history),
+        ("job-b", "{not json", None),
+        ("job-c", None, None),
+        ("job-d", _payload("d", [Decimal("-18.00"), Decimal("-900.00")]), None),
+    ])
+
+    assert [a.job_id for a in analysed] == ["job-a", "job-b", "job-c", "job-d"]
+    assert [a.error is None for a in analysed] == [True, False, False, True]
+    assert analysed[0].results["amount_stats"]["baseline"]["count"] == 45
+    assert analysed[0].transactions == 5
+    # results are already plain JSON, ready for the JSONB column
+    assert json.loads(json.dumps(analysed[3].results)) == analysed[3].results
+
+
+def test_pool_analyses_chunks_in_parallel():
+    chunks = [[(f"job-{c}-{j}", _payload(f"{c}{j}", [Decimal("-10.00")] * 3), None) for j in range(3)]
+              for c in range(4)]
+    with ProcessPoolExecutor(2, initializer=init_worker, initargs=(ANALYSIS_RULES_PATH,)) as pool:
+        done = [a for chunk in pool.map(analyse_chunk, chunks) for a in chunk]
+
+    assert [a.job_id for a in done] == [job for chunk in chunks for job, _, _ in chunk]
+    assert all(a.error is None and a.transactions == 3 for a in done)
+
+
+def test_result_rows_count_flags():
+    results = {"alerts": {"hard_flags": [{"rule": "name_mismatch"}],
+                          "soft_flags": [{"amount": Decimal("12.50")}, {"amount": Decimal("-3")}]}}
+    row = result_row("job-a", "000_000_001", results, "backfill-20250301T120000")
+
+    assert (row["hard_flags"], row["soft_flags"], row["source"]) == (1, 2, "backfill-20250301T120000")
+    assert row["results"]["alerts"]["soft_flags"][0]["amount"] == "12.50"
+
+
+def test_pages_are_keyset_ordered_and_filtered():
+    filters = BackfillFilter(since="2025-01-01", until="2025-01-31", customers=["000_000_001", "000_000_002"])
+    sql = str(page_query(filters, after=812).compile(dialect=postgresql.dialect()))
+
+    assert "job_events.id > %(id_1)s" in sql
+    assert "jobs.created_at >=" in sql and "jobs.created_at <" in sql
+    assert "jobs.customer_id IN" in sql
+    assert sql.rstrip().endswith("ORDER BY job_events.id \n LIMIT %(param_1)s")
+
+
+def test_history_flags_survive_a_backfill():
+    init_worker(ANALYSIS_RULES_PATH)
+    stored = {
+        "alerts": {
+            "hard_flags": [
+                {"type": "balance_mismatch", "transaction_id": "a-001"},
+                {"type": "duplicate_transaction", "transaction_id": "a-000", "matches": [{"job_id": "job-z"}]},
+                {"type": "statement_balance_gap", "other_job_id": "job-y", "difference": "12.00"},
+            ],
+            "soft_flags": [{"type": "near_duplicate_transaction", "transaction_id": "a-002"}],
+        },
+        "counterparty_cluster": {"customers": 3, "shared_counterparties": 1},
+    }
+
+    class Stored:
+        statements, params = [], []
+
+        async def execute(self, statement, params=None):
+            self.statements.append(statement)
+            self.params.append(params)
+
+            class Rows:
+                def all(self):
+                    return [("job-a", stored)]
+            return Rows()
+
+    session = Stored()
+    page = [StoredDocument(1, "job-a", "000_000_001", None)]
+    analysed = analyse_chunk([("job-a", _payload("a", [Decimal("-20.00")] * 5), None)])
+    assert asyncio.run(write_page(session, page, analysed, "backfill-20250301T120000")) == 1
+
+    (row,) = session.params[1]
+    types = [f["type"] for f in row["results"]["alerts"]["hard_flags"]]
+    # the rules' own flags are recomputed, the balance chain of this document is intact
+    assert types == ["duplicate_transaction", "statement_balance_gap"]
+    assert [f["type"] for f in row["results"]["alerts"]["soft_flags"]] == ["near_duplicate_transaction"]
+    assert row["results"]["counterparty_cluster"] == stored["counterparty_cluster"]
+    assert (row["hard_flags"], row["soft_flags"]) == (2, 1)
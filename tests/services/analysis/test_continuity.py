@@ -0,0 +1,74 @@
+import asyncio
+from datetime import date, datetime
+from decimal import Decimal
+
+from services.analysis.continuity import StatementEntry, check_continuity
+from services.analysis.core import perform_analysis
+from models.models import Transaction
+
+
+def _entry(job_id, start, end, opening, closing):
+    return StatementEntry(job_id, start, end, Decimal(opening), Decimal(closing))
+
+
+JAN = _entry("jan", date(2025, 1, 1), date(2025, 1, 31), "1000.00", "1250.50")
+MAR = _entry("mar", date(2025, 3, 1), date(2025, 3, 31), "900.00", "875.25")
+
+
+def test_chained_statements_pass():
+    feb = _entry("feb", date(2025, 2, 1), date(2025, 2, 28), "1250.50", "900.00")
+    assert check_continuity(feb, JAN, MAR) == []
+
+
+def test_first_and_only_statement_passes():
+    assert check_continuity(JAN, None, None) == []
+
+
+def test_balance_gap_with_previous():
+    feb = _entry("feb", date(2025, 2, 1), date(2025, 2, 28), "1300.00", "900.00")
+
+    flags = check_continuity(feb, JAN, MAR)
+
+    assert [f["type"] for f in flags] == ["statement_balance_gap"]
+    assert flags[0]["other_job_id"] == "jan"
+    assert flags[0]["difference"] == Decimal("49.50")
+
+
+def test_statement_slotted_in_before_a_later_one():
+    # uploaded out of order, February arrives after March
+    feb = _entry("feb", date(2025, 2, 1), date(2025, 2, 28), "1250.50", "910.00")
+
+    flags = check_continuity(feb, JAN, MAR)
+
+    assert [(f["type"], f["neighbour"]) for f in flags] == [("statement_balance_gap", "next")]
+
+
+def test_overlapping_periods():
+    feb = _entry("feb", date(2025, 1, 20), date(2025, 2, 28), "1250.50", "900.00")
+
+    flags = check_continuity(feb, JAN, MAR)
+
+    assert [f["type"] for f in flags] == ["statement_period_overlap"]
+    assert flags[0]["other_period"] == ["2025-01-01", "2025-01-31"]
+
+
+def test_analysis_reports_statement_bounds():
+    transactions = [
+        Transaction(transaction_id=f"T{i}", date=datetime(2025, 1, 2 + i), vendor="SPAR",
+                    amount=Decimal("-10.00"), balance=Decimal("990.00") - 10 * i)
+        for i in range(3)
+    ]
+    payload = {
+        "customer": {"customer_id": "c", "name": "A", "address": "B"},
+        "document": {"customer_id": "c", "customer_name": "A", "customer_address": "B",
+                     "filename": "s.pdf", "transactions": [t.dict() for t in reversed(transactions)]},
+    }
+
+    statement = asyncio.run(perform_analysis(payload))["statement"]
+
+    assert statement == {
+        "period_start": date(2025, 1, 2),
+        "period_end": date(2025, 1, 4),
+        "opening_balance": Decimal("1000.00"),
+        "closing_balance": Decimal("970.00"),
+    }
@@ -0,0 +1,88 @@
+from datetime import datetime
+from decimal import Decimal
+
+from services.analysis.duplicates import (
+    Candidate, normalise_vendor, shingles, jaccard, minhash, transaction_keys, match_duplicates,
+)
+from models.models import Transaction
+
+
+def _txn(txn_id, vendor, amount="-42.50", day=datetime(2025, 2, 3)):
+    return Transaction(transaction_id=txn_id, date=day, vendor=vendor, amount=Decimal(amount), balance=Decimal("100"))
+
+
+def _index(keys, job_id="jan"):
+    """What the two tables would return for another statement holding these transactions"""
+    exact, near = {}, {}
+    for k in keys:
+        candidate = Candidate(job_id, k.transaction_id, k.vendor)
+        exact.setdefault(k.fingerprint, []).append(candidate)
+        for band in k.bands:
+            near.setdefault(band, []).append(candidate)
+    return exact, near
+
+
+def test_normalisation_ignores_case_punctuation_and_spacing():
+    assert normalise_vendor("  Tesco-Stores  #123 ") == "TESCO STORES 123"
+    [a], [b] = transaction_keys([_txn("a", "Tesco Stores")]), transaction_keys([_txn("b", "TESCO  stores.")])
+    assert a.fingerprint == b.fingerprint
+    assert a.bands == b.bands
+
+
+def test_fingerprint_changes_with_date_and_amount():
+    base, later, dearer = transaction_keys([
+        _txn("a", "Tesco Stores"),
+        _txn("b", "Tesco Stores", day=datetime(2025, 2, 4)),
+        _txn("c", "Tesco Stores", amount="-42.51"),
+    ])
+    assert len({base.fingerprint, later.fingerprint, dearer.fingerprint}) == 3
+    # band keys carry the date and amount too, so these can't be near-duplicate candidates either
+    assert not set(base.bands) & set(later.bands)
+    assert not set(base.bands) & set(dearer.bands)
+
+
+def test_minhash_agreement_tracks_jaccard():
+    a, b = shingles("AMAZON MARKETPLACE UK"), shingles("AMAZ0N MARKETPLACE UK")
+    sig_a, sig_b = minhash(a, 256), minhash(b, 256)
+    assert abs((sig_a == sig_b).mean() - jaccard(a, b)) < 0.1
+    assert (minhash(a, 256) == sig_a).all()
+
+
+def test_exact_repeat_from_another_statement_is_a_hard_flag():
+    earlier = transaction_keys([_txn("jan_001", "Tesco Stores"), _txn("jan_002", "Shell Garage", "-60.00")])
+    current = transaction_keys([_txn("feb_001", "TESCO STORES"), _txn("feb_002", "Netflix", "-9.99")])
+
+    hard, soft = match_duplicates(current, *_index(earlier))
+
+    assert [f["type"] for f in hard] == ["duplicate_transaction"]
+    assert hard[0]["transaction_id"] == "feb_001"
+    assert hard[0]["matches"] == [
+        {"job_id": "jan", "transaction_id": "jan_001", "vendor": "TESCO STORES", "similarity": 1.0}
+    ]
+    assert soft == []
+
+
+def test_doctored_vendor_is_a_near_duplicate():
+    earlier = transaction_keys([_txn("jan_001", "Amazon Marketplace UK")])
+    current = transaction_keys([_txn("feb_001", "Amazon Marketplace UK Ltd")])
+
+    hard, soft = match_duplicates(current, *_index(earlier))
+
+    assert hard == []
+    assert [f["type"] for f in soft] == ["near_duplicate_transaction"]
+    assert soft[0]["matches"][0]["transaction_id"] == "jan_001"
+    assert 0.5 <= soft[0]["matches"][0]["similarity"] < 1
+
+
+def test_unrelated_vendor_on_the_same_day_and_amount_is_not_flagged():
+    earlier = transaction_keys([_txn("jan_001", "Amazon Marketplace UK")])
+    current = transaction_keys([_txn("feb_001", "British Gas")])
+
+    assert match_duplicates(current, *_index(earlier)) == ([], [])
+
+
+def test_candidates_below_the_threshold_are_dropped():
+    earlier = transaction_keys([_txn("jan_001", "Amazon Marketplace UK")])
+    current = transaction_keys([_txn("feb_001", "Amazon Marketplace UK Ltd")])
+
+    assert match_duplicates(current, *_index(earlier), threshold=0.99) == ([], [])
@@ -0,0 +1,144 @@
+import asyncio
+import itertools
+import math
+import random
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy.dialects import postgresql
+
+from services.analysis.graph import (
+    Activity, ComponentStats, counterparty_activity, merge_plan, risky_clusters, update_graph,
+)
+from shared.models import GraphComponent
+from models.models import Transaction
+
+
+def _txn(txn_id, vendor, amount, day=1, normalized=None, category=None):
+    return Transaction(transaction_id=txn_id, date=datetime(2025, 3, day), vendor=vendor, amount=Decimal(amount),
+                       balance=Decimal("100"), normalized_vendor=normalized, category=category)
+
+
+def test_activity_links_only_unknown_and_listed_counterparties():
+    activity = counterparty_activity([
+        _txn("1", "TESCO STORES 2231", "-40.00", normalized="TESCO", category="groceries"),
+        _txn("2", "SEPA TRANSFER J. Murphy", "-500.00", day=3),
+        _txn("3", "sepa transfer j murphy", "250.00", day=2),
+        _txn("4", "WESTERN UNION 4432", "-900.00", normalized="WESTERN UNION", category="money_service"),
+        _txn("5", "PADDY POWER", "-10.00", normalized="PADDY POWER", category="gambling"),
+    ], categories=["money_service"])
+
+    assert activity == {
+        "SEPA TRANSFER J MURPHY": Activity(2, Decimal("250.00"), Decimal("500.00"), date(2025, 3, 2), date(2025, 3, 3)),
+        "WESTERN UNION": Activity(1, Decimal("0"), Decimal("900.00"), date(2025, 3, 1), date(2025, 3, 1)),
+    }
+
+
+def test_largest_component_keeps_its_id():
+    components = {
+        7: ComponentStats(customers=1, counterparties=2, edges=2),
+        3: ComponentStats(customers=4, counterparties=9, edges=15, shared_counterparties=2, max_counterparty_degree=3),
+        5: ComponentStats(customers=0, counterparties=1),
+    }
+    keep, absorbed, merged = merge_plan(components)
+
+    assert (keep, absorbed) == (3, [5, 7])
+    assert merged == ComponentStats(5, 12, 17, 2, 3)
+    # equal sizes go to the older component
+    assert merge_plan({9: ComponentStats(1, 1), 4: ComponentStats(2, 0)})[0] == 4
+
+
+def test_incremental_components_match_a_full_recompute():
+    """Statements replayed through merge_plan agree with a union-find over every edge, with few relabels"""
+    rng = random.Random(4)
+    customers = [f"c{i}" for i in range(300)]
+    counterparties = [f"v{i}" for i in range(600)]
+
+    component, stats, moves = {}, {}, {}
+    parent, ids = {}, itertools.count()
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for _ in range(400):
+        customer = rng.choice(customers)
+        statement = rng.sample(counterparties, rng.randint(1, 4))
+        for node, kind in [(customer, "customers")] + [(v, "counterparties") for v in statement]:
+            if node not in component:
+                component[node] = next(ids)
+                stats[component[node]] = ComponentStats(**{kind: 1})
+                parent[node], moves[node] = node, 0
+            parent[find(node)] = find(customer)
+
+        keep, absorbed, merged = merge_plan({c: stats[c] for c in {component[n] for n in [customer, *statement]}})
+        for node, c in component.items():
+            if c in absorbed:
+                component[node] = keep
+                moves[node] += 1
+        for c in absorbed:
+            del stats[c]
+        stats[keep] = merged
+
+    groups = {}
+    for node in component:
+        groups.setdefault(find(node), set()).add(component[node])
+    assert all(len(labels) == 1 for labels in groups.values())
+    assert len(set(component.values())) == len(groups) == len(stats)
+    assert sum(s.size for s in stats.values()) == len(component)
+    assert max(moves.values()) <= math.log2(len(component))
+
+
+def test_cluster_query_reads_component_statistics_only():
+    class Capture:
+        statements = []
+
+        async def execute(self, statement):
+            self.statements.append(statement)
+
+            class Empty:
+                def scalars(self):
+                    return self
+
+                def all(self):
+                    return []
+            return Empty()
+
+    session = Capture()
+    assert asyncio.run(risky_clusters(session, min_customers=3)) == []
+
+    sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+    assert "FROM graph_components" in sql and "graph_nodes" not in sql
+    assert "ORDER BY graph_components.shared_counterparties DESC" in sql
+
+
+def test_redelivered_job_leaves_edges_alone():
+    component = GraphComponent(id=4, customers=2, counterparties=3, edges=4,
+                               shared_counterparties=1, max_counterparty_degree=2)
+
+    class AlreadyAdded:
+        statements = []
+
+        async def execute(self, statement):
+            self.statements.append(statement)
+
+            class Result:
+                def first(self):
+                    # the history claim conflicts with the first delivery's
+                    return None
+
+                def scalar_one_or_none(self):
+                    return component
+            return Result()
+
+    session = AlreadyAdded()
+    activity = {"SEPA TRANSFER J MURPHY": Activity(1, Decimal("0"), Decimal("500.00"), date(2025, 3, 2), date(2025, 3, 2))}
+    stats = asyncio.run(update_graph(session, "000_000_001", "job-1", activity))
+
+    assert stats == ComponentStats(2, 3, 4, 1, 2)
+    sql = [str(s.compile(dialect=postgresql.dialect())) for s in session.statements]
+    assert len(sql) == 2
+    assert "INSERT INTO history_updates" in sql[0]
+    assert not any("graph_edges" in statement for statement in sql)
@@ -0,0 +1,263 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from services.analysis.config import ANALYSIS_RULES_PATH
+from services.analysis.rules import (
+    KINDS, Columns, Rule, RuleContext, RulePlan, RuleRegistry, load_rules, rule_kind,
+)
+from services.analysis.stats import RunningStats
+from services.analysis.core import perform_analysis
+from models.models import Customer, Document
+from shared.matching import MATCHING_VERSION
+
+
+def _payload(amounts, name="John Smith", corrupt=()):
+    balance = Decimal("1000.00")
+    transactions = []
+    for i, amount in enumerate(amounts):
+        balance += amount
+        transactions.append({
+            "transaction_id": f"TXN{i:03d}",
+            "date": datetime(2025, 1, 1 + i // 4, i % 4),
+            "vendor": "TESCO STORES",
+            "amount": amount,
+            "balance": balance + (Decimal("5.00") if i in corrupt else 0),
+        })
+    return {
+        "customer": {"customer_id": "000_000_001", "name": "John Smith", "address": "44 Oak Avenue, Cork"},
+        "document": {
+            "customer_id": "000_000_001",
+            "customer_name": name,
+            "customer_address": "44 Oak Avenue, Cork",
+            "filename": "statement.pdf",
+            "transactions": transactions,
+        },
+    }
+
+
+def _write(path, body):
+    path.write_text(body)
+    # force a new mtime even when the filesystem's clock granularity is coarse
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_shipped_rules_load():
+    rules = load_rules(ANALYSIS_RULES_PATH)
+    assert [r.name for r in rules] == [
+        "name_mismatch", "address_mismatch", "balance_mismatch", "std_dev_outlier", "high_risk_merchant",
+        "structuring", "rapid_movement", "watchlist_hit",
+    ]
+    assert len(RulePlan(rules).rules) == 8
+
+
+def test_shipped_rules_flag_as_before():
+    amounts = [Decimal("-20.00")] * 30 + [Decimal("-900.00")]
+    results = asyncio.run(perform_analysis(_payload(amounts, name="Jane Doe", corrupt={12})))
+
+    hard = results["alerts"]["hard_flags"]
+    assert [f["type"] for f in hard] == ["name_mismatch", "balance_mismatch", "balance_mismatch"]
+    assert hard[0] == {
+        "type": "name_mismatch", "customer_profile_name": "John Smith", "document_name": "Jane Doe", "similarity": 0.0,
+    }
+    # the corrupted balance breaks the chain into and out of row 12
+    assert [f["transaction_id"] for f in hard[1:]] == ["TXN012", "TXN013"]
+    assert hard[1]["expected_balance"] == Decimal("740.00")
+    assert hard[1]["actual_balance"] == Decimal("745.00")
+
+    soft = results["alerts"]["soft_flags"]
+    assert [(f["type"], f["transaction_id"]) for f in soft] == [("std_dev_outlier", "TXN030")]
+
+
+def test_high_risk_merchant_categories_are_soft_flags():
+    payload = _payload([Decimal("-20.00")] * 4)
+    payload["document"]["transactions"][2].update(normalized_vendor="PADDY POWER", category="gambling")
+    payload["document"]["transactions"][3].update(normalized_vendor="TESCO", category="groceries")
+
+    soft = asyncio.run(perform_analysis(payload))["alerts"]["soft_flags"]
+
+    assert [(f["type"], f["transaction_id"], f["normalized_vendor"]) for f in soft] == [
+        ("high_risk_merchant", "TXN002", "PADDY POWER"),
+    ]
+
+
+def test_formatting_differences_are_not_mismatches():
+    payload = _payload([Decimal("-20.00")] * 4, name="MR JOHN SMITH")
+    payload["document"]["customer_address"] = "44 OAK AVE.\nCO. CORK"
+    assert asyncio.run(perform_analysis(payload))["alerts"]["hard_flags"] == []
+
+    # the profile customer_lookup precomputed is used as sent
+    payload["customer"]["match_profile"] = {"version": MATCHING_VERSION, "name": ["JANE", "DOE"], "address": ["CORK"]}
+    hard = asyncio.run(perform_analysis(payload))["alerts"]["hard_flags"]
+    assert [f["type"] for f in hard] == ["name_mismatch", "address_mismatch"]
+
+
+def test_balance_chain_is_checked_in_date_order():
+    payload = _payload([Decimal("-10.00")] * 8)
+    payload["document"]["transactions"].reverse()
+
+    results = asyncio.run(perform_analysis(payload))
+    assert results["alerts"]["hard_flags"] == []
+
+
+def test_rules_are_configured_not_coded():
+    plan = RulePlan([
+        Rule("balance_mismatch", "balance_chain", "hard", enabled=False),
+        Rule("large_amount", "amount_zscore", "hard", {"threshold": 1}),
+    ])
+    amounts = [Decimal("-20.00")] * 10 + [Decimal("-60.00")]
+    results = asyncio.run(perform_analysis(_payload(amounts, corrupt={3}), plan=plan))
+
+    assert [f["type"] for f in results["alerts"]["hard_flags"]] == ["large_amount"]
+    assert results["alerts"]["soft_flags"] == []
+
+
+def test_new_kinds_plug_in():
+    @rule_kind("round_amount", required=("multiple",))
+    def round_amount(rule, ctx):
+        cents = rule.params["multiple"] * 100
+        hits = (ctx.columns.amount % cents == 0) & (ctx.columns.amount != 0)
+        return [{"type": rule.name, "transaction_id": ctx.columns.transactions[i].transaction_id}
+                for i in hits.nonzero()[0]]
+
+    try:
+        plan = RulePlan([Rule("round_thousand", "round_amount", "soft", {"multiple": 1000})])
+        amounts = [Decimal("-20.00"), Decimal("-3000.00"), Decimal("-999.99")]
+        results = asyncio.run(perform_analysis(_payload(amounts), plan=plan))
+        assert results["alerts"]["soft_flags"] == [{"type": "round_thousand", "transaction_id": "TXN001"}]
+    finally:
+        del KINDS["round_amount"]
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError, match="unknown kind"):
+        RulePlan([Rule("x", "no_such_kind", "hard")])
+    with pytest.raises(ValueError, match="severity"):
+        RulePlan([Rule("x", "balance_chain", "urgent")])
+    with pytest.raises(ValueError, match="missing params"):
+        RulePlan([Rule("x", "party_mismatch", "hard", {"field": "name"})])
+    with pytest.raises(ValueError, match="Duplicate"):
+        RulePlan([Rule("x", "balance_chain", "hard"), Rule("x", "amount_zscore", "soft")])
+
+
+def test_registry_reloads_on_change_and_keeps_last_good_plan(tmp_path):
+    path = tmp_path / "rules.yaml"
+    _write(path, "rules:\n  - {name: balance_mismatch, kind: balance_chain, severity: hard}\n")
+    registry = RuleRegistry(str(path))
+
+    first = registry.plan()
+    assert [r.name for r in first.rules] == ["balance_mismatch"]
+    assert registry.plan() is first
+
+    _write(path, "rules:\n  - {name: outlier, kind: amount_zscore, severity: soft, params: {threshold: 3}}\n")
+    second = registry.plan()
+    assert [r.name for r in second.rules] == ["outlier"]
+
+    _write(path, "rules:\n  - {name: broken, kind: nope, severity: hard}\n")
+    assert registry.plan() is second
+    _write(path, "rules: [unclosed\n")
+    assert registry.plan() is second
+
+
+def test_registry_keeps_last_good_plan_when_the_file_goes_missing(tmp_path):
+    path = tmp_path / "rules.yaml"
+    _write(path, "rules:\n  - {name: balance_mismatch, kind: balance_chain, severity: hard}\n")
+    registry = RuleRegistry(str(path))
+    first = registry.plan()
+
+    path.unlink()
+    assert registry.plan() is first
+    assert registry.plan() is first
+
+    _write(path, "rules:\n  - {name: outlier, kind: amount_zscore, severity: soft, params: {threshold: 3}}\n")
+    assert [r.name for r in registry.plan().rules] == ["outlier"]
+
+    with pytest.raises(FileNotFoundError):
+        RuleRegistry(str(tmp_path / "missing.yaml")).plan()
+
+
+def test_timings_cover_every_enabled_rule():
+    plan = RulePlan(load_rules(ANALYSIS_RULES_PATH))
+    payload = _payload([Decimal("-20.00")] * 5)
+    doc = Document(**payload["document"])
+    _, _, timings = plan.run(RuleContext(
+        Customer(**payload["customer"]), doc, Columns.from_transactions(doc.transactions),
+        RunningStats.from_values(float(t.amount) for t in doc.transactions), "document",
+    ))
+    assert set(timings) == {r.name for r in plan.rules}
+    assert all(t >= 0 for t in timings.values())
+
+
+def _dated(rows):
+    """Payload from (day offset, amount, category) rows, balances kept consistent"""
+    balance, transactions = Decimal("1000.00"), []
+    for i, (offset, amount, category) in enumerate(rows):
+        balance += amount
+        transactions.append({
+            "transaction_id": f"TXN{i:03d}", "date": datetime(2025, 1, 1) + timedelta(days=offset, minutes=i),
+            "vendor": "CASH LODGEMENT" if category == "cash" else "TRANSFER", "amount": amount,
+            "balance": balance, "category": category,
+        })
+    payload = _payload([])
+    payload["document"]["transactions"] = transactions
+    return payload
+
+
+def test_structuring_reports_each_episode_once():
+    rows = [(0, Decimal("9500.00"), "cash"), (2, Decimal("9900.00"), "cash"), (3, Decimal("-50.00"), None),
+            (5, Decimal("9100.00"), "cash"), (6, Decimal("9800.00"), "cash"),
+            # just outside the margin, not cash, at the threshold
+            (7, Decimal("8999.99"), "cash"), (7, Decimal("9500.00"), None), (8, Decimal("10000.00"), "cash"),
+            # too spread out to count
+            (30, Decimal("9500.00"), "cash"), (40, Decimal("9500.00"), "cash"), (50, Decimal("9500.00"), "cash")]
+    plan = RulePlan([Rule("structuring", "structuring", "soft", {
+        "reporting_threshold": 10000, "margin": 0.1, "window_days": 7, "min_count": 3, "categories": ["cash"],
+    })])
+
+    soft = asyncio.run(perform_analysis(_dated(rows), plan=plan))["alerts"]["soft_flags"]
+
+    assert len(soft) == 1
+    assert soft[0]["transaction_ids"] == ["TXN000", "TXN001", "TXN003", "TXN004"]
+    assert soft[0]["count"] == 4 and soft[0]["total"] == Decimal("38300.00")
+
+
+def test_structuring_windows_agree_with_a_full_scan():
+    rng = random.Random(9)
+    rows = sorted((rng.randint(0, 120), Decimal(rng.choice([9500, 9900, 200, -300])), "cash") for _ in range(300))
+    payload = _dated(rows)
+    plan = RulePlan([Rule("structuring", "structuring", "soft", {"reporting_threshold": 10000, "min_count": 4})])
+
+    soft = asyncio.run(perform_analysis(payload, plan=plan))["alerts"]["soft_flags"]
+    flagged = {tid for f in soft for tid in f["transaction_ids"]}
+
+    near = [(offset, f"TXN{i:03d}") for i, (offset, amount, _) in enumerate(rows) if 9000 <= amount < 10000]
+    expected = set()
+    for offset, _ in near:
+        window = [tid for other, tid in near if offset <= other < offset + 7]
+        if len(window) >= 4:
+            expected.update(window)
+    assert flagged == expected
+
+
+def test_velocity_flags_money_moved_straight_on():
+    rows = [(0, Decimal("8000.00"), None), (0, Decimal("-3000.00"), None), (1, Decimal("-4500.00"), None),
+            (2, Decimal("-500.00"), None),
+            (10, Decimal("6000.00"), None), (10, Decimal("-1000.00"), None), (13, Decimal("-5000.00"), None),
+            (20, Decimal("4000.00"), None), (20, Decimal("-4000.00"), None)]
+    plan = RulePlan([Rule("rapid_movement", "velocity", "soft",
+                          {"min_inflow": 5000, "window_days": 2, "outflow_ratio": 0.95})])
+
+    soft = asyncio.run(perform_analysis(_dated(rows), plan=plan))["alerts"]["soft_flags"]
+
+    # day 2 falls outside a two-day window, so 7500 of 8000 left, which is under 95%
+    assert soft == []
+    plan.rules[0].params["window_days"] = 3
+    soft = asyncio.run(perform_analysis(_dated(rows), plan=plan))["alerts"]["soft_flags"]
+    assert [(f["transaction_id"], f["outflow"], f["outflow_transaction_ids"]) for f in soft] == [
+        ("TXN000", Decimal("8000.00"), ["TXN001", "TXN002", "TXN003"]),
+    ]
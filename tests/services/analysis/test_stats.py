@@ -0,0 +1,107 @@
+import asyncio
+import random
+import statistics
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from services.analysis.stats import RunningStats, merge_customer_stats
+from services.analysis.core import perform_analysis
+
+
+def _payload(amounts):
+    balance = Decimal("1000.00")
+    transactions = []
+    for i, amount in enumerate(amounts):
+        balance += amount
+        transactions.append({
+            "transaction_id": f"TXN{i:03d}",
+            "date": datetime(2025, 1, 1 + i % 28),
+            "vendor": "TESCO STORES",
+            "amount": amount,
+            "balance": balance,
+        })
+    return {
+        "customer": {"customer_id": "000_000_001", "name": "John Smith", "address": "44 Oak Avenue, Cork, Ireland"},
+        "document": {
+            "customer_id": "000_000_001",
+            "customer_name": "John Smith",
+            "customer_address": "44 Oak Avenue, Cork, Ireland",
+            "filename": "statement.pdf",
+            "transactions": transactions,
+        },
+    }
+
+
+def test_welford_matches_two_pass():
+    values = [random.Random(1).uniform(-500, 500) for _ in range(1000)]
+    stats = RunningStats.from_values(values)
+
+    assert stats.count == 1000
+    assert stats.mean == pytest.approx(statistics.mean(values))
+    assert stats.stdev == pytest.approx(statistics.stdev(values))
+
+
+def test_chan_merge_matches_concatenation():
+    rng = random.Random(2)
+    a = [rng.gauss(-40, 25) for _ in range(300)]
+    b = [rng.gauss(200, 80) for _ in range(45)]
+
+    merged = RunningStats.from_values(a).merge(RunningStats.from_values(b))
+    whole = RunningStats.from_values(a + b)
+
+    assert merged.count == whole.count
+    assert merged.mean == pytest.approx(whole.mean)
+    assert merged.m2 == pytest.approx(whole.m2)
+    assert RunningStats().merge(whole) == whole
+    assert whole.merge(RunningStats()) == whole
+
+
+def test_without_history_flags_match_document_stats():
+    amounts = [Decimal("-20.00")] * 30 + [Decimal("-900.00")]
+    results = asyncio.run(perform_analysis(_payload(amounts)))
+
+    flags = results["alerts"]["soft_flags"]
+    expected = abs(amounts[-1] - statistics.mean(amounts)) / statistics.stdev(amounts)
+    assert [f["transaction_id"] for f in flags] == ["TXN030"]
+    assert flags[0]["std_dev_deviation"] == round(expected, 2)
+    assert flags[0]["baseline"] == "document"
+
+
+def test_history_changes_what_counts_as_unusual():
+    # a customer whose statements regularly carry large payments
+    history = RunningStats.from_values([-20.0] * 200 + [-900.0] * 100)
+    amounts = [Decimal("-20.00")] * 30 + [Decimal("-900.00")]
+
+    results = asyncio.run(perform_analysis(_payload(amounts), history))
+
+    assert results["alerts"]["soft_flags"] == []
+    assert results["amount_stats"]["document"]["count"] == 31
+    assert results["amount_stats"]["baseline"]["count"] == 331
+
+
+class _AlreadyClaimed:
+    """Session where every history claim conflicts with an earlier delivery's row"""
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+        class Conflict:
+            def first(self):
+                return None
+        return Conflict()
+
+
+def test_redelivered_job_is_not_merged_twice():
+    session = _AlreadyClaimed()
+
+    assert asyncio.run(merge_customer_stats(session, "000_000_001", "job-1", RunningStats(3, 10.0, 2.0))) is None
+
+    (claim,) = session.statements
+    sql = str(claim.compile(dialect=postgresql.dialect()))
+    assert "INSERT INTO history_updates" in sql
+    assert "ON CONFLICT (job_id, history) DO NOTHING" in sql
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import random
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from services.analysis import watchlist
+from services.analysis.rules import Rule, RulePlan
+from services.analysis.watchlist import WatchlistIndex, WatchlistRegistry, build_index, trigrams
+from services.analysis.core import perform_analysis
+
+ENTRIES = [
+    {"entry_id": "WL001", "name": "Viktor Petrovich BOUT", "list": "sanctions"},
+    {"entry_id": "WL002", "name": "Oleg Deripaska", "list": "sanctions"},
+    {"entry_id": "WL003", "name": "Rosneft Trading S.A.", "list": "sanctions"},
+    {"entry_id": "WL004", "name": "Ahmed Al-Rashid", "list": "pep"},
+    {"entry_id": "WL005", "name": "Mary O'Brien", "list": "pep"},
+]
+
+
+def _dice(a, b):
+    return 2 * len(np.intersect1d(a, b)) / (len(a) + len(b))
+
+
+@pytest.fixture
+def index(tmp_path):
+    return WatchlistIndex(build_index(ENTRIES, str(tmp_path)))
+
+
+@pytest.mark.parametrize("name,entry_id", [
+    ("BOUT VIKTOR PETROVICH", "WL001"),
+    ("Mr Oleg Deripaska", "WL002"),
+    ("ROSNEFT TRADING SA", "WL003"),
+    ("Ahmed Al Rashid", "WL004"),
+    ("MARY OBRIEN", "WL005"),
+    ("Viktor Petrovic Bout", "WL001"),
+])
+def test_reordered_and_misspelt_names_are_found(index, name, entry_id):
+    hits = index.search(name, 0.8)
+    assert hits and hits[0].entry["entry_id"] == entry_id
+    assert hits[0].entry["list"] in ("sanctions", "pep")
+
+
+@pytest.mark.parametrize("name", ["John Smith", "TESCO STORES", "Mary Brennan", "", "--"])
+def test_unrelated_names_are_not(index, name):
+    assert index.search(name, 0.8) == []
+
+
+def test_candidate_filters_agree_with_a_full_scan(tmp_path):
+    rng = random.Random(3)
+    words = ["ALI", "ALIS", "BEN", "BENN", "KOV", "KOVA", "ROS", "ROSA", "TAN", "ZED"]
+    entries = [{"entry_id": str(i), "name": " ".join(rng.sample(words, rng.randint(1, 4)))} for i in range(500)]
+    index = WatchlistIndex(build_index(entries, str(tmp_path)))
+    grams = [trigrams(e["name"]) for e in entries]
+
+    for _ in range(200):
+        name = " ".join(rng.sample(words, rng.randint(1, 4)))
+        threshold = rng.choice([0.6, 0.75, 0.9])
+        query = trigrams(name)
+        expected = {i for i, g in enumerate(grams) if _dice(query, g) >= threshold}
+        assert {int(h.entry["entry_id"]) for h in index.search(name, threshold)} == expected, (name, threshold)
+
+
+def test_rebuild_swaps_current_and_registry_remaps(tmp_path):
+    registry = WatchlistRegistry(str(tmp_path))
+    assert registry.index() is None
+
+    first = build_index(ENTRIES[:2], str(tmp_path))
+    assert registry.index().directory == first
+    assert registry.index().search("Mary O'Brien", 0.8) == []
+
+    second = build_index(ENTRIES, str(tmp_path))
+    # force a new mtime even when the filesystem's clock granularity is coarse
+    pointer = os.path.join(str(tmp_path), "CURRENT")
+    stat = os.stat(pointer)
+    os.utime(pointer, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert registry.index().directory == second
+    assert registry.index().search("Mary O'Brien", 0.8)[0].entry["entry_id"] == "WL005"
+
+    # the previous build is kept for workers still mapping it, older ones are pruned
+    build_index(ENTRIES[1:], str(tmp_path))
+    assert os.path.isdir(second) and not os.path.exists(first)
+
+
+def _payload():
+    transactions = [
+        {"transaction_id": f"TXN{i:03d}", "date": datetime(2025, 1, 1 + i), "vendor": vendor,
+         "amount": Decimal("-20.00"), "balance": Decimal("100.00") - 20 * (i + 1)}
+        for i, vendor in enumerate(["TESCO STORES", "ROSNEFT TRADING SA 0042", "TESCO STORES", "ROSNEFT TRADING SA 0042"])
+    ]
+    transactions[1]["normalized_vendor"] = transactions[3]["normalized_vendor"] = "ROSNEFT TRADING SA"
+    return {
+        "customer": {"customer_id": "000_000_001", "name": "Mary O'Brien", "address": "1 Main Street, Cork"},
+        "document": {"customer_id": "000_000_001", "customer_name": "MARY OBRIEN",
+                     "customer_address": "1 Main Street, Cork", "filename": "statement.pdf",
+                     "transactions": transactions},
+    }
+
+
+PLAN = RulePlan([Rule("watchlist_hit", "watchlist", "hard", {"threshold": 0.8})])
+
+
+def test_rule_flags_customer_and_vendors(tmp_path, monkeypatch):
+    monkeypatch.setattr(watchlist, "registry", WatchlistRegistry(str(tmp_path)))
+    build_index(ENTRIES, str(tmp_path))
+
+    hard = asyncio.run(perform_analysis(_payload(), plan=PLAN))["alerts"]["hard_flags"]
+
+    assert [(f["field"], f["value"], f["matches"][0]["entry_id"]) for f in hard] == [
+        ("customer_name", "MARY OBRIEN", "WL005"),
+        ("vendor", "ROSNEFT TRADING SA", "WL003"),
+    ]
+    assert "transaction_ids" not in hard[0]
+    assert hard[1]["transaction_ids"] == ["TXN001", "TXN003"]
+
+
+def test_rule_is_silent_without_an_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(watchlist, "registry", WatchlistRegistry(str(tmp_path / "missing")))
+    assert asyncio.run(perform_analysis(_payload(), plan=PLAN))["alerts"]["hard_flags"] == []
@@ -0,0 +1,103 @@
+import asyncio
+
+import httpx
+import pytest
+
+from services.autoscaler.scaler import Autoscaler, Stage, fetch_queue_samples, recommend_replicas
+
+
+def _management_api(queues: dict):
+    """Fake RabbitMQ management API serving /api/queues/<vhost>/<name>"""
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request.url.raw_path.decode())
+        name = request.url.path.rsplit("/", 1)[-1]
+        if name not in queues:
+            return httpx.Response(404, json={"error": "Object Not Found"})
+        ready, unacked, consumers, publish, ack = queues[name]
+        return httpx.Response(200, json={
+            "name": name,
+            "messages_ready": ready,
+            "messages_unacknowledged": unacked,
+            "consumers": consumers,
+            "message_stats": {"publish_details": {"rate": publish}, "ack_details": {"rate": ack}},
+        })
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://rabbitmq:15672")
+    return client, requests
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_little_law_plus_backlog_drain():
+    # 2 jobs/s at 3 s each needs 6 busy workers, 8.57 at 70% utilisation
+    assert recommend_replicas(2.0, 0, 3.0, target_utilisation=0.7, drain_seconds=300) == 9
+    # 600 queued jobs at 3 s each cleared in 300 s needs 6 more
+    assert recommend_replicas(2.0, 600, 3.0, target_utilisation=0.7, drain_seconds=300) == 15
+
+
+def test_samples_sum_over_lane_queues_and_skip_missing():
+    client, requests = _management_api({
+        "raw_extraction_queue_fast": (5, 1, 2, 0.5, 0.4),
+        "raw_extraction_queue": (10, 1, 1, 0.25, 0.2),
+    })
+
+    sample = _run(fetch_queue_samples(client, ["raw_extraction_queue_fast", "raw_extraction_queue", "gone"]))
+
+    assert sample.backlog == 17
+    assert sample.consumers == 3
+    assert sample.publish_rate == pytest.approx(0.75)
+    assert requests[0] == "/api/queues/%2F/raw_extraction_queue_fast"
+
+
+def test_recommendation_uses_worker_processing_times():
+    client, _ = _management_api({"work": (300, 2, 2, 1.0, 0.5), "held": (100, 100, 1, 1.0, 1.0)})
+    stage = Stage("analysis", ["work"], "ANALYSIS_STARTED", ("ANALYSIS_SUCCESS",), upstream=["held"])
+
+    async def service_times(_):
+        return [1.5, 2.0, 9.0]
+
+    scaler = Autoscaler(client, service_times=service_times, stages=[stage], min_replicas=1, max_replicas=50)
+    rec = _run(scaler.sample(now=0))["analysis"]
+
+    assert rec.service_time_s == 2.0 and rec.service_time_source == "job_events"
+    assert rec.backlog == 502
+    # upstream publishes don't count towards the arrival rate
+    assert rec.arrival_rate == 1.0
+    assert rec.replicas == recommend_replicas(1.0, 502, 2.0)
+
+
+def test_falls_back_to_ack_rate_then_default():
+    client, _ = _management_api({"work": (0, 0, 4, 0.0, 2.0), "idle": (0, 0, 0, 0.0, 0.0)})
+    scaler = Autoscaler(client, stages=[
+        Stage("busy", ["work"], "", ()),
+        Stage("idle", ["idle"], "", ()),
+    ])
+
+    latest = _run(scaler.sample(now=0))
+
+    assert latest["busy"].service_time_s == 2.0 and latest["busy"].service_time_source == "ack_rate"
+    assert latest["idle"].service_time_source == "default"
+    assert latest["idle"].replicas == scaler.min_replicas
+
+
+def test_scale_up_now_scale_down_after_window():
+    queues = {"work": (0, 0, 1, 0.0, 0.0)}
+    client, _ = _management_api(queues)
+    stage = Stage("report", ["work"], "", ())
+
+    async def service_times(_):
+        return [1.0]
+
+    scaler = Autoscaler(client, service_times=service_times, stages=[stage],
+                        min_replicas=1, max_replicas=8, scale_down_window_s=300)
+
+    queues["work"] = (3000, 0, 1, 0.0, 0.0)
+    assert _run(scaler.sample(now=0))["report"].replicas == 8
+
+    queues["work"] = (0, 0, 8, 0.0, 0.0)
+    assert _run(scaler.sample(now=100))["report"].replicas == 8
+    assert _run(scaler.sample(now=301))["report"].replicas == 1
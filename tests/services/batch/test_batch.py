@@ -0,0 +1,112 @@
+import json
+import os
+import subprocess
+import sys
+
+import pypdfium2 as pdfium
+
+from benchmarks.synthetic import generate_statement, render_text, write_pdf
+from services.batch import main
+from services.batch.main import discover, load_customers, run_batch
+from services.extraction import ocr, parser, tables
+from services.extraction.layouts import LayoutTemplates
+
+CUSTOMERS = {
+    "000_000_001": {"name": "John Smith", "address": "44 Oak Avenue, Cork, Ireland"},
+    "000_000_002": {"name": "Jane Doe", "address": "1 High Street, Darlington"},
+}
+
+
+def _statements(directory, customer_id, count):
+    info = CUSTOMERS.get(customer_id, CUSTOMERS["000_000_001"])
+    folder = directory / customer_id
+    folder.mkdir(parents=True)
+    for i in range(count):
+        statement = generate_statement(40, seed=i, name=info["name"], address=info["address"])
+        write_pdf(statement, str(folder / f"statement_{i}.pdf"))
+
+
+def _customers(tmp_path):
+    path = tmp_path / "customers.json"
+    path.write_text(json.dumps(CUSTOMERS))
+    return load_customers(str(path))
+
+
+def test_statements_are_found_per_customer_folder(tmp_path):
+    customers = _customers(tmp_path)
+    _statements(tmp_path / "in", "000_000_002", 2)
+    _statements(tmp_path / "in", "000_000_009", 1)
+    (tmp_path / "in" / "notes.txt").write_text("not a statement")
+
+    statements = discover(str(tmp_path / "in"), customers)
+
+    assert [(s.customer_id, os.path.basename(s.path)) for s in statements] == [
+        ("000_000_002", "statement_0.pdf"), ("000_000_002", "statement_1.pdf"), ("000_000_009", "statement_0.pdf"),
+    ]
+    assert statements[0].customer["match_profile"] and statements[2].customer is None
+    assert len({s.job_id for s in statements}) == 3
+
+
+def test_batch_imports_without_a_broker_or_database():
+    env = {k: v for k, v in os.environ.items() if k not in ("RABBITMQ_URL", "DATABASE_URL")}
+    result = subprocess.run([sys.executable, "-c", "import services.batch.main"], env=env,
+                            cwd=os.path.join(os.path.dirname(__file__), "..", "..", ".."),
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_zero_workers_means_one_per_cpu(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 1)
+    _statements(tmp_path / "in", "000_000_001", 1)
+
+    summary = run_batch(str(tmp_path / "in"), _customers(tmp_path), str(tmp_path / "reports"), workers=0)
+
+    assert (summary["docs"], summary["failed"]) == (1, 0)
+
+
+def test_batch_writes_a_report_per_statement(tmp_path, monkeypatch):
+    templates = LayoutTemplates(str(tmp_path / "layouts"))
+    for module in (main, parser, tables):
+        monkeypatch.setattr(module, "layout_templates", templates)
+    customers = _customers(tmp_path)
+    _statements(tmp_path / "in", "000_000_001", 3)
+    _statements(tmp_path / "in", "000_000_002", 2)
+    _statements(tmp_path / "in", "000_000_009", 1)
+
+    # queues smaller than the batch, so the stages have to wait on each other
+    summary = run_batch(str(tmp_path / "in"), customers, str(tmp_path / "reports"), workers=2, queue_size=1)
+
+    assert (summary["docs"], summary["failed"]) == (6, 1)
+    assert summary["docs_per_s"] > 0 and set(summary["stage_mean_ms"]) == {
+        "extraction", "parse", "vendor_normalisation", "analysis",
+    }
+    reports = [json.loads((tmp_path / "reports" / name).read_text()) for name in os.listdir(tmp_path / "reports")]
+    assert sorted(r["customer"]["name"] for r in reports) == ["Jane Doe"] * 2 + ["John Smith"] * 3
+    assert all(r["alerts"]["hard_flags"] == [] for r in reports)
+
+
+def test_scanned_statements_are_ocred_in_the_batch_workers(tmp_path, monkeypatch):
+    customers = _customers(tmp_path)
+    folder = tmp_path / "in" / "000_000_001"
+    folder.mkdir(parents=True)
+    pdf = pdfium.PdfDocument.new()
+    pdf.new_page(595, 842)
+    pdf.save(str(folder / "scan.pdf"))
+    pdf.close()
+
+    # tesseract reads the statement off the blank page, the workers are forked so they see the fakes
+    lines = render_text(generate_statement(40, seed=1, **CUSTOMERS["000_000_001"])).split("\n")
+    words = [(n, word) for n, line in enumerate(lines, start=1) for word in line.split()]
+    data = {"text": [w for _, w in words], "conf": ["90"] * len(words), "block_num": [1] * len(words),
+            "par_num": [1] * len(words), "line_num": [n for n, _ in words]}
+    monkeypatch.setattr(ocr, "render_page", lambda file_path, page_index, dpi=300: page_index)
+    monkeypatch.setattr(ocr.pytesseract, "image_to_data", lambda image, **kwargs: data)
+    monkeypatch.setattr(ocr, "OCR_CACHE_DIR", "")
+    monkeypatch.setattr(ocr, "_engine", None)
+    monkeypatch.setattr(main, "LAYOUT_TEMPLATES_DIR", "")
+
+    summary = run_batch(str(tmp_path / "in"), customers, str(tmp_path / "reports"), workers=1)
+
+    assert (summary["docs"], summary["failed"]) == (1, 0)
+    (report,) = os.listdir(tmp_path / "reports")
+    assert json.loads((tmp_path / "reports" / report).read_text())["customer"]["name"] == "John Smith"
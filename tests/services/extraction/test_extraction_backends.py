@@ -0,0 +1,63 @@
+import pytest
+
+from benchmarks.synthetic import generate_statement, render_text, write_pdf
+from services.extraction import utils
+from services.extraction.utils import extract_text_from_pdf, _has_statement_layout
+
+
+def _statement_pdf(tmp_path, column_major=False):
+    statement = generate_statement(60, pages=2, seed=11)
+    statement.column_major = column_major
+    return statement, write_pdf(statement, str(tmp_path / "statement.pdf"))
+
+
+def test_auto_uses_pdfium_for_row_ordered_text(tmp_path):
+    statement, path = _statement_pdf(tmp_path)
+
+    text, confidence, method = extract_text_from_pdf(path, backend="auto")
+
+    assert method == "pdfium"
+    assert confidence == 100.0
+    assert text == render_text(statement)
+
+
+def test_auto_falls_back_to_pdfplumber_on_column_ordered_text(tmp_path):
+    statement, path = _statement_pdf(tmp_path, column_major=True)
+
+    text, _, method = extract_text_from_pdf(path, backend="auto")
+
+    assert method == "pdfplumber"
+    assert text == render_text(statement)
+
+
+def test_pinned_pdfplumber_skips_pdfium(tmp_path, monkeypatch):
+    _, path = _statement_pdf(tmp_path)
+
+    def _fail(_):
+        raise AssertionError("pdfium should not run")
+
+    monkeypatch.setattr(utils, "_extract_with_pdfium", _fail)
+    _, _, method = extract_text_from_pdf(path, backend="pdfplumber")
+
+    assert method == "pdfplumber"
+
+
+def test_auto_falls_back_when_pdfium_raises(tmp_path, monkeypatch):
+    _, path = _statement_pdf(tmp_path)
+
+    def _broken(_):
+        raise RuntimeError("bad xref")
+
+    monkeypatch.setattr(utils, "_extract_with_pdfium", _broken)
+    _, _, method = extract_text_from_pdf(path, backend="auto")
+
+    assert method == "pdfplumber"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("01/01/2025 TESCO STORES -12.50 1000.00\n02/01/2025 SALARY DEPOSIT +2500.00 3500.00", True),
+    ("01/01/2025\n02/01/2025\nTESCO STORES\nSALARY DEPOSIT\n-12.50\n+2500.00", False),
+    ("no dates in here at all", False),
+])
+def test_statement_layout_heuristic(text, expected):
+    assert _has_statement_layout(text) is expected
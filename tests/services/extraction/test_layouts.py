@@ -0,0 +1,107 @@
+import os
+from decimal import Decimal
+
+import pytest
+
+from benchmarks import synthetic
+from benchmarks.synthetic import generate_statement, render_text, write_pdf
+from services.extraction import parser
+from services.extraction.layouts import Fingerprint, LayoutTemplates, Template, header_fields, identify
+from services.extraction.parser import parse_document
+from services.extraction.utils import extract_text_from_pdf
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    templates = LayoutTemplates(str(tmp_path / "layouts"))
+    monkeypatch.setattr(parser, "layout_templates", templates)
+    return templates
+
+
+def _pdf(tmp_path, filename, transactions=60, pages=1, seed=0, **kwargs):
+    statement = generate_statement(transactions, pages=pages, seed=seed, **kwargs)
+    return write_pdf(statement, str(tmp_path / filename))
+
+
+def test_fingerprint_depends_on_the_layout_not_the_statement(tmp_path, monkeypatch):
+    a = identify(_pdf(tmp_path, "a.pdf"))
+    b = identify(_pdf(tmp_path, "b.pdf", transactions=200, pages=3, seed=9, name="Jane Doe",
+                      address="1 High Street, Darlington"))
+    assert a == b
+    assert a.header == "DATE VENDOR AMOUNT (€) BALANCE (€)"
+    assert a.fonts == ("Helvetica-Bold",) and len(a.columns) == 6
+
+    # another bank that puts the description column further right
+    monkeypatch.setattr(synthetic, "VENDOR_X", 180.0)
+    other = identify(_pdf(tmp_path, "other.pdf"))
+    assert other.header == a.header and other.key != a.key
+
+
+def test_first_statement_teaches_the_template_and_later_ones_use_it(tmp_path, store, monkeypatch):
+    first = _pdf(tmp_path, "first.pdf", seed=1)
+    fingerprint = identify(first)
+    text, _, _ = extract_text_from_pdf(first)
+
+    learned = parse_document(text, "000_000_001", "first.pdf", fingerprint)
+    assert os.path.exists(os.path.join(store.directory, f"{fingerprint.key}.json"))
+    template = LayoutTemplates(store.directory).get(fingerprint)
+    assert (template.fields, template.date_format) == (["date", "vendor", "amount", "balance"], "%d/%m/%Y")
+
+    second = _pdf(tmp_path, "second.pdf", transactions=150, pages=2, seed=2)
+    text, _, _ = extract_text_from_pdf(second)
+    generic = parser._generic_rows
+    calls = []
+    monkeypatch.setattr(parser, "_generic_rows", lambda raw: calls.append(raw) or generic(raw))
+    templated = parse_document(text, "000_000_001", "second.pdf", identify(second))
+    assert calls == []
+
+    monkeypatch.setattr(parser, "_generic_rows", generic)
+    assert templated == parse_document(text, "000_000_001", "second.pdf")
+    assert len(learned.transactions) == 60 and len(templated.transactions) == 150
+
+
+def test_template_falls_back_when_it_reads_too_little(store):
+    text = render_text(generate_statement(60, seed=3))
+    fingerprint = Fingerprint("DATE VENDOR AMOUNT (€) BALANCE (€)", ("Helvetica-Bold",), (68.0, 152.0))
+    parse_document(text, "000_000_001", "a.pdf", fingerprint)
+    assert store.get(fingerprint)
+
+    # same layout, but this statement's rows use two-digit years the template doesn't expect
+    short_years = "\n".join(line.replace("/2025 ", "/25 ") for line in text.split("\n"))
+    document = parse_document(short_years, "000_000_001", "b.pdf", fingerprint)
+    assert len(document.transactions) == 60
+
+
+def test_template_that_skips_rows_falls_back(store, monkeypatch):
+    text = render_text(generate_statement(60, seed=4))
+    fingerprint = Fingerprint("DATE VENDOR AMOUNT (€) BALANCE (€)", ("Helvetica-Bold",), (68.0, 152.0))
+    parse_document(text, "000_000_001", "a.pdf", fingerprint)
+    assert store.get(fingerprint)
+
+    # enough rows still match for MIN_TRANSACTIONS, but five would be dropped
+    lines = text.split("\n")
+    dated = [i for i, line in enumerate(lines) if "/2025 " in line]
+    for i in dated[-5:]:
+        lines[i] = lines[i].replace("/2025 ", "/25 ")
+    generic = parser._generic_rows
+    calls = []
+    monkeypatch.setattr(parser, "_generic_rows", lambda raw: calls.append(raw) or generic(raw))
+
+    document = parse_document("\n".join(lines), "000_000_001", "b.pdf", fingerprint)
+    assert len(calls) == 1 and len(document.transactions) == 60
+
+
+def test_two_digit_years_follow_strptime():
+    template = Template(key="k", header="DATE DETAILS AMOUNT BALANCE", fields=["date", "vendor", "amount", "balance"],
+                        date_format="%d/%m/%y")
+    rows, dated = template.rows("Date Details Amount Balance\n03/02/25 TESCO -1,204.50 €10.00\n01/01/70 X 1.00 2.00\n"
+                                "31/02/25 BAD -1.00 1.00\nPage 1 of 1")
+    assert dated == 3
+    assert [(r[0].year, r[1], r[2]) for r in rows] == [(2025, "TESCO", Decimal("-1204.50")), (1970, "X", Decimal("1.00"))]
+
+
+def test_layouts_with_other_columns_are_left_to_the_generic_parser(store):
+    assert header_fields("Date Description Debit Credit Balance") is None
+    assert header_fields("Balance Amount Vendor Date") == ["balance", "amount", "vendor", "date"]
+    fingerprint = Fingerprint("DATE DESCRIPTION DEBIT CREDIT BALANCE", ("Helvetica",), (60.0,))
+    assert store.learn(fingerprint, "", []) is None
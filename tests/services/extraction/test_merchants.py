@@ -0,0 +1,85 @@
+import os
+import random
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from services.extraction.merchants import (
+    MerchantAutomaton, MerchantEntry, build_automaton, enrich_transactions, load_merchant_dictionary,
+)
+from models.models import Transaction
+
+
+@pytest.fixture(scope="module")
+def automaton(tmp_path_factory):
+    return MerchantAutomaton(build_automaton(load_merchant_dictionary(), str(tmp_path_factory.mktemp("automaton"))))
+
+
+@pytest.mark.parametrize("vendor,expected", [
+    ("POS TESCO STORES 2231 DUBLIN", ("TESCO", "groceries")),
+    ("Paddy-Power Online*8812", ("PADDY POWER", "gambling")),
+    ("UBER *EATS HELP.UBER.COM", ("UBER EATS", "dining")),
+    ("UBER *TRIP 7Q2", ("UBER", "transport")),
+    ("AIB ATM 0021 CORK", ("AIB", "cash")),
+    ("CASH WITHDRAWAL 12/01", ("CASH WITHDRAWAL", "cash")),
+    ("Western Union 4432 London", ("WESTERN UNION", "money_service")),
+    ("Café Nero 1182", ("CAFE NERO", None)),
+])
+def test_shipped_dictionary(automaton, vendor, expected):
+    assert automaton.lookup(vendor) == expected
+
+
+def test_patterns_match_whole_words_only(automaton):
+    # SPAR is a merchant, SPARKLE and ASPARAGUS are not
+    assert automaton.lookup("SPARKLE CLEANING 22") == ("SPARKLE CLEANING", None)
+    assert automaton.lookup("ASPARAGUS FARM") == ("ASPARAGUS FARM", None)
+    assert automaton.lookup("SPAR EXPRESS") == ("SPAR", "groceries")
+
+
+def test_matches_agree_with_a_naive_scan(tmp_path):
+    rng = random.Random(5)
+    words = ["AB", "ABC", "BC", "CAB", "BCA", "A", "CC", "ABCA", "B A"]
+    entries = [MerchantEntry(w, w.lower(), "test") for w in words]
+    automaton = MerchantAutomaton(build_automaton(entries, str(tmp_path)))
+
+    for _ in range(2000):
+        cleaned = " ".join("".join(rng.choices("ABC", k=rng.randint(1, 4))) for _ in range(rng.randint(1, 4)))
+        longest = max((len(w) for w in words if f" {w} " in f" {cleaned} "), default=0)
+
+        got = automaton.match(cleaned)
+        # ties between equal-length words go to the one ending first, so compare lengths
+        assert (len(words[got]) if got >= 0 else 0) == longest, cleaned
+
+
+def test_tables_are_built_once_and_memory_mapped(tmp_path):
+    entries = load_merchant_dictionary()
+    directory = build_automaton(entries, str(tmp_path))
+    built_at = os.path.getmtime(os.path.join(directory, "delta.npy"))
+
+    assert build_automaton(entries, str(tmp_path)) == directory
+    assert os.path.getmtime(os.path.join(directory, "delta.npy")) == built_at
+    assert [p for p in os.listdir(tmp_path) if p.startswith(".build-")] == []
+
+    automaton = MerchantAutomaton(directory)
+    assert isinstance(automaton._arrays["delta"], np.memmap)
+    assert not automaton._arrays["delta"].flags.writeable
+
+    # a different dictionary gets its own tables
+    other = build_automaton(entries[:10], str(tmp_path))
+    assert other != directory
+
+
+def test_enrich_fills_normalised_vendor_and_category(automaton):
+    transactions = [
+        Transaction(transaction_id=f"T{i}", date=datetime(2025, 1, 1), vendor=v, amount=Decimal("-5"), balance=Decimal("1"))
+        for i, v in enumerate(["BET365 LTD", "SOME LOCAL SHOP 44"])
+    ]
+    assert transactions[0].normalized_vendor is None and transactions[0].category is None
+
+    enrich_transactions(transactions, automaton)
+
+    assert [(t.normalized_vendor, t.category) for t in transactions] == [
+        ("BET365", "gambling"), ("SOME LOCAL SHOP", None),
+    ]
@@ -0,0 +1,125 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pypdfium2 as pdfium
+import pytest
+
+from benchmarks.synthetic import generate_statement, write_pdf
+from services.extraction import ocr, utils
+from services.extraction.ocr import OcrEngine, PageResult, _lines_from_data
+
+
+def _tesseract_data(rows):
+    """image_to_data style dict, rows are (line_num, word, conf)"""
+    return {
+        "text": [w for _, w, _ in rows],
+        "conf": [c for _, _, c in rows],
+        "block_num": [1] * len(rows),
+        "par_num": [1] * len(rows),
+        "line_num": [n for n, _, _ in rows],
+    }
+
+
+def _scanned_pdf(path, pages, text_pdf=None):
+    """Blank pages (no text layer) appended after the pages of text_pdf"""
+    pdf = pdfium.PdfDocument(text_pdf) if text_pdf else pdfium.PdfDocument.new()
+    for _ in range(pages):
+        pdf.new_page(595, 842)
+    pdf.save(path)
+    pdf.close()
+    return path
+
+
+@pytest.fixture
+def fake_tesseract(monkeypatch):
+    rendered = []
+
+    def _render(file_path, page_index, dpi=300):
+        rendered.append(page_index)
+        return page_index
+
+    def _image_to_data(image, **kwargs):
+        return _tesseract_data([(1, f"page{image + 1}", "91"), (2, "01/02/2025", "89"), (2, "-1.00", "-1")])
+
+    monkeypatch.setattr(ocr, "render_page", _render)
+    monkeypatch.setattr(ocr.pytesseract, "image_to_data", _image_to_data)
+    return rendered
+
+
+def test_lines_keep_rows_together():
+    text, confidence = _lines_from_data(_tesseract_data([
+        (1, "01/01/2025", "90"), (1, "TESCO", "80"), (1, "", "-1"),
+        (2, "02/01/2025", "70"), (2, "SPAR", "-1"),
+    ]))
+
+    assert text == "01/01/2025 TESCO\n02/01/2025 SPAR"
+    assert confidence == pytest.approx(80.0)
+
+
+def test_only_pages_without_text_layer_are_ocred(tmp_path, fake_tesseract):
+    statement = write_pdf(generate_statement(40, pages=2, seed=5), str(tmp_path / "text.pdf"))
+    path = _scanned_pdf(str(tmp_path / "mixed.pdf"), 2, text_pdf=statement)
+
+    results = list(OcrEngine(workers=0).iter_pages(path))
+
+    assert [r.page_number for r in results] == [1, 2, 3, 4]
+    assert [r.method for r in results] == ["text_layer", "text_layer", "ocr", "ocr"]
+    assert fake_tesseract == [2, 3]
+    assert results[2].text == "page3\n01/02/2025 -1.00"
+    assert results[2].confidence == pytest.approx(90.0)
+
+
+def test_pool_results_come_back_in_page_order(tmp_path, monkeypatch):
+    path = _scanned_pdf(str(tmp_path / "scan.pdf"), 6)
+
+    def _slow_first(file_path, page_index, *args):
+        # earlier pages finish last
+        time.sleep(0.02 * (6 - page_index))
+        return PageResult(page_index + 1, f"page {page_index + 1}", 90.0, "ocr")
+
+    engine = OcrEngine(workers=3)
+    engine._pool = ThreadPoolExecutor(3)
+    monkeypatch.setattr(ocr, "ocr_page", _slow_first)
+    try:
+        assert [r.page_number for r in engine.iter_pages(path)] == [1, 2, 3, 4, 5, 6]
+    finally:
+        engine.shutdown()
+
+
+def test_extract_text_uses_ocr_for_scanned_pages(tmp_path, monkeypatch, fake_tesseract):
+    statement = write_pdf(generate_statement(40, pages=1, seed=5), str(tmp_path / "text.pdf"))
+    path = _scanned_pdf(str(tmp_path / "mixed.pdf"), 1, text_pdf=statement)
+    monkeypatch.setattr(utils, "get_engine", lambda: OcrEngine(workers=0))
+
+    pages = []
+    text, confidence, method = utils.extract_text_from_pdf(path, backend="auto", on_page=pages.append)
+
+    assert method == "ocr"
+    assert [p.method for p in pages] == ["text_layer", "ocr"]
+    assert confidence == pytest.approx(95.0)
+    assert text.endswith("page2\n01/02/2025 -1.00")
+
+
+def test_blank_page_keeps_pdfplumber_for_column_drawn_text(tmp_path, monkeypatch, fake_tesseract):
+    statement = generate_statement(40, pages=1, seed=5)
+    statement.column_major = True
+    path = _scanned_pdf(str(tmp_path / "mixed.pdf"), 1, text_pdf=write_pdf(statement, str(tmp_path / "text.pdf")))
+    monkeypatch.setattr(utils, "get_engine", lambda: OcrEngine(workers=0))
+
+    pages = []
+    text, _, method = utils.extract_text_from_pdf(path, backend="auto", on_page=pages.append)
+
+    assert method == "ocr"
+    assert [p.method for p in pages] == ["text_layer", "ocr"]
+    assert fake_tesseract == [1]
+    # the text page is read with pdfplumber, row by row
+    assert pages[0].text == utils._extract_with_pdfplumber(path)
+    assert utils._has_statement_layout(pages[0].text)
+
+
+def test_pinned_backend_failure_raises(tmp_path):
+    path = _scanned_pdf(str(tmp_path / "scan.pdf"), 1)
+
+    for backend in ("pdfium", "pdfplumber"):
+        with pytest.raises(Exception, match=f"{backend} backend failed"):
+            utils.extract_text_from_pdf(path, backend=backend)
@@ -0,0 +1,134 @@
+import copy
+import os
+import time
+from decimal import Decimal
+
+import pypdfium2 as pdfium
+import pytest
+from PIL import Image, ImageDraw
+
+from benchmarks.synthetic import generate_statement, render_pdf
+from services.extraction import ocr
+from services.extraction.ocr import OcrEngine
+from services.extraction.ocr_cache import OcrCache
+
+
+def _page_image(text="Terms and Conditions"):
+    image = Image.new("L", (400, 300), 255)
+    ImageDraw.Draw(image).text((40, 40), text, fill=0)
+    return image
+
+
+def _blank_pdf(path, pages):
+    pdf = pdfium.PdfDocument.new()
+    for _ in range(pages):
+        pdf.new_page(595, 842)
+    pdf.save(path)
+    pdf.close()
+    return path
+
+
+def test_exact_key_changes_with_pixels_and_settings(tmp_path):
+    cache = OcrCache(str(tmp_path), 1024 * 1024)
+    image = _page_image()
+    touched = image.copy()
+    touched.putpixel((399, 299), 0)
+
+    key = cache.key(image, 300, "eng", "--psm 6")
+    assert key == cache.key(image.copy(), 300, "eng", "--psm 6")
+    assert key != cache.key(touched, 300, "eng", "--psm 6")
+    assert key != cache.key(image, 200, "eng", "--psm 6")
+    assert key != cache.key(image, 300, "eng", "--psm 4")
+
+
+def test_perceptual_key_ignores_scan_noise(tmp_path):
+    cache = OcrCache(str(tmp_path), 1024 * 1024, hash_mode="perceptual")
+    image = _page_image()
+    touched = image.copy()
+    touched.putpixel((399, 299), 250)
+
+    assert cache.key(image, 300, "eng", "") == cache.key(touched, 300, "eng", "")
+    assert cache.key(image, 300, "eng", "") != cache.key(_page_image("Statement of Account"), 300, "eng", "")
+
+
+def test_statement_pages_differing_in_one_amount_get_different_keys(tmp_path):
+    statement = generate_statement(30, seed=1)
+    changed = copy.deepcopy(statement)
+    changed.transactions[10].amount += Decimal("1.00")
+    pages = []
+    for name, version in (("a.pdf", statement), ("b.pdf", changed)):
+        path = tmp_path / name
+        path.write_bytes(render_pdf(version))
+        pages.append(ocr.render_page(str(path), 0, dpi=300))
+
+    exact = OcrCache(str(tmp_path / "exact"), 1024 * 1024)
+    assert exact.key(pages[0], 300, "eng", "") != exact.key(pages[1], 300, "eng", "")
+    # the reason perceptual mode is opt-in
+    perceptual = OcrCache(str(tmp_path / "perceptual"), 1024 * 1024, hash_mode="perceptual")
+    assert perceptual.key(pages[0], 300, "eng", "") == perceptual.key(pages[1], 300, "eng", "")
+
+
+def test_unknown_hash_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        OcrCache(str(tmp_path), 1024, hash_mode="md5")
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = OcrCache(str(tmp_path), 1024 * 1024)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, "x" * 400, 90.0, 1.0)
+        stamp = time.time() - 100 + i
+        os.utime(os.path.join(str(tmp_path), f"{key}.json"), (stamp, stamp))
+
+    assert cache.get("a") is not None  # now the most recently used
+    cache.max_bytes = 2 * os.path.getsize(os.path.join(str(tmp_path), "a.json"))
+
+    assert cache.evict() == 1
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_added_entries_only_walk_the_directory_past_the_limit(tmp_path, monkeypatch):
+    cache = OcrCache(str(tmp_path), 1024 * 1024)
+    walks = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: walks.append(path) or scandir(path))
+
+    for i in range(5):
+        cache.put(str(i), "x" * 400, 90.0, 1.0)
+        cache.added("x" * 400, 90.0, 1.0)
+    # one walk to learn the starting size, the rest are counted
+    assert len(walks) == 1
+
+    cache.max_bytes = 3 * os.path.getsize(os.path.join(str(tmp_path), "0.json"))
+    cache.put("5", "x" * 400, 90.0, 1.0)
+    assert cache.added("x" * 400, 90.0, 1.0) == 3
+    assert len(walks) == 2 and len(list(tmp_path.glob("*.json"))) == 3
+
+
+def test_engine_reuses_cached_pages(tmp_path, monkeypatch):
+    calls = []
+
+    def _image_to_data(image, **kwargs):
+        calls.append(image)
+        return {"text": ["Terms"], "conf": ["88"], "block_num": [1], "par_num": [1], "line_num": [1]}
+
+    monkeypatch.setattr(ocr.pytesseract, "image_to_data", _image_to_data)
+    path = _blank_pdf(str(tmp_path / "scan.pdf"), 3)
+    engine = OcrEngine(workers=0, dpi=50, cache=OcrCache(str(tmp_path / "cache"), 1024 * 1024))
+
+    first = []
+    engine.extract(path, on_page=first.append)
+    # identical blank pages, only the first one reaches tesseract
+    assert len(calls) == 1
+    assert [p.cached for p in first] == [False, True, True]
+
+    second = []
+    text, confidence = engine.extract(path, on_page=second.append)
+    assert len(calls) == 1
+    assert all(p.cached for p in second)
+    assert text == "Terms\nTerms\nTerms"
+    assert confidence == pytest.approx(88.0)
+    assert engine.stats["lookups"] == 6 and engine.stats["hits"] == 5
+    assert engine.hit_rate == pytest.approx(5 / 6)
+    assert engine.stats["seconds_saved"] == pytest.approx(5 * first[0].ocr_seconds)
@@ -0,0 +1,73 @@
+import pytest
+
+from benchmarks.synthetic import generate_statement, write_pdf
+from services.extraction import layouts, parser, tables
+from services.extraction.layouts import LayoutTemplates, identify
+from services.extraction.parser import parse_document
+from services.extraction.tables import learn_columns, read_statement
+from services.extraction.utils import extract_text_from_pdf
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    templates = LayoutTemplates(str(tmp_path / "layouts"))
+    for module in (parser, tables):
+        monkeypatch.setattr(module, "layout_templates", templates)
+    return templates
+
+
+def _pdf(tmp_path, filename, transactions=60, pages=1, seed=0, column_major=True):
+    statement = generate_statement(transactions, pages=pages, seed=seed)
+    statement.column_major = column_major
+    return write_pdf(statement, str(tmp_path / filename))
+
+
+def _text_route(path, fingerprint=None):
+    text, _, method = extract_text_from_pdf(path)
+    return parse_document(text, "000_000_001", "statement.pdf", fingerprint), method
+
+
+def test_columns_are_learned_from_a_statement_that_needed_pdfplumber(tmp_path, store):
+    first = _pdf(tmp_path, "first.pdf", seed=1)
+    fingerprint = identify(first)
+    document, method = _text_route(first, fingerprint)
+    assert method == "pdfplumber"
+
+    template = learn_columns(first, fingerprint, document)
+    # synthetic columns: dates end at ~106, vendors start at ~152, amounts end at 442.8, balances start past 470
+    date_vendor, vendor_amount, amount_balance = template.boundaries
+    assert 106 < date_vendor < 152 and vendor_amount < 400 and 443 < amount_balance < 470
+    assert LayoutTemplates(store.directory).get(fingerprint).boundaries == template.boundaries
+
+    later = _pdf(tmp_path, "later.pdf", transactions=150, pages=3, seed=2)
+    read = read_statement(later, template, "000_000_001", "statement.pdf")
+    assert read == _text_route(later)[0]
+    assert len(read.transactions) == 150
+
+
+def test_cells_are_placed_by_position_whatever_the_drawing_order(tmp_path, store):
+    first = _pdf(tmp_path, "first.pdf", seed=1)
+    fingerprint = identify(first)
+    template = learn_columns(first, fingerprint, _text_route(first, fingerprint)[0])
+
+    row_major = _pdf(tmp_path, "rows.pdf", transactions=90, pages=2, seed=5, column_major=False)
+    assert read_statement(row_major, template, "000_000_001", "statement.pdf") == _text_route(row_major)[0]
+
+
+def test_boundaries_that_misread_the_statement_are_not_kept(tmp_path, store):
+    first = _pdf(tmp_path, "first.pdf", seed=1)
+    fingerprint = identify(first)
+    document = _text_route(first, fingerprint)[0]
+    document.transactions[3].vendor = "SOMETHING ELSE"
+
+    assert learn_columns(first, fingerprint, document).boundaries == []
+    assert LayoutTemplates(store.directory).get(fingerprint).boundaries == []
+
+
+def test_short_table_reads_go_the_text_route(tmp_path, store):
+    first = _pdf(tmp_path, "first.pdf", seed=1)
+    fingerprint = identify(first)
+    template = learn_columns(first, fingerprint, _text_route(first, fingerprint)[0])
+
+    assert read_statement(_pdf(tmp_path, "short.pdf", transactions=10), template, "000_000_001", "s.pdf") is None
+    assert layouts.LAYOUT_TEMPLATE_DOCUMENTS.labels(template.key, "fallback")._value.get() >= 1
@@ -2,11 +2,15 @@ import os
 import pytest
 from fastapi.testclient import TestClient
 
+from benchmarks.synthetic import generate_statement, render_pdf
 from services.ingest.main import app
 from services.ingest.config import MAX_FILE_SIZE
 
 client = TestClient(app)
 
+# uploads are opened by the pre-flight check, so PDFs have to be real ones
+STATEMENT = render_pdf(generate_statement(40, pages=1, seed=1))
+
 # override upload dir for tests
 @pytest.fixture(autouse=True)
 def temp_upload_dir(tmp_path, monkeypatch):
@@ -17,7 +21,7 @@ def temp_upload_dir(tmp_path, monkeypatch):
 # upload a valid file
 def test_upload_file_valid_success():
     # mock file contents
-    file_content = b"test file content"
+    file_content = STATEMENT
     file_name = "test.pdf"
     file_type = "application/pdf"
     customer_id = "000_000_001"
@@ -44,7 +48,7 @@ def test_upload_file_valid_success():
 # upload a file with additional file_type args
 def test_upload_file_additional_file_type_args_sucess():
     # mock file contents
-    file_content = b"test file content"
+    file_content = STATEMENT
     file_name = "test.pdf"
     file_type = "application/pdf; charset=binary"
     customer_id = "000_000_001"
@@ -71,7 +75,7 @@ def test_upload_file_additional_file_type_args_sucess():
 # upload a file with a capitalised file_type
 def test_upload_file_capitalised_file_type_success():
     # mock file contents
-    file_content = b"test file content"
+    file_content = STATEMENT
     file_name = "test.pdf"
     file_type = "APPLICATION/PDF"
     customer_id = "000_000_001"
@@ -161,7 +165,7 @@ def test_upload_file_empty_content_fail():
 # upload a file on the size limit for content
 def test_upload_file_on_size_limit_success():
     # mock file contents
-    file_content = b"x" * (MAX_FILE_SIZE) 
+    file_content = STATEMENT + b"%" * (MAX_FILE_SIZE - len(STATEMENT))
     file_name = "big.pdf"
     file_type = "application/pdf"
     customer_id = "000_000_001"
@@ -0,0 +1,96 @@
+import pypdfium2 as pdfium
+
+from benchmarks.synthetic import generate_statement, render_pdf
+from services.ingest import utils
+from services.ingest.utils import preflight
+
+
+def _statement(pages=2):
+    return render_pdf(generate_statement(40 * pages, pages=pages, seed=1))
+
+
+def _scan(tmp_path, pages=3):
+    pdf = pdfium.PdfDocument.new()
+    for _ in range(pages):
+        pdf.new_page(595, 842)
+    path = str(tmp_path / "scan.pdf")
+    pdf.save(path)
+    pdf.close()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _password_protected(content):
+    """The statement with a standard security handler whose /U no empty user password matches"""
+    head = content[:content.rindex(b"xref")]
+    offsets = [int(line[:10]) for line in content[content.rindex(b"xref"):].split(b"\n") if line.endswith(b" n ")]
+    offsets.append(len(head))
+    head += (b"%d 0 obj\n<< /Filter /Standard /V 1 /R 2 /O <%s> /U <%s> /P -4 >>\nendobj\n"
+             % (len(offsets), b"00" * 32, b"11" * 32))
+    xref = b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1)
+    xref += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    file_id = b"<0123456789abcdef0123456789abcdef>"
+    trailer = (b"trailer\n<< /Size %d /Root 1 0 R /Encrypt %d 0 R /ID [%s %s] >>\nstartxref\n%d\n%%%%EOF\n"
+               % (len(offsets) + 1, len(offsets), file_id, file_id, len(head)))
+    return head + xref + trailer
+
+
+def test_statement_with_text_layer_passes():
+    checked = preflight(_statement(), "application/pdf")
+
+    assert checked.rejected is None
+    assert (checked.pages, checked.encrypted, checked.text_layer) == (2, False, True)
+
+
+def test_scans_pass_without_a_text_layer(tmp_path):
+    checked = preflight(_scan(tmp_path), "application/pdf")
+
+    assert checked.rejected is None
+    assert (checked.pages, checked.text_layer) == (3, False)
+
+
+def test_broken_xref_is_repaired():
+    content = _statement()
+    startxref = content.rindex(b"startxref\n") + len(b"startxref\n")
+    checked = preflight(content[:startxref] + b"1" + content[startxref:], "application/pdf")
+
+    assert checked.rejected is None
+    assert checked.pages == 2 and checked.text_layer is True
+
+
+def test_unreadable_files_are_rejected():
+    content = _statement()
+    for bad in (b"not a pdf at all", content[:len(content) // 3]):
+        assert preflight(bad, "application/pdf").rejected == "PDF could not be read"
+
+
+def test_password_protected_files_are_rejected():
+    checked = preflight(_password_protected(_statement()), "application/pdf")
+
+    assert checked.encrypted is True
+    assert checked.rejected == "PDF is password protected"
+
+
+def test_page_limit(monkeypatch):
+    monkeypatch.setattr(utils, "INGEST_MAX_PAGES", 3)
+
+    assert preflight(_statement(pages=3), "application/pdf").rejected is None
+    checked = preflight(_statement(pages=4), "application/pdf")
+    assert checked.pages == 4
+    assert checked.rejected == "PDF has 4 pages, the limit is 3"
+
+
+def test_pdfium_is_only_used_under_the_lock(monkeypatch):
+    held = []
+    document = pdfium.PdfDocument
+    monkeypatch.setattr(pdfium, "PdfDocument", lambda content: held.append(utils._pdfium_lock.locked()) or document(content))
+
+    assert preflight(_statement(), "application/pdf").rejected is None
+    assert held == [True] and not utils._pdfium_lock.locked()
+
+
+def test_images_are_priced_as_ocr():
+    checked = preflight(b"\x89PNG\r\n", "image/png")
+
+    assert checked.rejected is None
+    assert (checked.pages, checked.text_layer) == (1, False)
@@ -0,0 +1,101 @@
+from collections import Counter
+
+from services.scheduler.fair import FairScheduler, parse_overrides
+
+
+def _drain(scheduler, limit=1000):
+    """Dispatch everything, completing each job straight away"""
+    order = []
+    while len(order) < limit:
+        job = scheduler.next_job()
+        if job is None:
+            break
+        order.append(job)
+        scheduler.complete(job.job_id)
+    return order
+
+
+def test_bulk_customer_does_not_starve_others():
+    scheduler = FairScheduler(quantum=1, default_cap=10)
+    for i in range(1000):
+        scheduler.add(f"big{i}", "big")
+    scheduler.add("small0", "small")
+    scheduler.add("small1", "small")
+
+    order = [job.job_id for job in _drain(scheduler, limit=6)]
+
+    assert "small0" in order[:2] and "small1" in order[:4]
+
+
+def test_share_is_by_pages_not_jobs():
+    scheduler = FairScheduler(quantum=10, default_cap=10)
+    for i in range(100):
+        scheduler.add(f"a{i}", "a", cost=10)
+    for i in range(1000):
+        scheduler.add(f"b{i}", "b", cost=1)
+
+    pages = Counter()
+    for job in _drain(scheduler, limit=110):
+        pages[job.customer_id] += job.cost
+
+    assert abs(pages["a"] - pages["b"]) <= 10
+
+
+def test_weights():
+    scheduler = FairScheduler(quantum=1, default_cap=10, weights={"gold": 3})
+    for i in range(100):
+        scheduler.add(f"g{i}", "gold")
+        scheduler.add(f"s{i}", "silver")
+
+    picks = Counter(job.customer_id for job in _drain(scheduler, limit=40))
+
+    assert picks == {"gold": 30, "silver": 10}
+
+
+def test_customer_cap_holds_until_complete():
+    scheduler = FairScheduler(quantum=5, default_cap=2, caps={"vip": 3})
+    for i in range(5):
+        scheduler.add(f"a{i}", "a")
+        scheduler.add(f"v{i}", "vip")
+
+    out = []
+    while (job := scheduler.next_job()) is not None:
+        out.append(job)
+
+    assert Counter(j.customer_id for j in out) == {"a": 2, "vip": 3}
+    assert scheduler.depth("a") == 3 and scheduler.in_flight("a") == 2
+
+    scheduler.complete(out[0].job_id if out[0].customer_id == "a" else "a0")
+    assert scheduler.next_job().customer_id == "a"
+
+
+def test_max_dispatched_limits_total():
+    scheduler = FairScheduler(quantum=1, default_cap=10, max_dispatched=3)
+    for i in range(10):
+        scheduler.add(f"j{i}", f"customer{i}")
+
+    assert [scheduler.next_job() is not None for _ in range(4)] == [True, True, True, False]
+
+
+def test_lost_done_notices_expire():
+    scheduler = FairScheduler(quantum=1, default_cap=1)
+    scheduler.add("j0", "a")
+    scheduler.add("j1", "a")
+    job = scheduler.next_job()
+    assert scheduler.next_job() is None
+
+    assert scheduler.expire(60, now=job.dispatched_at + 61) == ["j0"]
+    assert scheduler.next_job().job_id == "j1"
+
+
+def test_idle_customers_are_forgotten():
+    scheduler = FairScheduler(quantum=1, default_cap=1)
+    scheduler.add("j0", "a")
+    _drain(scheduler)
+
+    assert scheduler.customers() == set()
+
+
+def test_parse_overrides():
+    assert parse_overrides("000_000_001=4, 000_000_002=1") == {"000_000_001": 4, "000_000_002": 1}
+    assert parse_overrides("") == {}
@@ -0,0 +1,114 @@
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+import pyarrow.parquet as pq
+
+from models.models import Transaction
+from shared.lake import append_transactions, compact, files_for, main, read_transactions
+
+
+def _statement(start_month, months=3, per_month=4, prefix="TXN"):
+    rows = []
+    for m in range(months):
+        for d in range(per_month):
+            rows.append(Transaction(
+                transaction_id=f"{prefix}{len(rows):03d}", date=datetime(2025, start_month + m, 1 + d * 7, 9),
+                vendor="TESCO STORES 2231", amount=Decimal("-12.34"), balance=Decimal("1000.00") - len(rows),
+                normalized_vendor="TESCO", category="groceries",
+            ))
+    return rows
+
+
+def _age(directory, seconds=7200):
+    for root, _, files in os.walk(directory):
+        for f in files:
+            path = os.path.join(root, f)
+            stat = os.stat(path)
+            os.utime(path, (stat.st_atime - seconds, stat.st_mtime - seconds))
+
+
+def test_rows_land_in_month_and_customer_partitions(tmp_path):
+    written = append_transactions("000_000_001", "job-a", "jan.pdf", _statement(1), str(tmp_path))
+
+    assert [os.path.relpath(p, tmp_path) for p in written] == [
+        f"month=2025-0{m}/customer_id=000_000_001/job-a.parquet" for m in (1, 2, 3)
+    ]
+    table = read_transactions(directory=str(tmp_path))
+    assert table.num_rows == 12
+    row = table.sort_by("transaction_id").slice(0, 1).to_pylist()[0]
+    assert row["amount"] == Decimal("-12.34") and row["date"] == datetime(2025, 1, 1, 9)
+    assert (row["customer_id"], row["month"], row["job_id"]) == ("000_000_001", "2025-01", "job-a")
+
+
+def test_reads_open_only_matching_partitions_and_columns(tmp_path):
+    for customer in ("000_000_001", "000_000_002", "000_000_003"):
+        append_transactions(customer, f"job-{customer}", "statement.pdf", _statement(1, months=6), str(tmp_path))
+
+    files = files_for(["000_000_002"], date(2025, 2, 10), date(2025, 3, 31), str(tmp_path))
+    assert [os.path.relpath(p, tmp_path).split(os.sep)[:2] for p in files] == [
+        ["month=2025-02", "customer_id=000_000_002"], ["month=2025-03", "customer_id=000_000_002"],
+    ]
+
+    table = read_transactions(["000_000_002"], date(2025, 2, 10), date(2025, 3, 31), ["date", "amount"],
+                              str(tmp_path))
+    assert table.column_names == ["date", "amount"]
+    # the range starts mid-February, so that month's first two rows are cut
+    assert table.num_rows == 2 + 4
+    assert min(table.column("date").to_pylist()) == datetime(2025, 2, 15, 9)
+
+
+def test_retried_job_replaces_its_rows(tmp_path):
+    append_transactions("000_000_001", "job-a", "jan.pdf", _statement(1), str(tmp_path))
+    append_transactions("000_000_001", "job-a", "jan.pdf", _statement(1), str(tmp_path))
+    assert read_transactions(directory=str(tmp_path)).num_rows == 12
+
+
+def test_compaction_merges_settled_files_without_losing_rows(tmp_path):
+    for i in range(5):
+        append_transactions("000_000_001", f"job-{i}", "s.pdf", _statement(1, months=2, prefix=f"J{i}-"), str(tmp_path))
+    _age(tmp_path)
+    # a fresh file may still be rewritten by a retry, so it stays as it is
+    append_transactions("000_000_001", "job-new", "s.pdf", _statement(1, months=1, prefix="N-"), str(tmp_path))
+    before = read_transactions(directory=str(tmp_path)).sort_by("transaction_id")
+
+    stats = compact(str(tmp_path), min_age_s=3600)
+
+    assert stats == {"partitions": 2, "files_in": 10, "files_out": 2}
+    january = os.listdir(tmp_path / "month=2025-01" / "customer_id=000_000_001")
+    assert sorted(f.split("-")[0] for f in january) == ["compacted", "job"]
+    after = read_transactions(directory=str(tmp_path)).sort_by("transaction_id")
+    assert after.equals(before)
+
+    compacted = next(tmp_path.glob("month=2025-02/*/compacted-*.parquet"))
+    dates = pq.read_table(compacted, columns=["date"]).column("date").to_pylist()
+    assert dates == sorted(dates)
+
+
+def test_compaction_respects_target_size(tmp_path):
+    for i in range(6):
+        append_transactions("000_000_001", f"job-{i}", "s.pdf", _statement(1, months=1, prefix=f"J{i}-"), str(tmp_path))
+    _age(tmp_path)
+    size = os.path.getsize(next(tmp_path.glob("month=2025-01/*/job-0.parquet")))
+
+    stats = compact(str(tmp_path), min_age_s=3600, target_bytes=size * 3)
+    assert stats["files_in"] == 6 and stats["files_out"] == 2
+
+
+def test_missing_lake_reads_empty(tmp_path):
+    table = read_transactions(["x"], columns=["amount"], directory=str(tmp_path / "none"))
+    assert table.num_rows == 0 and table.column_names == ["amount"]
+
+
+def test_cli_takes_dir_after_the_command(tmp_path, monkeypatch, capsys):
+    for job in ("job-a", "job-b"):
+        append_transactions("000_000_001", job, "statement.pdf", _statement(1, months=1), str(tmp_path))
+    _age(tmp_path)
+
+    monkeypatch.setattr("sys.argv", ["lake", "compact", "--dir", str(tmp_path)])
+    main()
+    assert "Compacted 2 files into 1" in capsys.readouterr().out
+
+    monkeypatch.setattr("sys.argv", ["lake", "query", "--dir", str(tmp_path), "--columns", "amount"])
+    main()
+    assert "8 transactions from 1 files" in capsys.readouterr().out
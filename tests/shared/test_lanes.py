@@ -0,0 +1,89 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+from shared import lanes
+from shared.lanes import WeightedLaneConsumer, estimate_pages, lane_for, parse_weights, queue_for_lane
+
+
+def test_lane_by_page_count():
+    assert lane_for(2, 40_000) == "fast"
+    assert lane_for(30, 400_000) == "standard"
+    assert lane_for(500, 5_000_000) == "bulk"
+
+
+def test_size_catches_image_heavy_scans():
+    # 3 scanned pages at 2 MB each cost more than 3 text pages
+    assert estimate_pages(3, 6 * 1024 * 1024) > 3
+    assert lane_for(3, 6 * 1024 * 1024) == "standard"
+    # unreadable PDF, size only
+    assert lane_for(None, 10_000) == "fast"
+
+
+def test_pages_without_text_layer_are_priced_as_ocr(monkeypatch):
+    monkeypatch.setattr(lanes, "OCR_PAGE_COST", 10)
+    assert estimate_pages(4, 40_000, text_layer=False) == 40
+    assert lane_for(4, 40_000, text_layer=True) == "fast"
+    assert lane_for(4, 40_000, text_layer=False) == "standard"
+    # no pre-flight result, page count and size only
+    assert lane_for(4, 40_000) == "fast"
+
+
+def test_standard_lane_keeps_queue_name():
+    assert queue_for_lane("standard", "raw_extraction_queue") == "raw_extraction_queue"
+    assert queue_for_lane("fast", "raw_extraction_queue") == "raw_extraction_queue_fast"
+
+
+def test_parse_weights():
+    assert parse_weights("fast=6, bulk=2") == {"fast": 6, "standard": 1, "bulk": 2}
+    with pytest.raises(ValueError):
+        parse_weights("urgent=10")
+
+
+def test_picks_follow_weights_when_every_lane_is_busy():
+    consumer = WeightedLaneConsumer(None, {"fast": 6, "standard": 3, "bulk": 1})
+    for lane in consumer.weights:
+        consumer._waiting[lane].extend(range(1000))
+
+    picks = Counter(consumer.next_lane() for _ in range(100))
+
+    assert picks == {"fast": 60, "standard": 30, "bulk": 10}
+
+
+def test_idle_lanes_give_up_their_turn():
+    consumer = WeightedLaneConsumer(None, {"fast": 6, "standard": 3, "bulk": 1})
+    consumer._waiting["bulk"].extend(range(5))
+
+    picks = []
+    for _ in range(5):
+        picks.append(consumer.next_lane())
+        consumer._waiting[picks[-1]].pop(0)
+
+    assert picks == ["bulk"] * 5
+    assert consumer.next_lane() is None
+
+
+def test_small_jobs_overtake_bulk_backlog():
+    handled = []
+
+    async def handler(message):
+        handled.append(message)
+        await asyncio.sleep(0)
+
+    async def scenario():
+        consumer = WeightedLaneConsumer(handler, {"fast": 6, "standard": 3, "bulk": 1})
+        for i in range(20):
+            consumer.offer("bulk", f"bulk{i}")
+        for i in range(3):
+            consumer.offer("fast", f"fast{i}")
+
+        task = asyncio.create_task(consumer.run())
+        while len(handled) < 23:
+            await asyncio.sleep(0)
+        task.cancel()
+
+    asyncio.run(scenario())
+
+    # every fast job runs within the first few picks, not after 20 bulk jobs
+    assert max(handled.index(f"fast{i}") for i in range(3)) < 5
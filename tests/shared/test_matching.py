@@ -0,0 +1,59 @@
+import pytest
+
+from benchmarks.party_matching import evaluate, load_cases
+from shared.matching import (
+    PartyProfile, MATCHING_VERSION, party_profile, name_tokens, address_tokens, name_similarity, address_similarity,
+)
+
+
+def test_canonical_forms():
+    assert name_tokens("Mr. Seán O'Connor") == {"SEAN", "OCONNOR"}
+    assert name_tokens("Smith-Jones, Anne") == {"ANNE", "SMITH", "JONES"}
+    assert address_tokens("Apt 4, 22 Harbour Rd.\nCo. Dublin D04 X2Y3") == {
+        "APARTMENT", "4", "22", "HARBOUR", "ROAD", "DUBLIN", "D04X2Y3",
+    }
+    assert address_tokens("1 High St, Darlington DL11AA") == address_tokens("1 HIGH STREET DARLINGTON DL1 1AA")
+
+
+@pytest.mark.parametrize("profile,document", [
+    ("John Smith", "SMITH, JOHN"),
+    ("John Smith", "Dr John P Smith"),
+    ("John Smith", "J. Smith"),
+    ("John Smith", "John Smlth"),
+])
+def test_name_variants_match(profile, document):
+    assert name_similarity(name_tokens(profile), name_tokens(document)) >= 0.8
+
+
+def test_different_people_do_not_match():
+    assert name_similarity(name_tokens("John Smith"), name_tokens("Jane Smith")) < 0.8
+    assert name_similarity(name_tokens("Patrick Walsh"), name_tokens("Patricia Walsh")) < 0.8
+
+
+def test_house_numbers_and_street_types_are_strict():
+    home = address_tokens("123 Main St, Dublin")
+    assert address_similarity(home, address_tokens("123 Main Street\nDublin")) == 1.0
+    assert address_similarity(home, address_tokens("124 Main Street, Dublin")) == 0.0
+    assert address_similarity(home, address_tokens("123 Main Road, Dublin")) == 0.0
+    assert address_similarity(home, address_tokens("124 Main St, London")) == 0.0
+
+
+def test_profile_round_trips_and_rejects_other_versions():
+    profile = party_profile("John Smith", "44 Oak Avenue, Cork, Ireland")
+    data = profile.to_dict()
+
+    assert PartyProfile.from_dict(data) == profile
+    assert PartyProfile.from_dict({**data, "version": MATCHING_VERSION - 1}) is None
+    assert PartyProfile.from_dict(None) is None
+
+
+def test_labelled_set_accuracy():
+    cases = load_cases()
+    results = evaluate(cases)
+
+    for field in ("name", "address"):
+        assert results["fuzzy"][field]["accuracy"] >= 0.95
+        assert results["fuzzy"][field]["false_flags"] < results["exact"][field]["false_flags"]
+    # nothing a human would call a different person or home slips through
+    assert results["fuzzy"]["name"]["precision"] == 1.0
+    assert results["fuzzy"]["address"]["precision"] == 1.0
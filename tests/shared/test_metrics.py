@@ -0,0 +1,59 @@
+import time
+
+from shared.metrics import (
+    STAGE_LATENCY, QUEUE_LAG, JOBS_IN_FLIGHT, PUBLISHED_AT_HEADER,
+    stage_timer, track_in_flight, publish_headers, observe_queue_lag,
+)
+
+
+def _sample(metric, suffix, **labels):
+    for family in metric.collect():
+        for sample in family.samples:
+            if sample.name.endswith(suffix) and sample.labels.items() >= labels.items():
+                return sample.value
+    return 0.0
+
+
+def test_stage_timer_observes_latency():
+    before = _sample(STAGE_LATENCY, "_count", service="test", stage="parse")
+    with stage_timer("test", "parse"):
+        time.sleep(0.01)
+    assert _sample(STAGE_LATENCY, "_count", service="test", stage="parse") == before + 1
+    assert _sample(STAGE_LATENCY, "_sum", service="test", stage="parse") >= 0.01
+
+
+def test_stage_timer_observes_on_error():
+    before = _sample(STAGE_LATENCY, "_count", service="test", stage="boom")
+    try:
+        with stage_timer("test", "boom"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert _sample(STAGE_LATENCY, "_count", service="test", stage="boom") == before + 1
+
+
+def test_queue_lag_uses_published_header():
+    headers = publish_headers()
+    assert PUBLISHED_AT_HEADER in headers
+
+    headers[PUBLISHED_AT_HEADER] -= 2.0
+    observe_queue_lag("test", "q", headers)
+    assert _sample(QUEUE_LAG, "_sum", service="test", queue="q") >= 2.0
+
+
+def test_queue_lag_ignores_messages_without_header():
+    before = _sample(QUEUE_LAG, "_count", service="test", queue="legacy")
+    observe_queue_lag("test", "legacy", None)
+    observe_queue_lag("test", "legacy", {})
+    assert _sample(QUEUE_LAG, "_count", service="test", queue="legacy") == before
+
+
+def test_track_in_flight():
+    import asyncio
+
+    async def run():
+        async with track_in_flight("test"):
+            assert JOBS_IN_FLIGHT.labels("test")._value.get() == 1
+        assert JOBS_IN_FLIGHT.labels("test")._value.get() == 0
+
+    asyncio.run(run())
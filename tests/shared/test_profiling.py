@@ -0,0 +1,95 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from shared.profiling import JobProfiler
+
+
+def _busy_job(profiler, pages):
+    async def handler(message):
+        total = 0
+        for i in range(200_000):
+            total += i * i
+        profiler.tag(pages=pages, transactions=pages * 30)
+        return total
+    return handler
+
+
+def _run(profiler, jobs):
+    for i, pages in enumerate(jobs):
+        handler = profiler.wrap(_busy_job(profiler, pages))
+        asyncio.run(handler(SimpleNamespace(correlation_id=f"job-{i}")))
+
+
+def test_disabled_profiler_writes_nothing(tmp_path):
+    profiler = JobProfiler("extraction", "w1", enabled=False, output_dir=str(tmp_path))
+    _run(profiler, [1, 2])
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sampling_profile_rotates_every_n_jobs(tmp_path):
+    profiler = JobProfiler("extraction", "w1", enabled=True, mode="sample",
+                           output_dir=str(tmp_path), every_n_jobs=2, interval_ms=1)
+    _run(profiler, [1, 2, 3])
+
+    folded = sorted(tmp_path.glob("*.folded"))
+    sidecars = sorted(tmp_path.glob("*.json"))
+    assert len(folded) == 1 and len(sidecars) == 1
+
+    lines = folded[0].read_text().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("handler" in line for line in lines)
+
+    meta = json.loads(sidecars[0].read_text())
+    assert [j["job_id"] for j in meta["jobs"]] == ["job-0", "job-1"]
+    assert meta["totals"]["pages"] == 3
+    assert meta["totals"]["transactions"] == 90
+
+    # third job is flushed on demand
+    profiler.flush()
+    assert len(list(tmp_path.glob("*.folded"))) == 2
+
+
+def test_cprofile_mode(tmp_path):
+    profiler = JobProfiler("analysis", "w1", enabled=True, mode="cprofile",
+                           output_dir=str(tmp_path), every_n_jobs=1)
+    _run(profiler, [4])
+    assert len(list(tmp_path.glob("*.prof"))) == 1
+
+
+def test_control_message_enables_for_n_jobs(tmp_path):
+    profiler = JobProfiler("extraction", "w1", enabled=False, output_dir=str(tmp_path),
+                           every_n_jobs=10, interval_ms=1)
+
+    profiler.handle_control({"command": "enable", "service": "analysis", "jobs": 2})
+    assert not profiler.active
+
+    profiler.handle_control({"command": "enable", "service": "extraction", "jobs": 2})
+    assert profiler.active
+
+    _run(profiler, [1, 1, 1])
+    assert not profiler.active
+    meta = json.loads(next(tmp_path.glob("*.json")).read_text())
+    assert meta["totals"]["jobs"] == 2
+
+
+def test_disable_mid_job_flushes_after_the_sampler_stops(tmp_path):
+    profiler = JobProfiler("extraction", "w1", enabled=True, mode="sample",
+                           output_dir=str(tmp_path), every_n_jobs=10, interval_ms=1)
+
+    async def handler(message):
+        total = 0
+        for i in range(200_000):
+            total += i * i
+        profiler.handle_control({"command": "disable"})
+        assert list(tmp_path.iterdir()) == []
+        for i in range(200_000):
+            total += i * i
+        return total
+
+    asyncio.run(profiler.wrap(handler)(SimpleNamespace(correlation_id="job-0")))
+
+    assert not profiler.active and not profiler._sampler.is_alive()
+    meta = json.loads(next(tmp_path.glob("*.json")).read_text())
+    assert [j["job_id"] for j in meta["jobs"]] == ["job-0"]
+    assert profiler._jobs == [] and not profiler._counts
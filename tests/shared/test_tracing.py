@@ -0,0 +1,135 @@
+import json
+import queue
+import threading
+import time
+
+import pytest
+
+import shared.tracing as tracing
+from shared.tracing import (
+    TRACEPARENT_HEADER, start_span, inject_trace_context, extract_trace_context, flush_traces,
+)
+from shared.trace_report import critical_path, summarise
+
+
+@pytest.fixture
+def span_file(tmp_path, monkeypatch):
+    path = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_PATH", str(path))
+    return path
+
+
+def _read(path):
+    flush_traces()
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_nested_spans_share_trace(span_file):
+    with start_span("process_message", job_id="job-1") as root:
+        with start_span("parse_document") as child:
+            pass
+
+    spans = {s["name"]: s for s in _read(span_file)}
+    assert child.trace_id == root.trace_id
+    assert spans["parse_document"]["parent_id"] == root.span_id
+    assert spans["process_message"]["parent_id"] is None
+    assert spans["process_message"]["attributes"]["job_id"] == "job-1"
+
+
+def test_context_propagates_through_headers(span_file):
+    with start_span("publish") as upstream:
+        headers = inject_trace_context({})
+
+    assert headers[TRACEPARENT_HEADER] == f"00-{upstream.trace_id}-{upstream.span_id}-01"
+
+    with start_span("process_message", parent=extract_trace_context(headers)) as downstream:
+        pass
+
+    assert downstream.trace_id == upstream.trace_id
+    assert downstream.parent_id == upstream.span_id
+
+
+def test_extract_ignores_missing_or_malformed_headers():
+    assert extract_trace_context(None) is None
+    assert extract_trace_context({}) is None
+    assert extract_trace_context({TRACEPARENT_HEADER: "garbage"}) is None
+
+
+def test_errors_mark_span(span_file):
+    with pytest.raises(ValueError):
+        with start_span("extract_text_from_pdf"):
+            raise ValueError("bad pdf")
+
+    (span,) = _read(span_file)
+    assert span["status"] == "error"
+    assert span["attributes"]["error"] == "bad pdf"
+
+
+@pytest.fixture
+def slow_collector(monkeypatch):
+    """Collector that holds every POST until released, on a fresh exporter with room for one batch"""
+    release, posted = threading.Event(), []
+
+    def _post(url, json, timeout):
+        release.wait(5)
+        posted.append(json["spans"])
+
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_PATH", None)
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_URL", "http://collector/spans")
+    monkeypatch.setattr(tracing.httpx, "post", _post)
+    monkeypatch.setattr(tracing, "_exports", queue.Queue(maxsize=1))
+    monkeypatch.setattr(tracing, "_exporter", None)
+    yield release, posted
+    release.set()
+    flush_traces()
+
+
+def test_slow_collector_neither_blocks_spans_nor_piles_them_up(slow_collector):
+    release, posted = slow_collector
+    start = time.perf_counter()
+    for i in range(5):
+        with start_span("process_message", job_id=f"job-{i}"):
+            pass
+    assert time.perf_counter() - start < 1.0
+
+    # one batch being posted, one waiting, the rest dropped
+    release.set()
+    flush_traces()
+    assert 1 <= len(posted) <= 2
+    assert len(tracing._pending) == 0
+
+
+def _span(span_id, parent_id, name, start, end, service="extraction"):
+    return {
+        "trace_id": "t" * 32, "span_id": span_id, "parent_id": parent_id, "name": name,
+        "service": service, "start": start, "end": end, "attributes": {},
+    }
+
+
+def test_critical_path_follows_sequential_steps_and_queues():
+    spans = [
+        _span("a", None, "upload", 0.0, 1.0, service="ingest"),
+        _span("b", "a", "process_message", 3.0, 10.0),
+        _span("c", "b", "fetch_customer_metadata", 3.0, 4.0),
+        _span("d", "b", "extract_text_from_pdf", 4.0, 8.0),
+        _span("e", "b", "publish", 9.0, 10.0),
+        _span("f", "e", "process_message", 12.0, 13.0, service="analysis"),
+    ]
+    spans[0]["attributes"]["job_id"] = "job-1"
+
+    steps = critical_path(spans)
+    assert [s["name"] for s in steps] == [
+        "upload", "process_message", "fetch_customer_metadata",
+        "extract_text_from_pdf", "publish", "process_message",
+    ]
+    by_name = {(s["service"], s["name"]): s for s in steps}
+    assert by_name[("extraction", "process_message")]["queued_ms"] == pytest.approx(2000)
+    assert by_name[("extraction", "process_message")]["self_ms"] == pytest.approx(1000)
+    assert by_name[("analysis", "process_message")]["queued_ms"] == pytest.approx(2000)
+
+    total = sum(s["self_ms"] + s["queued_ms"] for s in steps)
+    assert total == pytest.approx(13000)
+
+    (job,) = summarise({"t" * 32: spans}, slowest=5)
+    assert job["job_id"] == "job-1"
+    assert job["total_ms"] == pytest.approx(13000)